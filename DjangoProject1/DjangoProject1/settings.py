@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'rooms.middleware.FileServingMiddleware',
+    'rooms.middleware.RequestMetricsMiddleware',
+    'rooms.middleware.QueryDetectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,7 +59,9 @@ ROOT_URLCONF = 'DjangoProject1.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render times to RequestMetricsMiddleware
+        'BACKEND': 'rooms.metrics.InstrumentedDjangoTemplates',
+        'NAME': 'django',  # alias the backend path would otherwise change
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,10 +86,34 @@ WSGI_APPLICATION = 'DjangoProject1.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # DJANGO_DATABASE_PATH points the project at another file (the
+        # benchmark_load command runs its server on a database of its own)
+        'NAME': os.environ.get('DJANGO_DATABASE_PATH') or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so that the
+            # overlap check and insert in rooms.utils.book_room are serialized
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Pragmas run on every new SQLite connection (rooms.sqlite); {} keeps
+# SQLite's defaults. busy_timeout replaces the 'timeout' option above.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 20000,  # milliseconds
+    'synchronous': 'normal',
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -20000,  # KiB when negative
+    'temp_store': 'memory',
+}
+# Line up the write transactions of each process and retry them when the
+# database is locked (rooms.sqlite.write_queue)
+SQLITE_WRITE_QUEUE = True
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_RETRY_DELAY = 0.05  # seconds, doubled on every retry
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,10 +158,49 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic writes fingerprinted, precompressed (.gz/.br) copies of the
+# static files; the vendored ones are rebuilt with build_static_assets
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'rooms.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Static and media files are served by rooms.middleware.FileServingMiddleware.
+# Cache lifetime of the files without a content hash in their name:
+FILE_SERVING_MAX_AGE = 3600
+# Let the front proxy send file bodies: None, 'x-accel-redirect' (nginx,
+# internal locations under FILE_SERVING_ACCEL_PREFIX) or 'x-sendfile'
+FILE_SERVING_OFFLOAD = None
+FILE_SERVING_ACCEL_PREFIX = '/internal/'
+
+# Request histograms of each worker process, merged by the metrics view
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5  # seconds
+# Lets Prometheus scrape /rooms/metrics/ with "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# N+1 and slow query detection (rooms.query_detector): share of requests
+# watched, 0 to turn it off; findings go to logs/queries.log
+QUERY_DETECTOR_SAMPLE_RATE = float(os.environ.get('QUERY_DETECTOR_SAMPLE_RATE', 0))
+QUERY_DETECTOR_REPEAT_THRESHOLD = 5  # same query shape this many times in a request
+QUERY_DETECTOR_SLOW_MS = 100
+QUERY_DETECTOR_RAISE = False  # fail the request instead of logging, for tests
+
+# Rendered receipt PDFs (kept outside MEDIA_ROOT: they are not public)
+RECEIPT_CACHE_ROOT = os.path.join(BASE_DIR, 'receipts_cache')
+# Admin ZIP export: receipts rendered inside the request, by this many
+# threads; beyond the limit they are queued for process_receipt_jobs
+RECEIPT_EXPORT_INLINE_LIMIT = 50
+RECEIPT_EXPORT_THREADS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -154,12 +222,36 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASS')
 
-# Messages settings
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Caches: the default one is per process, the others are shared by every
+# worker of the host
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'shared'),
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Admin dashboard counters: dropped by any worker when a booking changes
+DASHBOARD_STATS_CACHE_ALIAS = 'shared'
+DASHBOARD_STATS_TTL = 30  # seconds
+
+# Messages settings: in a signed cookie, in the session when too large
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
 
 # Session settings
+SESSION_ENGINE = 'rooms.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 86400  # 24 hours in seconds
 SESSION_SAVE_EVERY_REQUEST = True
+SESSION_REFRESH_INTERVAL = 300  # unchanged sessions are written back at most this often
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # Session expires when browser closes
 
 LOGGING = {
@@ -186,6 +278,13 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'queries_file': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'queries.log'),
+            'formatter': 'verbose',
+            'delay': True,
+        },
     },
     'loggers': {
         'django': {
@@ -198,6 +297,16 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'rooms.admin': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'rooms.queries': {
+            'handlers': ['queries_file', 'console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
@@ -1,13 +1,18 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import Room, Reservation
+from .models import Room, Reservation, ReceiptJob
+from .receipts import cached_receipt_path, enqueue_receipts, stream_receipts_zip
 import csv
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class RoomResource(resources.ModelResource):
     class Meta:
         model = Room
@@ -41,7 +46,7 @@ class ReservationAdmin(admin.ModelAdmin):
     list_display = ('room', 'user', 'start_time', 'end_time', 'status', 'total_price')
     list_filter = ('status', 'user')
     search_fields = ('room__name', 'user__username')
-    actions = ['export_as_csv']
+    actions = ['export_as_csv', 'export_receipts_zip']
 
     def export_as_csv(self, request, queryset):
         meta = self.model._meta
@@ -58,6 +63,45 @@ class ReservationAdmin(admin.ModelAdmin):
         return response
     export_as_csv.short_description = "Export Selected Reservations to CSV"
 
+    def export_receipts_zip(self, request, queryset):
+        reservations = queryset.select_related('room', 'user').order_by('pk')
+        missing = [r for r in reservations.iterator(chunk_size=500) if cached_receipt_path(r) is None]
+        if len(missing) > settings.RECEIPT_EXPORT_INLINE_LIMIT:
+            # Too many to render within a request: left to process_receipt_jobs
+            enqueue_receipts(missing)
+            self.message_user(
+                request,
+                f"{len(missing)} reçus ne sont pas encore générés : ils ont été mis en file d'attente. "
+                "Relancez l'export une fois leur génération terminée.",
+                messages.WARNING,
+            )
+            return None
+
+        stats = {}
+
+        def stream():
+            yield from stream_receipts_zip(
+                reservations.iterator(chunk_size=500), workers=settings.RECEIPT_EXPORT_THREADS,
+                stats=stats, threads=True,
+            )
+            # The response is already sent: too late for message_user()
+            logger.info(
+                'Exported %d receipts in %.2fs (%.1f receipts/s) for %s',
+                stats['count'], stats['elapsed'], stats['per_second'], request.user.username,
+            )
+
+        response = StreamingHttpResponse(stream(), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename=recus-{datetime.now().strftime("%Y%m%d")}.zip'
+        return response
+    export_receipts_zip.short_description = "Export Selected Receipts as ZIP"
+
+@admin.register(ReceiptJob)
+class ReceiptJobAdmin(admin.ModelAdmin):
+    list_display = ('reservation', 'status', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('reservation__room', 'reservation__user')
+    readonly_fields = ('reservation', 'attempts', 'error', 'created_at', 'updated_at')
+
 # Extend UserAdmin to add more functionality
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_active')
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class RoomsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'rooms'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .sqlite import apply_pragmas
+
+        connection_created.connect(apply_pragmas, dispatch_uid='rooms.sqlite.apply_pragmas')
@@ -0,0 +1,317 @@
+"""
+Vendored front-end assets.
+
+Bootstrap and Font Awesome are served from our own static files instead of
+public CDNs. build_assets() copies them from the django-bootstrap-static and
+fontawesomefree packages into static/vendor/, keeping only what the site
+uses:
+
+- CSS rules are dropped when one of their classes never appears in the
+  templates or the Python code of the project (class names built in
+  templates such as alert-{{ message.tags }} keep every class of that
+  prefix). Classes that Bootstrap's JavaScript adds at runtime are kept
+  through JS_CLASSES.
+- Font Awesome keeps the rules of the icons in use, and its web fonts are
+  cut down to those glyphs (needs fontTools, otherwise they are copied
+  whole).
+
+The result is committed, so the packages are only needed to rebuild it
+(build_static_assets command) after adding icons or Bootstrap components.
+Fingerprinting and compression happen at collectstatic time, see
+rooms.storage.CompressedManifestStaticFilesStorage.
+"""
+from pathlib import Path
+import importlib.util
+import re
+import shutil
+
+from django.apps import apps
+from django.conf import settings
+
+VENDOR_DIR = 'vendor'
+
+# Added or removed by bootstrap.bundle.js (alerts, collapse, dropdowns,
+# modals, tooltips...) rather than written in the templates
+JS_CLASSES = {
+    'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'active',
+    'disabled', 'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop',
+    'dropdown-menu-end', 'dropdown-menu-start', 'tooltip', 'tooltip-inner',
+    'tooltip-arrow', 'popover', 'popover-arrow', 'popover-header', 'popover-body',
+    'was-validated', 'is-valid', 'is-invalid',
+}
+JS_CLASS_PREFIXES = ('bs-tooltip-', 'bs-popover-', 'carousel-item-')
+
+# Font Awesome styles and the web font each one needs
+FONT_STYLES = {
+    'fas': 'fa-solid-900',
+    'fa-solid': 'fa-solid-900',
+    'far': 'fa-regular-400',
+    'fa-regular': 'fa-regular-400',
+    'fab': 'fa-brands-400',
+    'fa-brands': 'fa-brands-400',
+}
+
+SOURCE_MAP_RE = re.compile(r'\n?/[/*]# sourceMappingURL=\S+(?: \*/)?\s*$')
+CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+WORD_RE = re.compile(r'[\w-]+')
+# Class names completed by the template language: "alert-{{ message.tags }}"
+TEMPLATE_PREFIX_RE = re.compile(r'([A-Za-z][\w-]*-)\{[{%]')
+# class="..." in templates, 'class': '...' in widget attrs
+CLASS_ATTR_RE = re.compile(r'class[\'"]?\s*[:=]\s*(?:"([^"]*)"|\'([^\']*)\')')
+CODEPOINT_RE = re.compile(r'content:\s*"\\([0-9a-f]{4,5})"')
+FONT_URL_RE = re.compile(r'url\(\.\./webfonts/([\w-]+)\.woff2\)')
+
+
+def package_static_dir(package):
+    spec = importlib.util.find_spec(package)
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return Path(list(spec.submodule_search_locations)[0]) / 'static' / package
+
+
+def source_files():
+    """Templates and Python modules of the project, where class names are written."""
+    roots = [Path(directory) for template in settings.TEMPLATES for directory in template.get('DIRS', [])]
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for app in apps.get_app_configs():
+        path = Path(app.path).resolve()
+        if base_dir in path.parents:
+            roots.append(path)
+    for root in roots:
+        for pattern in ('*.html', '*.py', '*.js'):
+            yield from root.rglob(pattern)
+
+
+def used_classes():
+    """
+    Return (words, prefixes, classes): every word of the project sources,
+    which includes the class names in use whatever the way they are
+    written, the prefixes of class names completed at render time, and the
+    words found in class attributes.
+    """
+    words = set(JS_CLASSES)
+    prefixes = set(JS_CLASS_PREFIXES)
+    classes = set()
+    for path in source_files():
+        text = path.read_text(encoding='utf-8', errors='ignore')
+        words.update(WORD_RE.findall(text))
+        prefixes.update(TEMPLATE_PREFIX_RE.findall(text))
+        for values in CLASS_ATTR_RE.findall(text):
+            classes.update(WORD_RE.findall(' '.join(values)))
+    return words, tuple(prefixes), classes
+
+
+def parse_css(css):
+    """
+    Split a stylesheet into a list of (prelude, body). body is the
+    declaration text of a rule, a nested list for grouping at-rules
+    (@media, @supports) and None for statements such as @charset.
+    Comments are dropped.
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    blocks, _ = _parse_blocks(css, 0)
+    return blocks
+
+
+def _parse_blocks(css, i):
+    blocks = []
+    start = i
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            i = css.index(char, i + 1) + 1
+            continue
+        if char == ';' and css[start:i].lstrip().startswith('@'):
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        elif char == '{':
+            prelude = css[start:i].strip()
+            if prelude.startswith(('@media', '@supports', '@container', '@layer')):
+                body, i = _parse_blocks(css, i + 1)
+            else:
+                end = _block_end(css, i + 1)
+                body = css[i + 1:end].strip()
+                i = end
+            blocks.append((prelude, body))
+            start = i + 1
+        elif char == '}':
+            return blocks, i
+        i += 1
+    return blocks, i
+
+
+def _block_end(css, i):
+    depth = 1
+    while depth:
+        char = css[i]
+        if char in '"\'':
+            i = css.index(char, i + 1)
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        i += 1
+    return i - 1
+
+
+def serialize_css(blocks):
+    parts = []
+    for prelude, body in blocks:
+        if body is None:
+            parts.append(f'{prelude};')
+        elif isinstance(body, list):
+            parts.append(f'{prelude}{{{serialize_css(body)}}}')
+        else:
+            parts.append(f'{prelude}{{{body}}}')
+    return ''.join(parts)
+
+
+def split_selectors(prelude):
+    """Split a selector list on the commas that are not inside parentheses."""
+    selectors = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def purge_css(blocks, words, prefixes):
+    """
+    Drop the selectors that name a class never used, then the rules and
+    grouping at-rules left empty, then the animations no rule refers to.
+    """
+    kept = _purge_rules(blocks, words, prefixes)
+    used = set(WORD_RE.findall(_declarations(kept)))
+    return [
+        (prelude, body) for prelude, body in kept
+        if not prelude.startswith('@keyframes') or prelude.split()[1] in used
+    ]
+
+
+def _declarations(blocks):
+    return ''.join(
+        _declarations(body) if isinstance(body, list) else body
+        for prelude, body in blocks
+        if body is not None and not prelude.startswith('@keyframes')
+    )
+
+
+def _purge_rules(blocks, words, prefixes):
+    def is_used(name):
+        return name in words or name.startswith(prefixes)
+
+    kept = []
+    for prelude, body in blocks:
+        if isinstance(body, list):
+            body = _purge_rules(body, words, prefixes)
+            if body:
+                kept.append((prelude, body))
+        elif body is None or prelude.startswith('@'):
+            kept.append((prelude, body))
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if all(is_used(name) for name in CLASS_RE.findall(selector))
+            ]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def banner(css):
+    """The license comment at the top of a vendored file."""
+    match = re.match(r'\s*(?:@charset[^;]*;\s*)?(/\*!.*?\*/)', css, re.S)
+    return match.group(1) + '\n' if match else ''
+
+
+def build_bootstrap(source, target, words, prefixes):
+    """Write the CSS rules in use and the JavaScript bundle."""
+    css = (source / 'css' / 'bootstrap.min.css').read_text(encoding='utf-8')
+    purged = serialize_css(purge_css(parse_css(SOURCE_MAP_RE.sub('', css)), words, prefixes))
+    write(target / 'bootstrap.min.css', banner(css) + purged + '\n')
+
+    # The source map is not vendored: a dangling reference would make
+    # ManifestStaticFilesStorage fail
+    js = (source / 'js' / 'bootstrap.bundle.min.js').read_text(encoding='utf-8')
+    write(target / 'bootstrap.bundle.min.js', SOURCE_MAP_RE.sub('', js) + '\n')
+    return [target / 'bootstrap.min.css', target / 'bootstrap.bundle.min.js']
+
+
+def build_fontawesome(source, target, words, prefixes, classes):
+    """Write the icon rules in use and the matching subset of the web fonts."""
+    css = (source / 'css' / 'all.min.css').read_text(encoding='utf-8')
+    fonts = {font for style, font in FONT_STYLES.items() if style in classes}
+
+    blocks = []
+    for prelude, body in purge_css(parse_css(css), words, prefixes):
+        if prelude == '@font-face':
+            # Only the Font Awesome 6 faces of the styles in use, as woff2
+            match = FONT_URL_RE.search(body)
+            if not match or match.group(1) not in fonts or '"Font Awesome 6' not in body:
+                continue
+            body = re.sub(r'src:[^;}]*', f'src:url(../webfonts/{match.group(1)}.woff2) format("woff2")', body)
+        blocks.append((prelude, body))
+    purged = serialize_css(blocks)
+    css_path = target / 'css' / 'fontawesome.min.css'
+    write(css_path, banner(css) + purged + '\n')
+
+    codepoints = {int(value, 16) for value in CODEPOINT_RE.findall(purged)}
+    written = [css_path]
+    for font in sorted(fonts):
+        path = target / 'webfonts' / f'{font}.woff2'
+        subset_font(source / 'webfonts' / f'{font}.woff2', path, codepoints)
+        written.append(path)
+    return written
+
+
+def subset_font(source, target, codepoints):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        from fontTools import subset
+    except ImportError:
+        shutil.copyfile(source, target)
+        return
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = []
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(target), options)
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def build_assets(output=None, bootstrap_dir=None, fontawesome_dir=None):
+    """
+    Rebuild static/vendor/ and return the list of files written. Source
+    directories default to the static files of the installed packages.
+    """
+    output = Path(output or Path(settings.BASE_DIR) / 'static' / VENDOR_DIR)
+    bootstrap_dir = Path(bootstrap_dir) if bootstrap_dir else package_static_dir('bootstrap')
+    fontawesome_dir = Path(fontawesome_dir) if fontawesome_dir else package_static_dir('fontawesomefree')
+    if bootstrap_dir is None or fontawesome_dir is None:
+        raise FileNotFoundError(
+            'Install django-bootstrap-static and fontawesomefree, or give their static directories.'
+        )
+
+    words, prefixes, classes = used_classes()
+    return (
+        build_bootstrap(bootstrap_dir, output / 'bootstrap', words, prefixes)
+        + build_fontawesome(fontawesome_dir, output / 'fontawesome', words, prefixes, classes)
+    )
@@ -0,0 +1,290 @@
+"""
+In-process availability engine for rooms.
+
+Keeps, for every room, the non-cancelled reservations sorted by start time so
+that conflict checks and "which rooms are free in this window" questions are
+answered from memory instead of one query per room.
+
+The index is built lazily on first use, once per process. Every committed
+transaction that saved or deleted reservations appends one entry to a change
+log in the database (AvailabilityChange): the ids it touched, under the next
+value of a version counter (AvailabilityVersion) incremented in the same
+transaction, so versions are committed in order and none can be missed.
+Every lookup reads the current version, one primary key query; a process
+behind replays the entries since the version it holds, reading the current
+rows of the reservations they name. Only a gap in the log (entries pruned
+after CHANGE_LOG_SIZE versions, or an invalidate() after bulk writes that
+send no signals) makes it load everything again.
+
+The index only answers early checks and searches; book_room() checks
+overlaps again in the database, in the write transaction.
+"""
+from bisect import bisect_left, bisect_right
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+VERSION_ROW = 1
+CHANGE_LOG_SIZE = 10000  # versions kept in the change log
+PRUNE_EVERY = 100  # versions between two prunings of the log
+MAX_LOGGED_IDS = 10000  # beyond, an entry asks every process to reload
+APPLY_CHUNK_SIZE = 500
+
+_pending = threading.local()
+
+
+def _aware(value):
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+class RoomIntervals:
+    """
+    Reservations of a single room, kept sorted by start time.
+
+    Along with the sorted entries we remember the longest duration seen, which
+    bounds how far before the requested start an overlapping reservation can
+    begin. A lookup is therefore two bisections plus a scan of the entries that
+    actually fall in the window: O(log n + k).
+    """
+
+    def __init__(self):
+        self.entries = []  # (start_time, end_time, reservation_id)
+        self.starts = []
+        self.max_duration = None
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from (start_time, end_time, reservation_id) tuples in any order."""
+        intervals = cls()
+        intervals.entries = sorted(entries)
+        intervals.starts = [entry[0] for entry in intervals.entries]
+        intervals.max_duration = max((end - start for start, end, _ in intervals.entries), default=None)
+        return intervals
+
+    def add(self, reservation_id, start_time, end_time):
+        entry = (start_time, end_time, reservation_id)
+        index = bisect_right(self.entries, entry)
+        self.entries.insert(index, entry)
+        self.starts.insert(index, start_time)
+        duration = end_time - start_time
+        if self.max_duration is None or duration > self.max_duration:
+            self.max_duration = duration
+
+    def remove(self, reservation_id, start_time, end_time):
+        entry = (start_time, end_time, reservation_id)
+        index = bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+            del self.starts[index]
+
+    def overlapping(self, start_time, end_time):
+        """Return the ids of reservations overlapping [start_time, end_time)."""
+        if not self.entries:
+            return []
+        low = bisect_right(self.starts, start_time - self.max_duration)
+        high = bisect_left(self.starts, end_time)
+        return [
+            reservation_id
+            for _, entry_end, reservation_id in self.entries[low:high]
+            if entry_end > start_time
+        ]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class AvailabilityIndex:
+    """
+    Per-room interval index of all non-cancelled reservations, plus one
+    index of every room together for busy_room_ids().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms = {}
+        self._all = RoomIntervals()
+        self._positions = {}  # reservation_id -> (room_id, start_time, end_time)
+        self._loaded = False
+        self._version = None
+
+    def _ensure_loaded(self):
+        version = _current_version()
+        if self._loaded and version == self._version:
+            return
+        with self._lock:
+            if self._loaded and version == self._version:
+                return
+            if not (self._loaded and self._catch_up(version)):
+                self._load(version)
+
+    def _load(self, version):
+        from .models import Reservation
+
+        by_room = {}
+        positions = {}
+        rows = (
+            Reservation.objects.exclude(status='cancelled')
+            .values_list('pk', 'room_id', 'start_time', 'end_time')
+            .iterator(chunk_size=5000)
+        )
+        for reservation_id, room_id, start_time, end_time in rows:
+            by_room.setdefault(room_id, []).append((start_time, end_time, reservation_id))
+            positions[reservation_id] = (room_id, start_time, end_time)
+        # Sorted once: inserting rows one by one would move the lists each time
+        self._rooms = {room_id: RoomIntervals.from_entries(entries) for room_id, entries in by_room.items()}
+        self._all = RoomIntervals.from_entries(entry for entries in by_room.values() for entry in entries)
+        self._positions = positions
+        self._version = version
+        self._loaded = True
+
+    def _catch_up(self, version):
+        """Replay the change log up to version; False if it has a gap."""
+        from .models import AvailabilityChange
+
+        if version < self._version:
+            return False
+        changes = list(
+            AvailabilityChange.objects.filter(version__gt=self._version, version__lte=version)
+            .values_list('reservation_ids', flat=True)
+        )
+        if len(changes) != version - self._version or None in changes:
+            return False
+        self._apply({reservation_id for ids in changes for reservation_id in ids})
+        self._version = version
+        return True
+
+    def _apply(self, reservation_ids):
+        """Bring these reservations in line with their current rows."""
+        from .models import Reservation
+
+        reservation_ids = list(reservation_ids)
+        for i in range(0, len(reservation_ids), APPLY_CHUNK_SIZE):
+            chunk = reservation_ids[i:i + APPLY_CHUNK_SIZE]
+            rows = (
+                Reservation.objects.filter(pk__in=chunk).exclude(status='cancelled')
+                .values_list('pk', 'room_id', 'start_time', 'end_time')
+            )
+            for reservation_id in chunk:
+                self._discard(reservation_id)
+            for reservation_id, room_id, start_time, end_time in rows:
+                self._add(reservation_id, room_id, start_time, end_time)
+
+    def _add(self, reservation_id, room_id, start_time, end_time):
+        self._rooms.setdefault(room_id, RoomIntervals()).add(reservation_id, start_time, end_time)
+        self._all.add(reservation_id, start_time, end_time)
+        self._positions[reservation_id] = (room_id, start_time, end_time)
+
+    def _discard(self, reservation_id):
+        position = self._positions.pop(reservation_id, None)
+        if position is not None:
+            room_id, start_time, end_time = position
+            self._rooms[room_id].remove(reservation_id, start_time, end_time)
+            self._all.remove(reservation_id, start_time, end_time)
+
+    def publish(self, reservation_ids):
+        """
+        Log the committed changes to these reservations for every process.
+
+        The local index applies them right away if it was up to date;
+        otherwise its next lookup replays them with what it missed.
+        """
+        version = _log_change(reservation_ids)
+        with self._lock:
+            if self._loaded and version == self._version + 1:
+                self._apply(reservation_ids)
+                self._version = version
+
+    def conflicts(self, room_id, start_time, end_time):
+        """Return the ids of reservations of room_id overlapping the window."""
+        self._ensure_loaded()
+        start_time, end_time = _aware(start_time), _aware(end_time)
+        with self._lock:
+            intervals = self._rooms.get(room_id)
+            if intervals is None:
+                return []
+            return intervals.overlapping(start_time, end_time)
+
+    def is_free(self, room_id, start_time, end_time):
+        return not self.conflicts(room_id, start_time, end_time)
+
+    def busy_room_ids(self, start_time, end_time):
+        """Return the set of room ids with at least one reservation in the window."""
+        self._ensure_loaded()
+        start_time, end_time = _aware(start_time), _aware(end_time)
+        with self._lock:
+            return {self._positions[reservation_id][0] for reservation_id in self._all.overlapping(start_time, end_time)}
+
+    def reset(self):
+        with self._lock:
+            self._rooms = {}
+            self._all = RoomIntervals()
+            self._positions = {}
+            self._loaded = False
+
+
+def _current_version():
+    from .models import AvailabilityVersion
+
+    return AvailabilityVersion.objects.filter(pk=VERSION_ROW).values_list('version', flat=True).first() or 0
+
+
+def _log_change(reservation_ids):
+    """
+    Increment the shared version and log the reservations changed under it
+    (None: every process reloads). Returns the new version.
+    """
+    from .models import AvailabilityChange, AvailabilityVersion
+
+    if reservation_ids is not None:
+        reservation_ids = sorted(reservation_ids)
+        if len(reservation_ids) > MAX_LOGGED_IDS:
+            reservation_ids = None
+    with transaction.atomic():
+        # The row stays locked until commit: versions commit in order
+        versions = AvailabilityVersion.objects.filter(pk=VERSION_ROW)
+        if not versions.update(version=F('version') + 1):
+            AvailabilityVersion.objects.get_or_create(pk=VERSION_ROW)
+            versions.update(version=F('version') + 1)
+        version = versions.values_list('version', flat=True).get()
+        AvailabilityChange.objects.create(version=version, reservation_ids=reservation_ids)
+        if version % PRUNE_EVERY == 0:
+            AvailabilityChange.objects.filter(version__lte=version - CHANGE_LOG_SIZE).delete()
+    return version
+
+
+index = AvailabilityIndex()
+
+
+def changed(reservation_id):
+    """
+    Note a saved or deleted reservation. The reservations changed by one
+    transaction are published together once it commits.
+    """
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.add(reservation_id)
+    # Registered every time: a callback registered in a savepoint that rolls
+    # back is dropped. The first one to run publishes them all.
+    transaction.on_commit(_publish_pending)
+
+
+def _publish_pending():
+    pending = getattr(_pending, 'ids', None)
+    if pending:
+        _pending.ids = set()
+        index.publish(pending)
+
+
+def invalidate():
+    """
+    Drop the index in every process.
+
+    Needed after writes that bypass model signals (bulk_create, update()).
+    """
+    _log_change(None)
+    index.reset()
@@ -0,0 +1,297 @@
+"""
+Room catalogue import from CSV.
+
+Rows are parsed straight from the uploaded file, validated against the
+columns named in the header and applied with bulk_create/bulk_update in a
+single transaction.
+
+Imports can also run in two phases: store_preview() validates the whole file
+once and keeps the valid rows under a random token, and the commit step
+feeds them to apply_rows() through load_preview() without parsing the CSV
+again. Previews nobody commits are removed by cleanup_previews().
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import secrets
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Room
+
+REQUIRED_HEADERS = ['Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible']
+OPTIONAL_HEADERS = ['Équipements']
+TRUE_VALUES = {'oui', 'yes', 'true', '1'}
+BATCH_SIZE = 1000
+MAX_PRICE = Decimal('1e8')  # Room.price_per_hour has 8 integer digits
+PREVIEW_DIR = 'temp_csv'
+PREVIEW_TTL = 3600  # seconds
+PREVIEW_ROWS = 10
+PREVIEW_ERRORS = 50
+TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+UPDATE_FIELDS = ['capacity', 'description', 'price_per_hour', 'is_available', 'amenities']
+
+
+class CSVFormatError(ValueError):
+    """The file cannot be imported at all (encoding, missing headers...)."""
+
+
+def open_csv(uploaded_file):
+    """
+    Return a csv.reader over an uploaded file without loading it in memory.
+    Both ',' (our own export) and ';' (spreadsheet default) are accepted.
+
+    The delimiter is the one of the header line: column names contain
+    neither, whereas data cells may hold commas (decimal prices, amenities),
+    which misleads csv.Sniffer on semicolon files.
+    """
+    stream = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    try:
+        header = stream.readline(4096)
+    except UnicodeDecodeError:
+        raise CSVFormatError("Le fichier doit être encodé en UTF-8.")
+    stream.seek(0)
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    return csv.reader(stream, csv.excel, delimiter=delimiter)
+
+
+def read_header(reader):
+    """Map every known column name to its index in the file."""
+    try:
+        header = [column.strip() for column in next(reader)]
+    except StopIteration:
+        raise CSVFormatError("Le fichier CSV est vide.")
+    except UnicodeDecodeError:
+        raise CSVFormatError("Le fichier doit être encodé en UTF-8.")
+    missing = [name for name in REQUIRED_HEADERS if name not in header]
+    if missing:
+        raise CSVFormatError(
+            "Format de fichier CSV invalide. Colonnes manquantes : " + ', '.join(missing)
+        )
+    return header, {name: header.index(name) for name in REQUIRED_HEADERS + OPTIONAL_HEADERS if name in header}
+
+
+def parse_row(row, columns):
+    """
+    Validate one data row and return (values, error_message).
+    values is None when the row is invalid.
+    """
+    def cell(name):
+        index = columns.get(name)
+        if index is None or index >= len(row):
+            return ''
+        return row[index].strip()
+
+    if len(row) < len(REQUIRED_HEADERS):
+        return None, "Nombre de colonnes insuffisant"
+
+    name = cell('Nom')
+    if not name:
+        return None, "Le nom est obligatoire"
+    if len(name) > Room._meta.get_field('name').max_length:
+        return None, "Le nom est trop long"
+
+    try:
+        capacity = int(cell('Capacité'))
+    except ValueError:
+        return None, "La capacité doit être un nombre entier"
+    if capacity <= 0:
+        return None, "La capacité doit être un nombre positif"
+
+    try:
+        price = Decimal(cell('Prix par heure').replace(',', '.'))
+    except InvalidOperation:
+        return None, "Le prix doit être un nombre"
+    if not price.is_finite() or price <= 0:
+        return None, "Le prix doit être un nombre positif"
+    if price >= MAX_PRICE:
+        return None, "Le prix est trop élevé"
+
+    amenities_str = cell('Équipements')
+    amenities = [item.strip() for item in amenities_str.split(',') if item.strip()] if amenities_str else []
+
+    return {
+        'name': name,
+        'capacity': capacity,
+        'description': cell('Description'),
+        'price_per_hour': price.quantize(Decimal('0.01')),
+        'is_available': cell('Disponible').lower() in TRUE_VALUES,
+        'amenities': amenities,
+    }, ''
+
+
+def parse_rows(reader, columns):
+    """
+    Yield (line_number, values, error_message) for every non-empty row.
+    Line numbers count the header as line 1.
+    """
+    try:
+        for line_number, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            values, error = parse_row(row, columns)
+            yield line_number, values, error
+    except UnicodeDecodeError:
+        raise CSVFormatError("Le fichier doit être encodé en UTF-8.")
+
+
+def apply_rows(rows, batch_size=BATCH_SIZE):
+    """
+    Create or update rooms by name from validated rows.
+
+    rows yields (line_number, values, error_message) as produced by
+    parse_rows. Existing rooms are loaded once; when several rooms share a
+    name the oldest one is updated, and rooms whose values do not change are
+    left alone. Returns a dict with the created, updated and unchanged counts
+    and the list of (line_number, error_message).
+    """
+    from .utils import invalidate_dashboard_stats
+
+    existing = {}
+    for pk, name, *current in Room.objects.order_by('-pk').values_list('pk', 'name', *UPDATE_FIELDS):
+        existing[name] = (pk, current)
+
+    to_create = {}
+    to_update = {}
+    unchanged = set()
+    errors = []
+    for line_number, values, error in rows:
+        if values is None:
+            errors.append((line_number, error))
+            continue
+        name = values['name']
+        if name in existing:
+            pk, current = existing[name]
+            if [values[field] for field in UPDATE_FIELDS] == current:
+                to_update.pop(name, None)
+                unchanged.add(name)
+            else:
+                to_update[name] = Room(pk=pk, **values)
+                unchanged.discard(name)
+        else:
+            # A name repeated in the file keeps its last values
+            to_create[name] = Room(**values)
+
+    with transaction.atomic():
+        Room.objects.bulk_create(to_create.values(), batch_size=batch_size)
+        Room.objects.bulk_update(to_update.values(), UPDATE_FIELDS, batch_size=batch_size)
+
+    transaction.on_commit(invalidate_dashboard_stats)
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'unchanged': len(unchanged),
+        'errors': errors,
+    }
+
+
+def import_rooms(uploaded_file, batch_size=BATCH_SIZE):
+    """Parse and import an uploaded room CSV file in one transaction."""
+    reader = open_csv(uploaded_file)
+    _, columns = read_header(reader)
+    return apply_rows(parse_rows(reader, columns), batch_size=batch_size)
+
+
+def preview_path(token):
+    if not TOKEN_RE.match(token or ''):
+        raise CSVFormatError("Aperçu d'importation invalide.")
+    return os.path.join(settings.MEDIA_ROOT, PREVIEW_DIR, f'{token}.jsonl.gz')
+
+
+def store_preview(uploaded_file):
+    """
+    Validate a whole CSV file and store its valid rows for a later commit.
+
+    Rows are written one JSON line at a time to a gzip file, so memory use
+    does not depend on the size of the upload. Returns a summary with the
+    token to commit with, the first valid rows, the first errors and the
+    valid/invalid counts.
+    """
+    cleanup_previews()
+    reader = open_csv(uploaded_file)
+    header, columns = read_header(reader)
+
+    token = secrets.token_hex(16)
+    path = preview_path(token)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rows = []
+    errors = []
+    valid = invalid = 0
+    try:
+        with gzip.open(path, 'wt', encoding='utf-8') as output:
+            for line_number, values, error in parse_rows(reader, columns):
+                if values is None:
+                    invalid += 1
+                    if len(errors) < PREVIEW_ERRORS:
+                        errors.append((line_number, error))
+                    continue
+                valid += 1
+                if len(rows) < PREVIEW_ROWS:
+                    rows.append(values)
+                output.write(json.dumps([line_number, values], default=str))
+                output.write('\n')
+    except Exception:
+        os.remove(path)
+        raise
+
+    return {
+        'token': token,
+        'headers': header,
+        'rows': rows,
+        'errors': errors,
+        'valid': valid,
+        'invalid': invalid,
+    }
+
+
+def load_preview(token):
+    """
+    Yield the stored rows of a preview in the format of parse_rows.
+    """
+    path = preview_path(token)
+    try:
+        preview = gzip.open(path, 'rt', encoding='utf-8')
+    except FileNotFoundError:
+        raise CSVFormatError("L'aperçu a expiré, veuillez importer le fichier à nouveau.")
+    with preview:
+        for line in preview:
+            line_number, values = json.loads(line)
+            values['price_per_hour'] = Decimal(values['price_per_hour'])
+            yield line_number, values, ''
+
+
+def discard_preview(token):
+    try:
+        os.remove(preview_path(token))
+    except (FileNotFoundError, CSVFormatError):
+        pass
+
+
+def cleanup_previews(max_age=PREVIEW_TTL):
+    """
+    Delete previews and leftover upload files older than max_age seconds.
+    Returns the number of files removed.
+    """
+    directory = os.path.join(settings.MEDIA_ROOT, PREVIEW_DIR)
+    limit = time.time() - max_age
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return 0
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,278 @@
+"""
+Synthetic rooms, users, reservations and payments, at production scale.
+
+generate() draws the random values of a whole room or batch of users at once
+(random.choices with k=...), builds the model instances from them and writes
+them with bulk_create, TRANSACTION_ROWS rows per transaction: committing
+every few rows would spend most of the time syncing the database file.
+
+- Reservations of a room fall within opening hours and are laid one after
+  the other with random gaps, so they never overlap. About PAST_SHARE of
+  them are in the past; their status follows their date.
+- Confirmed reservations have a completed payment; some pending and
+  cancelled ones have a pending, failed or cancelled payment.
+- Every user gets the same password hash, computed once: the hasher is
+  deliberately slow and would take hours for tens of thousands of users.
+
+The same seed always gives the same dataset, relative to the hour it runs.
+"""
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import availability
+from .models import Payment, Reservation, Room
+from .utils import invalidate_dashboard_stats
+
+BATCH_SIZE = 2000  # objects per bulk_create query batch
+TRANSACTION_ROWS = 100000
+DEFAULT_PASSWORD = 'motdepasse'
+
+SLOT = timedelta(minutes=30)
+OPENING_HOUR = 8
+SLOTS_PER_DAY = 24  # 8:00 to 20:00
+PAST_SHARE = 0.8
+# Gap before and length of a reservation, in slots, and their weights
+GAPS = ((0, 1, 2, 4, 8, 16), (30, 20, 15, 15, 10, 10))
+LENGTHS = ((1, 2, 3, 4, 6, 8), (15, 35, 15, 20, 10, 5))
+MAX_BOOKING_LEAD = timedelta(days=30)
+
+PAST_STATUSES = (('confirmed', 'cancelled', 'pending'), (80, 15, 5))
+FUTURE_STATUSES = (('confirmed', 'pending', 'cancelled'), (45, 45, 10))
+# Reservation status: (share with a payment, possible payment statuses)
+PAYMENTS = {
+    'confirmed': (1.0, ('completed',)),
+    'pending': (0.5, ('pending',)),
+    'cancelled': (0.3, ('failed', 'cancelled')),
+}
+PAYMENT_METHODS = ('credit_card', 'paypal', 'bank_transfer', 'cash')
+
+FIRST_NAMES = [
+    'Yasmine', 'Mehdi', 'Salma', 'Youssef', 'Imane', 'Omar', 'Khadija', 'Amine', 'Sara', 'Hamza',
+    'Fatima', 'Karim', 'Nadia', 'Rachid', 'Leila', 'Adam', 'Camille', 'Lucas', 'Chloé', 'Thomas',
+    'Inès', 'Hugo', 'Manon', 'Nicolas', 'Zineb', 'Anas', 'Meryem', 'Ilyas', 'Houda', 'Said',
+]
+LAST_NAMES = [
+    'Benali', 'El Amrani', 'Idrissi', 'Alaoui', 'Bennani', 'Tazi', 'Chraibi', 'Berrada', 'Fassi', 'Naciri',
+    'Lahlou', 'Kettani', 'Ouazzani', 'Sebti', 'Benjelloun', 'Martin', 'Bernard', 'Dubois', 'Moreau', 'Laurent',
+    'Lefebvre', 'Roux', 'Fontaine', 'Mercier', 'Haddad', 'Zerouali', 'Amrani', 'Belkadi', 'Skalli', 'Guessous',
+]
+# Kind of room: (possible capacities, price per seat and hour)
+ROOM_KINDS = {
+    'Cabine': ((2, 4, 6), 60),
+    'Salle': ((8, 10, 12, 16, 20), 45),
+    'Espace': ((12, 20, 30, 40), 35),
+    'Auditorium': ((50, 80, 120, 200), 20),
+}
+PLACES = [
+    'Atlas', 'Medina', 'Hassan II', 'Marrakech', 'Agadir', 'Fès', 'Tanger', 'Rabat', 'Essaouira',
+    'Chefchaouen', 'Ifrane', 'Ouarzazate', 'Casablanca', 'Meknès', 'Tétouan', 'Oujda', 'Saïdia', 'Dakhla',
+]
+AMENITIES = [
+    'Wi-Fi', 'Projecteur', 'Tableau blanc', 'Climatisation', 'Visioconférence', 'Service de café',
+    'Écran 65"', 'Système audio', 'Thé à la menthe', 'Insonorisation', 'Accès PMR', 'Parking',
+]
+
+
+class DatasetExists(Exception):
+    pass
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the values set on these auto_now_add fields."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _mean(values, weights):
+    return sum(v * w for v, w in zip(values, weights)) / sum(weights)
+
+
+def first_day(reservations_per_room):
+    """First day of the reservations, so that PAST_SHARE of them are past."""
+    days = reservations_per_room * (_mean(*GAPS) + _mean(*LENGTHS)) / SLOTS_PER_DAY
+    return timezone.localdate() - timedelta(days=round(days * PAST_SHARE))
+
+
+# Usernames of generated users: first.last.index
+GENERATED_USERNAME_RE = r'^[a-z0-9-]+\.[a-z0-9-]+\.[0-9]+$'
+
+
+def username(index, first_name, last_name):
+    return f'{slugify(first_name)}.{slugify(last_name)}.{index}'
+
+
+def _rooms(rng, count):
+    kinds = rng.choices(list(ROOM_KINDS), k=count)
+    places = rng.choices(PLACES, k=count)
+    rooms = []
+    for i, (kind, place) in enumerate(zip(kinds, places)):
+        capacities, seat_price = ROOM_KINDS[kind]
+        capacity = rng.choice(capacities)
+        rooms.append(Room(
+            name=f'{kind} {place} {i + 1}',
+            capacity=capacity,
+            description=f'{kind} de {capacity} places à {place}, pour réunions, formations et ateliers.',
+            # Multiple of 50, so that half-hour prices stay exact
+            price_per_hour=Decimal(max(1, round(capacity * seat_price / 50)) * 50),
+            is_available=rng.random() < 0.95,
+            amenities=rng.sample(AMENITIES, rng.randint(2, 8)),
+        ))
+    return rooms
+
+
+def _users(rng, first, count, password_hash, now):
+    first_names = rng.choices(FIRST_NAMES, k=count)
+    last_names = rng.choices(LAST_NAMES, k=count)
+    ages = rng.choices(range(730), k=count)
+    users = []
+    for i, (first_name, last_name, age) in enumerate(zip(first_names, last_names, ages), first + 1):
+        name = username(i, first_name, last_name)
+        users.append(User(
+            username=name,
+            first_name=first_name,
+            last_name=last_name,
+            email=f'{name}@example.com',
+            password=password_hash,
+            date_joined=now - timedelta(days=age),
+        ))
+    return users
+
+
+class _Calendar:
+    """Aware datetimes of opening-hour slots, counted from a first day."""
+
+    def __init__(self, first_day):
+        self.first_day = first_day
+        self.openings = {}
+
+    def slot(self, index):
+        day, slot = divmod(index, SLOTS_PER_DAY)
+        opening = self.openings.get(day)
+        if opening is None:
+            opening = self.openings[day] = timezone.make_aware(
+                datetime.combine(self.first_day + timedelta(days=day), time(OPENING_HOUR))
+            )
+        return opening + SLOT * slot
+
+
+def _room_reservations(rng, room, count, calendar, user_ids, now):
+    """Yield (reservation, payment plan or None) for count reservations of room."""
+    gaps = rng.choices(*GAPS, k=count)
+    lengths = rng.choices(*LENGTHS, k=count)
+    users = rng.choices(user_ids, k=count)
+    draws = [rng.random() for _ in range(3 * count)]
+    cursor = rng.randrange(SLOTS_PER_DAY)
+    for i, (gap, length, user_id) in enumerate(zip(gaps, lengths, users)):
+        start = cursor + gap
+        if start % SLOTS_PER_DAY + length > SLOTS_PER_DAY:
+            # Would end after closing time: first thing the next day
+            start = (start // SLOTS_PER_DAY + 1) * SLOTS_PER_DAY
+        cursor = start + length
+        start_time = calendar.slot(start)
+        end_time = start_time + SLOT * length
+
+        statuses, weights = PAST_STATUSES if end_time <= now else FUTURE_STATUSES
+        status = rng.choices(statuses, weights)[0]
+        created_at = min(now, start_time - MAX_BOOKING_LEAD * draws[3 * i])
+        share, payment_statuses = PAYMENTS[status]
+        payment = None
+        if draws[3 * i + 1] < share:
+            payment_status = payment_statuses[int(draws[3 * i + 2] * len(payment_statuses))]
+            payment = (payment_status, min(now, created_at + timedelta(minutes=rng.randint(1, 120))))
+        yield Reservation(
+            room_id=room.pk,
+            user_id=user_id,
+            start_time=start_time,
+            end_time=end_time,
+            created_at=created_at,
+            status=status,
+            total_price=room.price_per_hour * length / 2,
+            is_paid=payment is not None and payment[0] == 'completed',
+        ), payment
+
+
+def _write_reservations(rng, pairs, batch_size):
+    """Write reservations and their payments in one transaction; return both counts."""
+    with transaction.atomic():
+        reservations = Reservation.objects.bulk_create([reservation for reservation, _ in pairs], batch_size=batch_size)
+        payments = [
+            Payment(
+                reservation_id=reservation.pk,
+                amount=reservation.total_price,
+                status=plan[0],
+                payment_date=plan[1],
+                payment_method=rng.choice(PAYMENT_METHODS),
+                transaction_id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            )
+            for reservation, (_, plan) in zip(reservations, pairs)
+            if plan is not None
+        ]
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+    return len(reservations), len(payments)
+
+
+def generate(rooms, users, reservations, seed=0, password=DEFAULT_PASSWORD,
+             batch_size=BATCH_SIZE, transaction_rows=TRANSACTION_ROWS, progress=None):
+    """
+    Create the dataset and return the number of rows written per model.
+    progress, if given, is called with (model name, rows written so far).
+    Raises DatasetExists if the database already holds generated users.
+    """
+    if User.objects.filter(username__regex=GENERATED_USERNAME_RE).exists():
+        raise DatasetExists('The database already holds generated users')
+    rng = random.Random(seed)
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    password_hash = make_password(password)
+    counts = dict.fromkeys(('rooms', 'users', 'reservations', 'payments'), 0)
+
+    def report(model):
+        if progress:
+            progress(model, counts[model])
+
+    user_ids = []
+    for first in range(0, users, transaction_rows):
+        batch = _users(rng, first, min(transaction_rows, users - first), password_hash, now)
+        with transaction.atomic():
+            user_ids.extend(user.pk for user in User.objects.bulk_create(batch, batch_size=batch_size))
+        counts['users'] = len(user_ids)
+        report('users')
+
+    room_objects = _rooms(rng, rooms)
+    with transaction.atomic():
+        room_objects = Room.objects.bulk_create(room_objects, batch_size=batch_size)
+    counts['rooms'] = len(room_objects)
+    report('rooms')
+
+    per_room, extra = divmod(reservations, len(room_objects)) if room_objects and user_ids else (0, 0)
+    calendar = _Calendar(first_day(per_room + bool(extra)))
+    fields = (Reservation._meta.get_field('created_at'), Payment._meta.get_field('payment_date'))
+    with explicit_timestamps(*fields):
+        pairs = []
+        for index, room in enumerate(room_objects):
+            pairs.extend(_room_reservations(rng, room, per_room + (index < extra), calendar, user_ids, now))
+            if len(pairs) >= transaction_rows or index == len(room_objects) - 1:
+                written, paid = _write_reservations(rng, pairs, batch_size)
+                counts['reservations'] += written
+                counts['payments'] += paid
+                pairs = []
+                report('reservations')
+
+    # bulk_create sends no signals
+    availability.invalidate()
+    invalidate_dashboard_stats()
+    return counts
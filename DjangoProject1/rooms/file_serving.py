@@ -0,0 +1,205 @@
+"""
+Serving files from disk.
+
+serve_file() builds the response for one file: ETag and Last-Modified
+validators, 304/412 answers to conditional requests, single byte ranges
+(206/416), and a precompressed .br/.gz copy when the client accepts it and
+collectstatic wrote one.
+
+The body is a FileResponse over the open file, so a WSGI server providing
+wsgi.file_wrapper (gunicorn, uWSGI) sends it with sendfile() without copying
+it through Python, byte ranges included. With FILE_SERVING_OFFLOAD the body
+is not sent at all: the response only names the file, and the front proxy
+sends it, range and compression included.
+
+    # nginx
+    FILE_SERVING_OFFLOAD = 'x-accel-redirect'
+    FILE_SERVING_ACCEL_PREFIX = '/internal/'
+
+    location /internal/static/ { internal; alias /srv/app/staticfiles/; gzip_static on; }
+    location /internal/media/ { internal; alias /srv/app/media/; }
+
+    # Apache mod_xsendfile, lighttpd
+    FILE_SERVING_OFFLOAD = 'x-sendfile'
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """
+    Read-only view of the next length bytes of an open file. It keeps
+    fileno() and tell(), so wsgi.file_wrapper can still sendfile() the
+    range: servers bound it with the Content-Length header.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def close(self):
+        self.file.close()
+
+
+def accepts_encoding(accept_encoding, coding):
+    """Whether an Accept-Encoding header value allows coding (q=0 excluded)."""
+    weights = {}
+    for item in accept_encoding.lower().split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights.get(coding, weights.get('*', 0.0)) > 0
+
+
+def parse_range(header, size):
+    """
+    Return the (start, end) bytes, end included, asked by a Range header,
+    or None when the header is to be ignored (invalid or several ranges:
+    the whole file is sent). Raises RangeNotSatisfiable when the range
+    starts past the end of the file.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-500: the last 500 bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: only honour Range when the client still has this version."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date == int(last_modified)
+
+
+def serve_file(request, path, cache_control, internal_url=None):
+    """
+    Respond to a GET or HEAD request with the file at path.
+
+    internal_url is the name of the file for the front proxy, used instead
+    of sending the body when FILE_SERVING_OFFLOAD is set.
+    """
+    offload = getattr(settings, 'FILE_SERVING_OFFLOAD', None)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {'Cache-Control': cache_control}
+
+    encoding = None
+    if not offload:
+        available = [(coding, suffix) for coding, suffix in ENCODINGS if os.path.isfile(path + suffix)]
+        if available:
+            headers['Vary'] = 'Accept-Encoding'
+        # Ranges are of the identity representation
+        if 'Range' not in request.headers:
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+            for coding, suffix in available:
+                if accepts_encoding(accept_encoding, coding):
+                    encoding = coding
+                    path += suffix
+                    break
+
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(stat.st_mtime)
+
+    validators = HttpResponse()
+    for name, value in headers.items():
+        validators[name] = value
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime), response=validators)
+    if conditional is not validators:
+        return conditional
+
+    if offload:
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = internal_url
+        else:
+            response['X-Sendfile'] = path
+        return _with_headers(response, headers)
+
+    size = stat.st_size
+    start, end = 0, size - 1
+    status = 200
+    if encoding is None:
+        headers['Accept-Ranges'] = 'bytes'
+        if 'Range' in request.headers and range_applies(request, etag, stat.st_mtime):
+            try:
+                requested = parse_range(request.headers['Range'], size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return _with_headers(response, headers)
+            if requested is not None:
+                start, end = requested
+                status = 206
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        headers['Content-Encoding'] = encoding
+
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, status=status)
+    else:
+        file = open(path, 'rb')
+        file.seek(start)
+        response = FileResponse(FileRange(file, length), content_type=content_type, status=status)
+    response['Content-Length'] = length
+    return _with_headers(response, headers)
+
+
+def _with_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Reservation, Room, Payment
+from .utils import get_available_rooms
 from django.utils import timezone
 import datetime
 
@@ -80,13 +81,7 @@ class ReservationForm(forms.ModelForm):
                 self.add_error('room', 'Cette salle n\'est pas disponible.')
 
             # Check if the selected time overlaps with existing reservations
-            overlapping_reservations = Reservation.objects.filter(
-                room=room,
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            )
-            
-            if overlapping_reservations.exists():
+            if not get_available_rooms(room, start_time, end_time):
                 self.add_error('room', 'Cette salle est déjà réservée pour ces heures.')
 
             # Check minimum duration
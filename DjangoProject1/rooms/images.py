@@ -0,0 +1,171 @@
+"""
+Responsive variants of room images.
+
+Resized copies of a room image are written next to it under
+room_images/variants/ in every width of VARIANT_WIDTHS (never wider than the
+original) and every format of VARIANT_FORMATS the installed Pillow can
+encode. What was generated is kept in Room.image_variants so templates can
+build srcset attributes without touching the storage:
+
+    {"source": "room_images/salle.jpg", "width": 6016, "height": 4016,
+     "formats": {"avif": [400, 800], "webp": [400, 800], "jpeg": [400, 800]}}
+
+Encoding takes about a second and a half per image, so saving a room does
+not do it: refresh_room_variants() only drops the variants of a replaced
+image (or reuses those of another room showing the same file), and the
+generate_image_variants command, run with --watch next to the web server,
+generates the missing ones in the background. Until then the room_picture
+template tag (rooms.templatetags.room_extras) shows the original file.
+"""
+from functools import lru_cache
+from io import BytesIO
+import math
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+VARIANT_WIDTHS = (400, 800, 1200, 1600)
+VARIANT_DIR = 'variants'
+EXIF_ORIENTATION = 0x0112
+
+# Browsers pick the first <source> they support, so the best format goes first.
+# JPEG is the fallback of the <img> element itself. 'feature' is the name
+# PIL.features gives the encoder: AVIF needs Pillow 11.3 or a plugin.
+VARIANT_FORMATS = {
+    'avif': {'format': 'AVIF', 'mime': 'image/avif', 'feature': 'avif', 'options': {'quality': 55, 'speed': 8}},
+    'webp': {'format': 'WEBP', 'mime': 'image/webp', 'feature': 'webp', 'options': {'quality': 78, 'method': 4}},
+    'jpeg': {'format': 'JPEG', 'mime': 'image/jpeg', 'feature': 'jpg', 'options': {'quality': 80, 'optimize': True, 'progressive': True}},
+}
+
+
+@lru_cache(maxsize=None)
+def supported_formats():
+    """The entries of VARIANT_FORMATS whose encoder the installed Pillow has."""
+    from PIL import features
+
+    # get_supported() rather than check(): check() warns about the features
+    # an older Pillow does not know, such as avif before 11.3
+    supported = set(features.get_supported())
+    return {extension: spec for extension, spec in VARIANT_FORMATS.items() if spec['feature'] in supported}
+
+
+def variant_name(source_name, width, extension):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, VARIANT_DIR, f'{stem}-{width}w.{extension}').replace(os.sep, '/')
+
+
+def variant_names(variants):
+    """Every file listed in an image_variants value."""
+    source = variants.get('source')
+    if not source:
+        return []
+    return [
+        variant_name(source, width, extension)
+        for extension, widths in variants.get('formats', {}).items()
+        for width in widths
+    ]
+
+
+def generate_variants(source_name, storage=default_storage):
+    """
+    Write the variants of an image and return the matching image_variants
+    value. Existing variant files are overwritten.
+    """
+    from PIL import Image, ImageOps
+
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        # Size as displayed: orientations 5 to 8 turn the picture a quarter
+        original_width, original_height = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            original_width, original_height = original_height, original_width
+
+        # Let the JPEG decoder downscale by up to 8x while decoding, much
+        # faster than decoding a 24 Mpx photo at full size
+        scale = min(max(VARIANT_WIDTHS) / original_width, 1)
+        image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.load()
+
+    widths = [width for width in VARIANT_WIDTHS if width < original_width] or [original_width]
+    formats = {}
+    # Resize from the largest variant down so each step starts from a small image
+    current = image
+    for width in sorted(widths, reverse=True):
+        height = max(1, round(width * original_height / original_width))
+        current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for extension, spec in supported_formats().items():
+            buffer = BytesIO()
+            current.save(buffer, spec['format'], **spec['options'])
+            name = variant_name(source_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            formats.setdefault(extension, []).append(width)
+
+    return {
+        'source': source_name,
+        'width': original_width,
+        'height': original_height,
+        'formats': {extension: sorted(widths) for extension, widths in formats.items()},
+    }
+
+
+def delete_variants(variants, storage=default_storage):
+    for name in variant_names(variants):
+        storage.delete(name)
+
+
+def is_shared(source, room_pk):
+    """Whether a room other than room_pk shows the image file source."""
+    from .models import Room
+
+    return Room.objects.filter(image=source).exclude(pk=room_pk).exists()
+
+
+def release_variants(variants, room_pk):
+    """Delete the variants of a room image unless another room uses the same file."""
+    source = variants.get('source')
+    if source and not is_shared(source, room_pk):
+        delete_variants(variants)
+
+
+def needs_variants(source, variants):
+    return bool(source) and (variants or {}).get('source') != source
+
+
+def refresh_room_variants(room):
+    """
+    Bring the variants of a room in line with its current image without
+    encoding anything: reuse those of another room showing the same file,
+    else leave them to generate_image_variants, and remove those of a
+    replaced image.
+    """
+    from .models import Room
+
+    variants = room.image_variants or {}
+    source = room.image.name if room.image else ''
+    if variants.get('source', '') == source:
+        return
+
+    new_variants = {}
+    if source:
+        new_variants = (
+            Room.objects.filter(image=source, image_variants__source=source)
+            .exclude(pk=room.pk)
+            .values_list('image_variants', flat=True)
+            .first()
+        ) or {}
+
+    old_source = variants.get('source')
+    if old_source and not is_shared(old_source, room.pk):
+        for name in set(variant_names(variants)) - set(variant_names(new_variants)):
+            default_storage.delete(name)
+
+    # update() so that the post_save handler is not triggered again
+    Room.objects.filter(pk=room.pk).update(image_variants=new_variants)
+    room.image_variants = new_variants
@@ -0,0 +1,342 @@
+"""
+End-to-end load benchmark of the booking hot paths.
+
+The benchmark_load command seeds a dataset (rooms.dataset) in a database of
+its own, starts a local server on it (gunicorn when installed, Django's
+threaded WSGI server otherwise) and has concurrent clients send a weighted
+mix of requests through real HTTP for a fixed time. Each client is logged in
+as a dataset user and as a shared staff user by creating their sessions
+directly.
+
+summarize() turns the latencies into throughput and p50/p95/p99 per
+endpoint; compare() diffs a summary against a baseline saved earlier and
+flags the figures that got worse by more than a threshold.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.servers.basehttp import get_internal_wsgi_application
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+REQUEST_TIMEOUT = 120  # seconds; full exports of a large dataset are slow
+SERVER_START_TIMEOUT = 30  # seconds
+PERCENTILES = (50, 95, 99)
+# Figures compared with the baseline, and whether higher is better
+COMPARED = (('throughput', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False))
+
+
+def use_database(path):
+    """
+    Point the default connection at the SQLite file path, for this process
+    and, through DJANGO_DATABASE_PATH, for the servers it starts.
+    """
+    connection.close()
+    settings.DATABASES['default']['NAME'] = path
+    connection.settings_dict['NAME'] = path
+    os.environ['DJANGO_DATABASE_PATH'] = str(path)
+
+
+def login_session(user):
+    """Create a logged-in session for user and return its key."""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return session.session_key
+
+
+class Endpoint:
+    """
+    A request of the mix. build(client) returns (method, path, data);
+    answers with a status in ok_statuses count as successes, other statuses
+    and redirects to the login page as errors.
+    """
+
+    def __init__(self, name, weight, build, staff=False, ok_statuses=(200,)):
+        self.name = name
+        self.weight = weight
+        self.build = build
+        self.staff = staff
+        self.ok_statuses = ok_statuses
+
+
+def _booking(client):
+    # A slot during opening hours in the coming weeks; taken slots are
+    # answered with the form and its error, which is part of the hot path too
+    start = timezone.localtime() + timedelta(days=client.rng.randint(1, 60))
+    start = start.replace(hour=client.rng.randint(8, 17), minute=client.rng.choice((0, 30)), second=0, microsecond=0)
+    end = start + timedelta(minutes=30 * client.rng.randint(1, 6))
+    room_id = client.rng.choice(client.fixtures['available_room_ids'])
+    data = {
+        'room': room_id,
+        'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+        'end_time': end.strftime('%Y-%m-%dT%H:%M'),
+        'csrfmiddlewaretoken': client.csrf_token,
+    }
+    return 'POST', reverse('rooms:room_detail', args=[room_id]), data
+
+
+def _reservations_export(client):
+    # One month of reservations, as exported from the dashboard
+    month = client.fixtures['start'] + timedelta(days=30 * client.rng.randrange(12))
+    query = f'?start_date={month:%Y-%m-%d}&end_date={month + timedelta(days=30):%Y-%m-%d}'
+    return 'GET', reverse('rooms:export_reservations_csv') + query, None
+
+
+ENDPOINTS = [
+    Endpoint('room_list', 25, lambda client: ('GET', reverse('rooms:room_list'), None)),
+    Endpoint('room_detail', 25, lambda client: (
+        'GET', reverse('rooms:room_detail', args=[client.rng.choice(client.fixtures['room_ids'])]), None,
+    )),
+    Endpoint('room_detail_post', 5, _booking, ok_statuses=(200, 302)),
+    Endpoint('my_reservations', 15, lambda client: ('GET', reverse('rooms:my_reservations'), None)),
+    Endpoint('download_pdf', 10, lambda client: (
+        'GET', reverse('rooms:download_pdf', args=[client.rng.choice(client.reservation_ids)]), None,
+    )),
+    Endpoint('admin_dashboard', 10, lambda client: ('GET', reverse('rooms:admin_dashboard'), None), staff=True),
+    Endpoint('export_rooms_csv', 5, lambda client: ('GET', reverse('rooms:export_rooms_csv'), None), staff=True),
+    Endpoint('export_reservations_csv', 5, _reservations_export, staff=True),
+]
+
+
+class Client:
+    """One simulated user, with its own HTTP connections and random stream."""
+
+    def __init__(self, base_url, fixtures, user_session, staff_session, reservation_ids, seed):
+        self.base_url = base_url
+        self.fixtures = fixtures
+        self.reservation_ids = reservation_ids
+        self.rng = random.Random(seed)
+        self.csrf_token = None
+        self.sessions = {}
+        for staff, key in ((False, user_session), (True, staff_session)):
+            http = requests.Session()
+            http.cookies.set(settings.SESSION_COOKIE_NAME, key)
+            self.sessions[staff] = http
+
+    def prepare(self):
+        """Fetch a booking form for its CSRF token (and cookie)."""
+        path = reverse('rooms:room_detail', args=[self.fixtures['available_room_ids'][0]])
+        response = self.sessions[False].get(self.base_url + path, timeout=REQUEST_TIMEOUT)
+        match = CSRF_TOKEN_RE.search(response.text)
+        if match is None:
+            raise RuntimeError(f'No booking form at {path} (status {response.status_code}), is the user logged in?')
+        self.csrf_token = match.group(1)
+
+    def close(self):
+        for http in self.sessions.values():
+            http.close()
+
+    def send(self, endpoint):
+        """Send one request of endpoint and return (seconds, ok)."""
+        method, path, data = endpoint.build(self)
+        started = time.perf_counter()
+        try:
+            response = self.sessions[endpoint.staff].request(
+                method, self.base_url + path, data=data, allow_redirects=False, timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException:
+            return time.perf_counter() - started, False
+        elapsed = time.perf_counter() - started
+        login_url = reverse(settings.LOGIN_URL)
+        ok = response.status_code in endpoint.ok_statuses and not response.headers.get('Location', '').startswith(login_url)
+        return elapsed, ok
+
+    def run(self, endpoints, deadline):
+        """Send requests until deadline; return {name: (latencies, errors)}."""
+        weights = [endpoint.weight for endpoint in endpoints]
+        latencies = {endpoint.name: [] for endpoint in endpoints}
+        errors = dict.fromkeys(latencies, 0)
+        while time.monotonic() < deadline:
+            endpoint = self.rng.choices(endpoints, weights)[0]
+            elapsed, ok = self.send(endpoint)
+            latencies[endpoint.name].append(elapsed)
+            errors[endpoint.name] += not ok
+        return {name: (latencies[name], errors[name]) for name in latencies}
+
+
+def run_load(clients, endpoints, duration):
+    """
+    Run every client concurrently for duration seconds; return
+    ({name: (latencies, errors)} over all clients, elapsed seconds).
+    """
+    for client in clients:
+        client.prepare()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            per_client = list(executor.map(lambda client: client.run(endpoints, deadline), clients))
+    finally:
+        for client in clients:
+            client.close()
+    elapsed = time.perf_counter() - started
+
+    latencies = {endpoint.name: [] for endpoint in endpoints}
+    errors = dict.fromkeys(latencies, 0)
+    for results in per_client:
+        for name, (client_latencies, client_errors) in results.items():
+            latencies[name].extend(client_latencies)
+            errors[name] += client_errors
+    return {name: (latencies[name], errors[name]) for name in latencies}, elapsed
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _figures(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    figures = {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput': round(len(ordered) / elapsed, 2),
+        'mean_ms': round(sum(ordered) * 1000 / len(ordered), 2) if ordered else None,
+    }
+    for p in PERCENTILES:
+        value = percentile(ordered, p)
+        figures[f'p{p}_ms'] = round(value * 1000, 2) if value is not None else None
+    return figures
+
+
+def summarize(merged, elapsed):
+    """Figures per endpoint and for the whole mix (key 'total')."""
+    summary = {name: _figures(latencies, errors, elapsed) for name, (latencies, errors) in merged.items()}
+    summary['total'] = _figures(
+        [latency for latencies, _ in merged.values() for latency in latencies],
+        sum(errors for _, errors in merged.values()),
+        elapsed,
+    )
+    return summary
+
+
+def compare(summary, baseline, threshold):
+    """
+    Rows (endpoint, figure, baseline, current, relative change, regressed)
+    for the endpoints of both summaries. A figure regresses when it got
+    worse by more than threshold (0.1 is 10%); an endpoint also regresses
+    when it has errors and had none.
+    """
+    rows = []
+    for name, figures in summary.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for figure, higher_is_better in COMPARED:
+            old, new = before.get(figure), figures.get(figure)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append((name, figure, old, new, change, worse > threshold))
+        if figures['errors'] and not before.get('errors'):
+            rows.append((name, 'errors', 0, figures['errors'], None, True))
+    return rows
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for_port(port, process=None):
+    limit = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < limit:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'The server exited with status {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'The server did not listen on port {port} within {SERVER_START_TIMEOUT}s')
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """
+    Context manager running the project on 127.0.0.1; url is its base URL.
+    'gunicorn' starts gunicorn (gthread workers) in a child process and
+    'threaded' serves from threads of this process, which then share the
+    interpreter with the clients: use it when gunicorn is not installed.
+    """
+
+    def __init__(self, kind='gunicorn', workers=4, threads=4):
+        self.kind = kind
+        self.workers = workers
+        self.threads = threads
+        self.process = None
+        self.server = None
+        self.url = None
+
+    def __enter__(self):
+        if self.kind == 'gunicorn':
+            port = _free_port()
+            module, name = settings.WSGI_APPLICATION.rsplit('.', 1)
+            self.process = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn', f'{module}:{name}',
+                    '--bind', f'127.0.0.1:{port}',
+                    '--workers', str(self.workers),
+                    '--threads', str(self.threads),
+                    '--worker-class', 'gthread',
+                    '--timeout', str(REQUEST_TIMEOUT),
+                    '--graceful-timeout', '5',
+                    '--log-level', 'warning',
+                ],
+                cwd=settings.BASE_DIR,
+                env=os.environ.copy(),
+            )
+            try:
+                _wait_for_port(port, self.process)
+            except BaseException:
+                self.__exit__(None, None, None)
+                raise
+        else:
+            self.server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+            self.server.set_app(get_internal_wsgi_application())
+            port = self.server.server_address[1]
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{port}'
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=SERVER_START_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
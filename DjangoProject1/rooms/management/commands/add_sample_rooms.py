@@ -1,10 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.core.files import File
-from django.conf import settings
-import requests
-from io import BytesIO
-import os
-from rooms.models import Room
+from rooms.seeding import seed_rooms
 
 class Command(BaseCommand):
     help = 'Adds sample rooms to the database'
@@ -68,46 +63,7 @@ class Command(BaseCommand):
             }
         ]
 
-        # Create media directory if it doesn't exist
-        media_dir = os.path.join(settings.MEDIA_ROOT, 'room_images')
-        os.makedirs(media_dir, exist_ok=True)
-        
-        # Clear existing rooms
-        Room.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS("Existing rooms deleted."))
-
-        for room_data in rooms_data:
-            try:
-                # Create room object
-                room = Room.objects.create(
-                    name=room_data['name'],
-                    description=room_data['description'],
-                    capacity=room_data['capacity'],
-                    price_per_hour=room_data['price_per_hour'],
-                    is_available=room_data['is_available']
-                )
-                
-                # Download and save image
-                try:
-                    response = requests.get(room_data['image_url'])
-                    image_content = BytesIO(response.content)
-                    
-                    image_name = f"{room_data['name'].lower().replace(' ', '_')}.jpg"
-                    image_path = os.path.join(media_dir, image_name)
-                    
-                    with open(image_path, 'wb') as f:
-                        f.write(image_content.getvalue())
-                    
-                    with open(image_path, 'rb') as f:
-                        room.image.save(image_name, File(f), save=True)
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f"Error downloading image for {room_data['name']}: {e}"))
-                
-                # Add amenities
-                for amenity in room_data['amenities']:
-                    room.amenities.append(amenity)
-                room.save()
-                
-                self.stdout.write(self.style.SUCCESS(f"Added room: {room.name}"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error adding room {room_data['name']}: {e}")) 
\ No newline at end of file
+        result = seed_rooms(rooms_data, replace=True)
+        for url, error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Error downloading image {url}: {error}"))
+        self.stdout.write(self.style.SUCCESS(f"Added {result['created']} rooms."))
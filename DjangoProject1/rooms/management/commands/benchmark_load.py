@@ -0,0 +1,212 @@
+import importlib.util
+import json
+import os
+import platform
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from rooms import dataset
+from rooms.load_benchmark import ENDPOINTS, Client, LocalServer, compare, login_session, run_load, summarize, use_database
+from rooms.models import Reservation, Room
+
+STAFF_USERNAME = 'benchmark_staff'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a dataset in a database of its own, serves it on a local server and '
+        'sends a concurrent mix of requests to the booking hot paths, then reports '
+        'throughput and p50/p95/p99 latency per endpoint, optionally against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=os.path.join(settings.BASE_DIR, 'benchmark.sqlite3'),
+                            help='SQLite file of the benchmark, seeded if it has no rooms')
+        parser.add_argument('--reseed', action='store_true', help='Delete the benchmark database and seed it again')
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--reservations', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the dataset and of the request mix')
+        parser.add_argument('--server', choices=['auto', 'gunicorn', 'threaded'], default='auto',
+                            help='gunicorn if installed with auto, else the threaded WSGI server')
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds of load')
+        parser.add_argument('--endpoints', help=f'Comma-separated subset of: {", ".join(e.name for e in ENDPOINTS)}')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+        parser.add_argument('--threshold', type=float, default=10,
+                            help='Regression threshold in percent for --baseline')
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options['endpoints']:
+            names = options['endpoints'].split(',')
+            unknown = set(names) - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+        if options['clients'] < 1:
+            raise CommandError('--clients must be at least 1')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as source:
+                    baseline = json.load(source)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["baseline"]}: {e}')
+
+        server = options['server']
+        if server == 'auto':
+            server = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'threaded'
+
+        path = os.path.abspath(options['database'])
+        if os.path.abspath(str(settings.DATABASES['default']['NAME'])) == path:
+            raise CommandError('--database must not be the database of the project')
+        if options['reseed']:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        use_database(path)
+        call_command('migrate', verbosity=0, interactive=False)
+
+        if not Room.objects.exists():
+            self.seed(options)
+        counts = {
+            'rooms': Room.objects.count(),
+            'users': User.objects.count(),
+            'reservations': Reservation.objects.count(),
+        }
+        self.stdout.write(
+            f'Dataset: {counts["rooms"]} rooms, {counts["users"]} users, {counts["reservations"]} reservations in {path}'
+        )
+
+        clients = self.make_clients(options)
+        self.stdout.write(
+            f'{len(clients)} clients for {options["duration"]:g}s against {server}'
+            + (f' ({options["workers"]} workers x {options["threads"]} threads)' if server == 'gunicorn' else '')
+        )
+        with LocalServer(server, options['workers'], options['threads']) as local:
+            for client in clients:
+                client.base_url = local.url
+            try:
+                merged, elapsed = run_load(clients, endpoints, options['duration'])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+        summary = summarize(merged, elapsed)
+        self.report(summary)
+
+        if options['output']:
+            results = {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'debug': settings.DEBUG,
+                    'server': server,
+                    'workers': options['workers'] if server == 'gunicorn' else 1,
+                    'threads': options['threads'] if server == 'gunicorn' else None,
+                    'clients': len(clients),
+                    'duration': options['duration'],
+                    'seed': options['seed'],
+                },
+                'dataset': counts,
+                'endpoints': summary,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            self.report_comparison(summary, baseline, options['threshold'])
+
+    def seed(self, options):
+        if min(options['rooms'], options['users'], options['reservations']) < 1:
+            raise CommandError('--rooms, --users and --reservations must be at least 1')
+
+        def progress(model, count):
+            self.stdout.write(f'  {count} {model}', ending='\r')
+            self.stdout.flush()
+
+        started = time.perf_counter()
+        created = dataset.generate(
+            options['rooms'], options['users'], options['reservations'], seed=options['seed'], progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+        rows = sum(created.values())
+        self.stdout.write(f'Seeded {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)')
+
+    def make_clients(self, options):
+        """Log in one dataset user per client, plus a staff user shared by all."""
+        staff, _ = User.objects.get_or_create(
+            username=STAFF_USERNAME,
+            defaults={'is_staff': True, 'password': UNUSABLE_PASSWORD_PREFIX},
+        )
+        staff_session = login_session(staff)
+
+        users = list(
+            User.objects.filter(is_staff=False, is_active=True)
+            .exclude(username=STAFF_USERNAME)
+            .order_by('pk')[:options['clients']]
+        )
+        if not users:
+            raise CommandError('The benchmark database has no users')
+        reservation_ids = {user.pk: [] for user in users}
+        for user_id, pk in Reservation.objects.filter(user__in=users).values_list('user_id', 'pk'):
+            reservation_ids[user_id].append(pk)
+
+        room_ids = list(Room.objects.values_list('pk', flat=True))
+        available_room_ids = list(Room.objects.filter(is_available=True).values_list('pk', flat=True))
+        if not available_room_ids:
+            raise CommandError('The benchmark database has no available room')
+        fixtures = {
+            'room_ids': room_ids,
+            'available_room_ids': available_room_ids,
+            'start': Reservation.objects.aggregate(start=Min('start_time'))['start'] or dataset.dataset_start(),
+        }
+
+        clients = []
+        for i in range(options['clients']):
+            user = users[i % len(users)]
+            if not reservation_ids[user.pk]:
+                raise CommandError(f'User {user.username} has no reservations to download')
+            clients.append(Client(
+                None, fixtures, login_session(user), staff_session, reservation_ids[user.pk], options['seed'] + i,
+            ))
+        return clients
+
+    def report(self, summary):
+        self.stdout.write(
+            f'{"endpoint":<26}{"requests":>9}{"errors":>8}{"req/s":>9}'
+            f'{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+        )
+        for name, figures in summary.items():
+            if not figures['requests']:
+                self.stdout.write(f'{name:<26}{0:>9}')
+                continue
+            self.stdout.write(
+                f'{name:<26}{figures["requests"]:>9}{figures["errors"]:>8}{figures["throughput"]:>9.1f}'
+                f'{figures["mean_ms"]:>10.1f}{figures["p50_ms"]:>10.1f}{figures["p95_ms"]:>10.1f}{figures["p99_ms"]:>10.1f}'
+            )
+
+    def report_comparison(self, summary, baseline, threshold):
+        rows = compare(summary, baseline.get('endpoints', {}), threshold / 100)
+        self.stdout.write(f'Compared with the baseline of {baseline.get("created", "?")}:')
+        for name, figure, old, new, change, regressed in rows:
+            line = f'{name:<26}{figure:<12}{old:>10g} -> {new:<10g}'
+            if change is not None:
+                line += f'{change * 100:+7.1f}%'
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        regressions = [row for row in rows if row[-1]]
+        if regressions:
+            raise CommandError(f'{len(regressions)} figures regressed by more than {threshold:g}%')
+        self.stdout.write(self.style.SUCCESS(f'No regression beyond {threshold:g}%.'))
@@ -0,0 +1,42 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.models import Reservation
+from rooms.utils import generate_reservation_receipt
+
+
+class Command(BaseCommand):
+    help = 'Measures the time and size of rendering receipts, without touching the receipt cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='Receipts to render')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed renders before measuring')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        reservations = list(Reservation.objects.select_related('room', 'user').order_by('pk')[:count])
+        if not reservations:
+            raise CommandError('No reservation to render')
+
+        for i in range(options['warmup']):
+            generate_reservation_receipt(reservations[i % len(reservations)])
+
+        timings = []
+        sizes = []
+        for i in range(count):
+            reservation = reservations[i % len(reservations)]
+            started = time.perf_counter()
+            pdf = generate_reservation_receipt(reservation)
+            timings.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(pdf))
+
+        timings.sort()
+        self.stdout.write(f'Receipts: {count} ({len(reservations)} distinct reservations)')
+        self.stdout.write(
+            f'Latency: mean {statistics.mean(timings):.2f} ms, '
+            f'p50 {timings[len(timings) // 2]:.2f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms'
+        )
+        self.stdout.write(f'Size: mean {statistics.mean(sizes) / 1024:.1f} KiB, total {sum(sizes) / 1024:.0f} KiB')
@@ -0,0 +1,123 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rooms.models import Room
+
+# Settings before the low-write session engine, for comparison
+LEGACY_SETTINGS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'SESSION_SAVE_EVERY_REQUEST': True,
+    'MESSAGE_STORAGE': 'django.contrib.messages.storage.session.SessionStorage',
+}
+WRITE_VERBS = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE'}
+
+
+class WriteTrace:
+    """
+    sqlite3 trace callback counting what takes the database write lock:
+    transactions that write (or start with BEGIN IMMEDIATE) and writes
+    made in autocommit mode, which are transactions of their own.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.statements = 0
+        self.session_statements = 0
+        self.in_transaction = False
+        self.locked = False
+
+    def __call__(self, sql):
+        words = sql.split(None, 2)
+        verb = words[0].upper() if words else ''
+        if verb == 'BEGIN':
+            self.in_transaction = True
+            self.locked = len(words) > 1 and words[1].upper() in ('IMMEDIATE', 'EXCLUSIVE')
+            self.transactions += self.locked
+        elif verb in ('COMMIT', 'END', 'ROLLBACK') and 'TO' not in sql.upper():
+            self.in_transaction = False
+        elif verb in WRITE_VERBS:
+            self.statements += 1
+            self.session_statements += 'django_session' in sql
+            if not self.in_transaction or not self.locked:
+                self.transactions += 1
+                self.locked = self.in_transaction
+
+    def attach(self, sender=None, connection=None, **kwargs):
+        if connection.vendor == 'sqlite':
+            connection.connection.set_trace_callback(self)
+
+
+class Command(BaseCommand):
+    help = (
+        'Browses a few pages as a logged-in user with the current session settings '
+        'and with the previous ones (database sessions saved on every request, '
+        'messages in the session), and reports write transactions per page view'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=300, help='Page views per mode')
+
+    def handle(self, *args, **options):
+        room = Room.objects.order_by('pk').first()
+        pages = [reverse('rooms:room_list'), reverse('rooms:my_reservations')]
+        if room is not None:
+            pages.append(reverse('rooms:room_detail', args=[room.pk]))
+            if room.image:
+                pages.append(room.image.url)
+        # Adds a flash message, shown on the same page
+        pages.append(reverse('rooms:room_list') + '?min_capacity=x')
+
+        user = User.objects.create_user(username=f'bench_{uuid.uuid4().hex[:8]}')
+        try:
+            results = [
+                ('previous', self.browse(user, pages, options['views'], LEGACY_SETTINGS)),
+                ('current', self.browse(user, pages, options['views'], {})),
+            ]
+        finally:
+            user.delete()
+
+        self.stdout.write(f'{options["views"]} page views per mode over: {", ".join(pages)}')
+        self.stdout.write(f'{"mode":<10}{"write txn/view":>16}{"writes/view":>14}{"session writes/view":>22}{"ms/view":>10}')
+        for mode, (trace, elapsed) in results:
+            views = options['views']
+            self.stdout.write(
+                f'{mode:<10}{trace.transactions / views:>16.3f}{trace.statements / views:>14.3f}'
+                f'{trace.session_statements / views:>22.3f}{elapsed * 1000 / views:>10.2f}'
+            )
+
+    def browse(self, user, pages, views, settings_overrides):
+        trace = WriteTrace()
+        # The test client sends Host: testserver
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=allowed_hosts, **settings_overrides):
+            client = Client()
+            client.force_login(user)
+            client.get(pages[0])
+
+            connection.ensure_connection()
+            trace.attach(connection=connection)
+            connection_created.connect(trace.attach)
+            try:
+                started = time.perf_counter()
+                for i in range(views):
+                    response = client.get(pages[i % len(pages)])
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    if response.status_code >= 400:
+                        raise CommandError(f'{pages[i % len(pages)]} returned HTTP {response.status_code}')
+                elapsed = time.perf_counter() - started
+            finally:
+                connection_created.disconnect(trace.attach)
+                if connection.connection is not None:
+                    connection.connection.set_trace_callback(None)
+            client.logout()
+        return trace, elapsed
@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from rooms.load_benchmark import percentile, use_database
+from rooms.models import Reservation, Room
+
+# name: (SQLITE_PRAGMAS, SQLITE_WRITE_QUEUE), None for the configured value
+MODES = {
+    'defaults': ({}, False),
+    'profile': (None, False),
+    'profile + queue': (None, True),
+}
+
+
+def _init_worker(path, pragmas, write_queue, timeout):
+    import django
+
+    # Already done when the pool forks, required when it spawns
+    django.setup()
+
+    # A session cache of its own per mode: set() lists the cache directory,
+    # which would otherwise grow from one mode to the next
+    settings.CACHES[settings.SESSION_CACHE_ALIAS] = {
+        **settings.CACHES[settings.SESSION_CACHE_ALIAS],
+        'LOCATION': f'{path}.sessions',
+    }
+    settings.SQLITE_PRAGMAS = pragmas
+    settings.SQLITE_WRITE_QUEUE = write_queue
+    if timeout is not None:
+        settings.DATABASES['default']['OPTIONS']['timeout'] = timeout
+        if 'busy_timeout' in pragmas:
+            settings.SQLITE_PRAGMAS = {**pragmas, 'busy_timeout': int(timeout * 1000)}
+    use_database(path)
+
+
+def _client(plan, start_at):
+    """
+    Run one thread's operations; return {'write': latencies, 'read': latencies,
+    'write_errors': n, 'read_errors': n, 'conflicts': n}.
+    """
+    from rooms.sessions import SessionStore
+    from rooms.utils import book_room
+
+    results = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0, 'conflicts': 0}
+    time.sleep(max(0, start_at - time.time()))
+    try:
+        for kind, args in plan:
+            group = 'read' if kind == 'read' else 'write'
+            started = time.perf_counter()
+            try:
+                if kind == 'book':
+                    room_id, user_id, start_time, end_time = args
+                    book_room(Reservation(
+                        room_id=room_id, user_id=user_id, start_time=start_time, end_time=end_time,
+                        total_price=Decimal('10.00'),
+                    ))
+                elif kind == 'session':
+                    session = SessionStore()
+                    session['counter'] = args
+                    session.create()
+                else:
+                    room_id, start_time = args
+                    Reservation.objects.filter(room_id=room_id, start_time__gte=start_time).count()
+            except ValidationError:
+                results['conflicts'] += 1
+            except OperationalError:
+                results[f'{group}_errors'] += 1
+                continue
+            results[group].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return results
+
+
+def _process(plans, start_at):
+    """Run the plans of one process on as many threads; return their results and the finish time."""
+    with ThreadPoolExecutor(max_workers=len(plans)) as executor:
+        results = list(executor.map(lambda plan: _client(plan, start_at), plans))
+    return results, time.time()
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent booking and session writes, with reads in between, from several '
+        'processes and threads against copies of one SQLite database, with SQLite defaults, '
+        'with the SQLITE_PRAGMAS profile and with the write queue too. Reports writes/s, '
+        'the share of writes and reads failing with "database is locked" and their latency, '
+        'and the bookings refused as overlapping'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=4, help='Threads per process')
+        parser.add_argument('--writes', type=int, default=100, help='Write operations per thread')
+        parser.add_argument('--reads', type=int, default=2, help='Reads after each write')
+        parser.add_argument('--rooms', type=int, default=20)
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='Seconds a writer waits for the lock, in every mode (default: as configured)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        profile = getattr(settings, 'SQLITE_PRAGMAS', {})
+        directory = tempfile.mkdtemp(prefix='benchmark_sqlite_')
+        try:
+            template = os.path.join(directory, 'template.sqlite3')
+            room_ids, user_ids = self.create_template(template, options)
+            clients = options['processes'] * options['threads']
+            plans = [self.plan(rng, room_ids, user_ids[i], options) for i in range(clients)]
+
+            self.stdout.write(
+                f'{options["processes"]} processes x {options["threads"]} threads, {options["writes"]} writes '
+                f'(half bookings, half new sessions) and {options["reads"] * options["writes"]} reads per thread'
+            )
+            self.stdout.write(
+                f'{"mode":<18}{"writes/s":>10}{"w.failed":>10}{"w.p95 ms":>9}{"w.p99 ms":>9}'
+                f'{"r.failed":>10}{"r.p95 ms":>9}{"refused":>11}'
+            )
+            for mode, (pragmas, queue) in MODES.items():
+                path = os.path.join(directory, f'{len(os.listdir(directory))}.sqlite3')
+                shutil.copy(template, path)
+                self.run_mode(mode, path, profile if pragmas is None else pragmas, queue, plans, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def create_template(self, path, options):
+        # The template keeps SQLite's defaults (rollback journal): every mode
+        # starts from a copy of it and sets its own journal mode
+        settings.SQLITE_PRAGMAS = {}
+        use_database(path)
+        call_command('migrate', verbosity=0, interactive=False)
+        rooms = Room.objects.bulk_create(
+            Room(name=f'Salle {i + 1}', capacity=10, description='Salle de test', price_per_hour=Decimal('10.00'))
+            for i in range(options['rooms'])
+        )
+        users = User.objects.bulk_create(
+            User(username=f'writer{i + 1}', password='!')
+            for i in range(options['processes'] * options['threads'])
+        )
+        connection.close()
+        return [room.pk for room in rooms], [user.pk for user in users]
+
+    def plan(self, rng, room_ids, user_id, options):
+        base = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        operations = []
+        for i in range(options['writes']):
+            if i % 2:
+                operations.append(('session', i))
+            else:
+                start_time = base + timedelta(hours=rng.randrange(24 * 30))
+                operations.append(('book', (rng.choice(room_ids), user_id, start_time, start_time + timedelta(hours=1))))
+            for _ in range(options['reads']):
+                operations.append(('read', (rng.choice(room_ids), base + timedelta(days=rng.randrange(30)))))
+        return operations
+
+    def run_mode(self, mode, path, pragmas, queue, plans, options):
+        threads = options['threads']
+        per_process = [plans[i:i + threads] for i in range(0, len(plans), threads)]
+        start_at = time.time() + 2  # leaves time for every worker to start
+        with ProcessPoolExecutor(
+            max_workers=options['processes'],
+            initializer=_init_worker,
+            initargs=(path, pragmas, queue, options['timeout']),
+        ) as executor:
+            results = list(executor.map(_process, per_process, [start_at] * len(per_process)))
+        elapsed = max(finished for _, finished in results) - start_at
+
+        clients = [client for client_results, _ in results for client in client_results]
+        totals = {key: sum(client[key] for client in clients) for key in ('write_errors', 'read_errors', 'conflicts')}
+        writes = sorted(latency for client in clients for latency in client['write'])
+        reads = sorted(latency for client in clients for latency in client['read'])
+        write_p95, write_p99 = (percentile(writes, p) or 0 for p in (95, 99))
+        read_p95 = percentile(reads, 95) or 0
+        self.stdout.write(
+            f'{mode:<18}{len(writes) / elapsed:>10.1f}{totals["write_errors"] / (len(writes) + totals["write_errors"]):>10.1%}'
+            f'{write_p95 * 1000:>9.1f}{write_p99 * 1000:>9.1f}'
+            f'{totals["read_errors"] / max(1, len(reads) + totals["read_errors"]):>10.1%}{read_p95 * 1000:>9.1f}'
+            f'{totals["conflicts"]:>11}'
+        )
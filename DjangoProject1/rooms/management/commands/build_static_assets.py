@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.assets import build_assets, package_static_dir
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds static/vendor/ from the django-bootstrap-static and fontawesomefree '
+        'packages, keeping only the CSS rules and icons used by the project'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Target directory (default: static/vendor)')
+        parser.add_argument('--bootstrap-dir', help='Static directory of Bootstrap (css/ and js/)')
+        parser.add_argument('--fontawesome-dir', help='Static directory of Font Awesome (css/ and webfonts/)')
+
+    def handle(self, *args, **options):
+        sources = {
+            'bootstrap': options['bootstrap_dir'] or package_static_dir('bootstrap'),
+            'fontawesomefree': options['fontawesome_dir'] or package_static_dir('fontawesomefree'),
+        }
+        try:
+            written = build_assets(options['output'], sources['bootstrap'], sources['fontawesomefree'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        base_dir = Path(settings.BASE_DIR)
+        total = 0
+        for path in written:
+            size = path.stat().st_size
+            total += size
+            name = path.relative_to(base_dir) if base_dir in path.parents else path
+            self.stdout.write(f'{name}: {size / 1024:.1f} KiB')
+        self.stdout.write(self.style.SUCCESS(f'{len(written)} files written, {total / 1024:.1f} KiB'))
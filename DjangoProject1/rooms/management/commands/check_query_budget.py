@@ -0,0 +1,123 @@
+from datetime import timedelta
+from decimal import Decimal
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.models import Room, Reservation, Payment
+from rooms.query_detector import detect_queries
+from rooms.utils import invalidate_dashboard_stats
+
+# List views of rooms.urls and the query count each may use for one page,
+# whatever the number of rows behind it (the session comes from the cache
+# and is not written back, see rooms.sessions)
+QUERY_BUDGETS = {
+    'rooms:room_list': 3,
+    'rooms:my_reservations': 3,
+    'rooms:admin_dashboard': 10,
+    'rooms:manage_rooms': 2,
+    'rooms:manage_users': 2,
+    'rooms:export_rooms_csv': 2,
+    'rooms:export_reservations_csv': 2,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def allow_test_client():
+    """Accept the Host header of the test client ('testserver') for a while."""
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every list view with a small and a large dataset and fails '
+        'if the number of queries grows with the data or exceeds its budget, '
+        'or if the same query shape repeats within a page (N+1). '
+        'All rows created are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2, help='Rows per model in the first pass')
+        parser.add_argument('--large', type=int, default=30, help='Rows per model in the second pass')
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            with allow_test_client(), transaction.atomic():
+                user = User.objects.create_user(username=f'budget_{uuid.uuid4().hex[:8]}', is_staff=True)
+                client = Client()
+                client.force_login(user)
+
+                self.populate(user, options['small'])
+                small, _ = self.measure(client)
+                self.populate(user, options['large'] - options['small'])
+                large, problems = self.measure(client)
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, budget in QUERY_BUDGETS.items():
+            line = f'{name}: {small[name]} queries ({options["small"]} rows), {large[name]} queries ({options["large"]} rows), budget {budget}'
+            if large[name] != small[name] or large[name] > budget:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(problem))
+        if problems:
+            failures.append('repeated queries')
+
+        if failures:
+            raise CommandError('Query budget exceeded in: ' + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All list views run a constant number of queries.'))
+
+    def populate(self, user, count):
+        tag = uuid.uuid4().hex[:8]
+        start_time = timezone.now() + timedelta(days=1)
+        for i in range(count):
+            room = Room.objects.create(
+                name=f'Budget {tag} {i}',
+                capacity=10,
+                description='Salle temporaire',
+                price_per_hour=Decimal('10.00'),
+            )
+            User.objects.create_user(username=f'budget_{tag}_{i}')
+            reservation = Reservation.objects.create(
+                room=room,
+                user=user,
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=1),
+                total_price=Decimal('10.00'),
+            )
+            Payment.objects.create(
+                reservation=reservation,
+                amount=reservation.total_price,
+                payment_method='cash',
+                transaction_id=str(uuid.uuid4()),
+            )
+
+    def measure(self, client):
+        counts = {}
+        problems = []
+        for name in QUERY_BUDGETS:
+            invalidate_dashboard_stats()
+            with CaptureQueriesContext(connection) as queries, detect_queries(name, raise_errors=False) as detector:
+                response = client.get(reverse(name))
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code != 200:
+                raise CommandError(f'{name} returned HTTP {response.status_code}')
+            counts[name] = len(queries)
+            problems.extend(detector.problems(name))
+        return counts, problems
@@ -0,0 +1,68 @@
+from datetime import timedelta
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from rooms.models import Room, Reservation
+from rooms.utils import build_search_windows, filter_free_rooms
+
+TABLE = Reservation._meta.db_table
+
+# Plan lines that mean the reservation table is read row by row. SQLite
+# reports subqueries by their alias (U0, U1...), which in the queries below
+# always refer to the reservation table.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(rf'\bSCAN ({TABLE}|U\d+)\b(?! USING)'),
+    'postgresql': re.compile(rf'\bSeq Scan on {TABLE}\b'),
+}
+
+
+def hot_queries():
+    """
+    The reservation queries issued by the booking, listing and dashboard
+    views, built with representative parameters.
+    """
+    room_id = Room.objects.values_list('pk', flat=True).first() or 0
+    user_id = User.objects.values_list('pk', flat=True).first() or 0
+    start_time = timezone.now() + timedelta(days=1)
+    end_time = start_time + timedelta(hours=2)
+
+    return {
+        'overlap check (book_room)': Reservation.objects.filter(
+            room_id=room_id,
+            start_time__lt=end_time,
+            end_time__gt=start_time,
+        ).exclude(status='cancelled'),
+        'free rooms search (room_list)': filter_free_rooms(
+            Room.objects.all(),
+            build_search_windows(start_time, end_time),
+        ),
+        'my_reservations': Reservation.objects.filter(user_id=user_id).order_by('-created_at'),
+        'pending reservations (admin_dashboard)': Reservation.objects.filter(status='pending').order_by('-created_at'),
+        'confirmed count (admin_dashboard)': Reservation.objects.filter(status='confirmed'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot reservation queries and fails if any does a full table scan'
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Unsupported database backend: {connection.vendor}')
+
+        failures = []
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if pattern.search(plan):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR('  -> full scan of %s' % TABLE))
+
+        if failures:
+            raise CommandError('Full table scan in: ' + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,53 @@
+from datetime import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rooms.models import Reservation
+from rooms.receipts import stream_receipts_zip
+
+
+class Command(BaseCommand):
+    help = 'Renders the receipts of many reservations in parallel into a ZIP archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the ZIP file to write')
+        parser.add_argument('--month', help='Only reservations starting in this month (YYYY-MM)')
+        parser.add_argument('--status', choices=[choice for choice, _ in Reservation.STATUS_CHOICES])
+        parser.add_argument('--paid', action='store_true', help='Only paid reservations')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core)')
+
+    def handle(self, *args, **options):
+        reservations = Reservation.objects.select_related('room', 'user').order_by('pk')
+
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m')
+            except ValueError:
+                raise CommandError('--month must be formatted as YYYY-MM')
+            start = timezone.make_aware(month)
+            end = timezone.make_aware(month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1))
+            reservations = reservations.filter(start_time__gte=start, start_time__lt=end)
+        if options['status']:
+            reservations = reservations.filter(status=options['status'])
+        if options['paid']:
+            reservations = reservations.filter(is_paid=True)
+
+        stats = {}
+        output_path = options['output']
+        temp_path = output_path + '.part'
+        try:
+            with open(temp_path, 'wb') as output:
+                for chunk in stream_receipts_zip(reservations.iterator(chunk_size=500), options['workers'], stats):
+                    output.write(chunk)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.stdout.write(
+            f'{stats["count"]} receipts in {stats["elapsed"]:.2f}s '
+            f'({stats["per_second"]:.1f} receipts/s)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archive written to {output_path}'))
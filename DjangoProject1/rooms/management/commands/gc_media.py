@@ -0,0 +1,110 @@
+from functools import reduce
+from itertools import islice
+import operator
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from rooms.images import VARIANT_DIR
+from rooms.models import Room
+from rooms.storage import is_content_hash_name
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes room images, and their variants, that no room references. '
+        'The directory is read as a stream and references are checked in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the files that would be deleted')
+        parser.add_argument('--batch', type=int, default=500, help='File names checked per query')
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Seconds since the last change before a file can be deleted, so that '
+                 'uploads whose room is not saved yet are kept',
+        )
+        parser.add_argument(
+            '--rehash', action='store_true',
+            help='First move every room image to its content-hash name, so that copies of the same file are merged',
+        )
+
+    def handle(self, *args, **options):
+        field = Room._meta.get_field('image')
+        storage = field.storage
+        upload_dir = field.upload_to.strip('/')
+        self.dry_run = options['dry_run']
+        self.deleted = 0
+        self.freed = 0
+
+        if options['rehash']:
+            self.rehash(storage)
+
+        limit = time.time() - options['min_age']
+        directory = storage.path(upload_dir)
+
+        for batch in batched(self.scan(directory, limit), options['batch']):
+            names = {f'{upload_dir}/{entry.name}': entry for entry in batch}
+            referenced = set(Room.objects.filter(image__in=names).values_list('image', flat=True))
+            self.delete(entry for name, entry in names.items() if name not in referenced)
+
+        for batch in batched(self.scan(os.path.join(directory, VARIANT_DIR), limit), options['batch']):
+            # Variants are named <stem of the original>-<width>w.<format>
+            stems = {entry.name.rsplit('-', 1)[0] for entry in batch}
+            query = reduce(operator.or_, (Q(image__startswith=f'{upload_dir}/{stem}.') for stem in stems))
+            referenced = {
+                os.path.splitext(os.path.basename(name))[0]
+                for name in Room.objects.filter(query).values_list('image', flat=True)
+            }
+            self.delete(entry for entry in batch if entry.name.rsplit('-', 1)[0] not in referenced)
+
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {self.deleted} files ({self.freed / (1024 * 1024):.1f} MiB)'
+        ))
+
+    def scan(self, directory, limit):
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    yield entry
+
+    def delete(self, entries):
+        for entry in entries:
+            try:
+                size = entry.stat().st_size
+                if not self.dry_run:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.deleted += 1
+            self.freed += size
+            self.stdout.write(f'  {entry.path}')
+
+    def rehash(self, storage):
+        moved = 0
+        for room in Room.objects.exclude(image='').iterator():
+            if is_content_hash_name(room.image.name) or not storage.exists(room.image.name):
+                continue
+            moved += 1
+            if self.dry_run:
+                continue
+            with storage.open(room.image.name, 'rb') as image:
+                room.image.name = storage.save(room.image.name, image)
+            # The post_save handler drops the variants of the old name,
+            # generate_image_variants makes those of the new one
+            room.save(update_fields=['image'])
+        verb = 'would be' if self.dry_run else 'were'
+        self.stdout.write(f'{moved} room images {verb} renamed after their content')
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from rooms.dataset import BATCH_SIZE, DEFAULT_PASSWORD, TRANSACTION_ROWS, DatasetExists, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a large synthetic dataset (rooms, users, non-overlapping reservations '
+        'and their payments) with a deterministic seed, written in bulk. Point '
+        'DJANGO_DATABASE_PATH at a scratch file to keep it out of db.sqlite3'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--reservations', type=int, default=2000000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Objects per bulk_create batch')
+        parser.add_argument('--transaction-rows', type=int, default=TRANSACTION_ROWS, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        if min(options['rooms'], options['users']) < 1 or options['reservations'] < 0:
+            raise CommandError('--rooms and --users must be at least 1, --reservations at least 0')
+        self.stdout.write(f'Generating into {connection.settings_dict["NAME"]} with seed {options["seed"]}')
+
+        started = time.perf_counter()
+
+        def progress(model, count):
+            self.stdout.write(f'  {count} {model} ({time.perf_counter() - started:.0f}s)', ending='\r')
+            self.stdout.flush()
+
+        try:
+            counts = generate(
+                options['rooms'], options['users'], options['reservations'],
+                seed=options['seed'],
+                password=options['password'],
+                batch_size=options['batch_size'],
+                transaction_rows=options['transaction_rows'],
+                progress=progress,
+            )
+        except DatasetExists as e:
+            raise CommandError(f'{e}, generate into another database')
+        elapsed = time.perf_counter() - started
+        self.stdout.write('')
+
+        rows = sum(counts.values())
+        self.stdout.write(', '.join(f'{count} {model}' for model, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(f'{rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)'))
@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from rooms.images import generate_variants, needs_variants, supported_formats
+from rooms.models import Room
+
+
+def _init_worker():
+    import django
+
+    # Already done when the pool forks, required when it spawns
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates the responsive variants of room images that do not have them yet. '
+        'With --watch, keeps generating those of images saved afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core)')
+        parser.add_argument('--force', action='store_true', help='Regenerate the variants of every image')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and generate the variants of images saved later')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds between two looks for new images with --watch')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Formats: {", ".join(supported_formats())}')
+        workers = options['workers'] or os.cpu_count() or 1
+        force = options['force']
+        failed = set()  # not tried again by --watch until the image changes
+        try:
+            while True:
+                rooms_by_source = {
+                    source: pks for source, pks in self.pending(force).items() if source not in failed
+                }
+                force = False
+                if rooms_by_source:
+                    failed |= self.process(rooms_by_source, workers)
+                elif not options['watch']:
+                    self.stdout.write('All room images already have their variants.')
+                if not options['watch']:
+                    return
+                # Do not hold a connection while idle
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def pending(self, force):
+        # Rooms sharing an image file only need it processed once
+        rooms_by_source = {}
+        for pk, source, variants in Room.objects.exclude(image='').values_list('pk', 'image', 'image_variants'):
+            if force or needs_variants(source, variants):
+                rooms_by_source.setdefault(source, []).append(pk)
+        return rooms_by_source
+
+    def process(self, rooms_by_source, workers):
+        """Generate the variants of every source; return the sources that failed."""
+        started = time.perf_counter()
+        done = 0
+        failed = set()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = {executor.submit(generate_variants, source): source for source in rooms_by_source}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    failed.add(source)
+                    self.stderr.write(f'{source}: {e}')
+                    continue
+                Room.objects.filter(pk__in=rooms_by_source[source], image=source).update(image_variants=variants)
+                done += 1
+                self.stdout.write(f'{source}: {sum(len(w) for w in variants["formats"].values())} variants')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} images processed, {len(failed)} failures in {elapsed:.1f}s with {workers} workers'
+        ))
+        return failed
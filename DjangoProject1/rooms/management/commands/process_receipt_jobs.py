@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from rooms.receipts import claim_receipt_jobs, run_receipt_job
+
+
+class Command(BaseCommand):
+    help = 'Renders the receipts queued by payment and reservation approvals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=20, help='Jobs claimed at once')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit as soon as the queue is empty')
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                jobs = claim_receipt_jobs(options['batch'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    # Do not hold a connection while idle
+                    connection.close()
+                    time.sleep(options['interval'])
+                    continue
+
+                for job in jobs:
+                    if run_receipt_job(job):
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f'Receipt {job.reservation_id} failed (attempt {job.attempts})')
+        except KeyboardInterrupt:
+            pass
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{done} receipts rendered, {failed} failures in {elapsed:.2f}s')
@@ -0,0 +1,52 @@
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.seeding import FETCH_TIMEOUT, FETCH_WORKERS, SAMPLE_ROOMS, expand, seed_rooms
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates rooms from the sample catalogue or a JSON file, downloading '
+        'their images concurrently and writing the rooms in bulk'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JSON list of rooms (name, description, capacity, price_per_hour, is_available, amenities, image_url)')
+        parser.add_argument('--count', type=int, default=None, help='Number of rooms to create, repeating the catalogue')
+        parser.add_argument('--replace', action='store_true', help='Delete existing rooms (and their reservations) first')
+        parser.add_argument('--workers', type=int, default=FETCH_WORKERS, help='Concurrent downloads')
+        parser.add_argument('--timeout', type=float, default=FETCH_TIMEOUT, help='Timeout of each download in seconds')
+        parser.add_argument('--skip-variants', action='store_true', help='Do not generate the responsive image variants')
+
+    def handle(self, *args, **options):
+        rooms_data = SAMPLE_ROOMS
+        if options['file']:
+            try:
+                with open(options['file'], encoding='utf-8') as catalogue:
+                    rooms_data = json.load(catalogue)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["file"]}: {e}')
+            if not isinstance(rooms_data, list):
+                raise CommandError(f'{options["file"]} must hold a JSON list of rooms')
+        rooms_data = expand(rooms_data, options['count'])
+
+        started = time.perf_counter()
+        try:
+            result = seed_rooms(rooms_data, replace=options['replace'], workers=options['workers'], timeout=options['timeout'])
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        elapsed = time.perf_counter() - started
+
+        for url, error in result['errors']:
+            self.stdout.write(self.style.WARNING(f'Error downloading {url}: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["created"]} rooms created with {result["images"]} distinct images in {elapsed:.1f}s'
+            + (f', {result["skipped"]} already there' if result['skipped'] else '')
+        ))
+
+        if result['images'] and not options['skip_variants']:
+            call_command('generate_image_variants', stdout=self.stdout, stderr=self.stderr)
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.utils import timezone
+
+from rooms.models import Room, Reservation
+from rooms.utils import book_room
+
+
+class Command(BaseCommand):
+    help = 'Fires parallel bookings at a single room and checks that none overlap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Number of concurrent clients')
+        parser.add_argument('--attempts', type=int, default=25, help='Booking attempts per client')
+        parser.add_argument('--slots', type=int, default=48, help='Number of half-hour start slots to pick from')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--keep', action='store_true', help='Keep the test room and its reservations')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        attempts = options['attempts']
+        slots = options['slots']
+        rng = random.Random(options['seed'])
+
+        tag = uuid.uuid4().hex[:8]
+        room = Room.objects.create(
+            name=f'Stress test {tag}',
+            capacity=1,
+            description='Salle temporaire pour le test de concurrence',
+            price_per_hour=Decimal('10.00'),
+        )
+        user = User.objects.create_user(username=f'stress_{tag}')
+        base = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+        # Each client gets its own list of (start, duration) so the run is reproducible
+        plans = [
+            [
+                (base + timedelta(minutes=30 * rng.randrange(slots)), timedelta(minutes=30 * rng.randint(1, 4)))
+                for _ in range(attempts)
+            ]
+            for _ in range(threads)
+        ]
+
+        def client(plan):
+            booked = conflicts = errors = 0
+            try:
+                for start_time, duration in plan:
+                    reservation = Reservation(
+                        room=room,
+                        user=user,
+                        start_time=start_time,
+                        end_time=start_time + duration,
+                        total_price=room.price_per_hour * Decimal(duration.total_seconds() / 3600),
+                    )
+                    try:
+                        book_room(reservation)
+                        booked += 1
+                    except ValidationError:
+                        conflicts += 1
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connection.close()
+            return booked, conflicts, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(client, plans))
+        elapsed = time.perf_counter() - started
+
+        booked = sum(r[0] for r in results)
+        conflicts = sum(r[1] for r in results)
+        errors = sum(r[2] for r in results)
+        total = threads * attempts
+
+        intervals = list(
+            Reservation.objects.filter(room=room)
+            .exclude(status='cancelled')
+            .order_by('start_time')
+            .values_list('start_time', 'end_time')
+        )
+        overlaps = 0
+        latest_end = None
+        for start_time, end_time in intervals:
+            if latest_end is not None and start_time < latest_end:
+                overlaps += 1
+            latest_end = end_time if latest_end is None else max(latest_end, end_time)
+
+        self.stdout.write(f'Attempts: {total} ({threads} clients x {attempts})')
+        self.stdout.write(f'Booked: {booked}, conflicts rejected: {conflicts}, database errors: {errors}')
+        self.stdout.write(f'Elapsed: {elapsed:.2f}s, throughput: {total / elapsed:.1f} attempts/s')
+
+        if not options['keep']:
+            room.delete()
+            user.delete()
+
+        if overlaps:
+            raise CommandError(f'{overlaps} overlapping reservations found')
+        if booked != len(intervals):
+            raise CommandError(f'{booked} bookings reported but {len(intervals)} stored')
+        self.stdout.write(self.style.SUCCESS('No overlapping reservations.'))
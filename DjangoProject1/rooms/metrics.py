@@ -0,0 +1,227 @@
+"""
+Per-request performance metrics.
+
+RequestMetricsMiddleware (rooms.middleware) measures every request: database
+queries and their time through an execute_wrapper, template rendering time
+through the InstrumentedDjangoTemplates backend, and total latency. The
+figures go to the Server-Timing header and to histograms labelled with the
+resolved view name.
+
+Histograms live in the memory of each worker process, which writes them to
+METRICS_DIR/<pid>-<token>.json every METRICS_FLUSH_INTERVAL seconds. The
+metrics view sums the files of every process, so any worker answers for
+the whole server. Files not updated for METRICS_RETENTION seconds belong to
+workers gone long ago and are removed; their counts then disappear from the
+totals, which Prometheus treats as a counter reset.
+"""
+from contextvars import ContextVar
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (help, buckets)
+HISTOGRAMS = {
+    'rooms_request_duration_seconds': ('Time to answer a request', DURATION_BUCKETS),
+    'rooms_request_db_queries': ('Database queries run by a request', QUERY_BUCKETS),
+    'rooms_request_db_duration_seconds': ('Time spent in database queries by a request', DURATION_BUCKETS),
+    'rooms_request_template_duration_seconds': ('Time spent rendering templates by a request', DURATION_BUCKETS),
+}
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """What one request spent; also the execute_wrapper counting its queries."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value of the Server-Timing header, durations in milliseconds."""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'total;dur={self.elapsed() * 1000:.1f}'
+        )
+
+
+class InstrumentedTemplate:
+    """Wraps a backend template to add its render time to the current request."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = current_timings.get()
+        if timings is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend timing the templates loaded through it.
+    {% include %} and {% extends %} are resolved inside the engine, so a page
+    is timed once, with everything it includes.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, 'metrics'))
+
+
+class Registry:
+    """
+    Histograms of this process. A series is stored as the count of each
+    bucket (the last one is +Inf, not cumulative) followed by the sum.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.pid = None
+        self.filename = None
+
+    def own_file(self):
+        # Workers forked from a process that imported this module get a
+        # file of their own (the pid alone may be reused after a restart)
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.filename = f'{self.pid}-{secrets.token_hex(4)}.json'
+        return self.filename
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = json.dumps([name, labels], sort_keys=True)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(buckets) + 2)
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-1] += value
+
+    def record(self, view, method, status, timings):
+        labels = {'view': view, 'method': method, 'status': str(status)}
+        self.observe('rooms_request_duration_seconds', labels, timings.elapsed())
+        labels = {'view': view}
+        self.observe('rooms_request_db_queries', labels, timings.queries)
+        self.observe('rooms_request_db_duration_seconds', labels, timings.db_time)
+        self.observe('rooms_request_template_duration_seconds', labels, timings.template_time)
+        if time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            self.flush()
+
+    def flush(self):
+        """Write the histograms of this process to its file in METRICS_DIR."""
+        with self.lock:
+            data = json.dumps(self.series)
+            self.last_flush = time.monotonic()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as output:
+                output.write(data)
+            os.replace(temp_path, os.path.join(directory, self.own_file()))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+registry = Registry()
+
+
+def collect():
+    """Sum the histograms of every process, this one included."""
+    registry.flush()
+    directory = metrics_dir()
+    limit = time.time() - getattr(settings, 'METRICS_RETENTION', 86400)
+    merged = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                if entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    continue
+                with open(entry.path) as source:
+                    series = json.load(source)
+            except (FileNotFoundError, ValueError):
+                continue
+            for key, values in series.items():
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(values)
+                else:
+                    merged[key] = [a + b for a, b in zip(total, values)]
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items())) + '}'
+
+
+def render_prometheus(merged):
+    """Prometheus text exposition (version 0.0.4) of merged histograms."""
+    by_name = {}
+    for key, values in merged.items():
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, values))
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, values in sorted(by_name.get(name, []), key=lambda item: sorted(item[0].items())):
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels({**labels, "le": str(bound)})} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {values[-1]:.6g}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,172 @@
+import os
+import random
+import re
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
+from django.utils._os import safe_join
+
+from .csv_import import PREVIEW_DIR
+from .file_serving import serve_file
+from .metrics import RequestTimings, current_timings, registry
+from .query_detector import QueryDetector
+from .storage import is_content_hash_name
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Names written by ManifestStaticFilesStorage: custom.106ec7b6d847.css
+HASHED_STATIC_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+# Media subdirectories that must never be served
+PRIVATE_MEDIA_DIRS = (PREVIEW_DIR,)
+
+
+class FileServingMiddleware:
+    """
+    Serve STATIC_URL and MEDIA_URL without going through the rest of the
+    middleware stack: public files need no session, CSRF or user, and
+    SESSION_SAVE_EVERY_REQUEST would otherwise write the session for every
+    image. Place it right after SecurityMiddleware.
+
+    Fingerprinted static files and content-hashed room images never change
+    under a given name and are cached for a year; other files for
+    FILE_SERVING_MAX_AGE seconds (revalidated on every use with DEBUG).
+    Unknown files fall through to the URL resolver (404).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.accel_prefix = getattr(settings, 'FILE_SERVING_ACCEL_PREFIX', '/internal/')
+        self.roots = []
+        for kind, url, root in (
+            ('static', settings.STATIC_URL, settings.STATIC_ROOT),
+            ('media', settings.MEDIA_URL, settings.MEDIA_ROOT),
+        ):
+            # Files hosted elsewhere (CDN) are not ours to serve
+            if url and root and not urlsplit(url).netloc:
+                self.roots.append((kind, urlsplit(url).path, str(root)))
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD'):
+            for kind, prefix, root in self.roots:
+                if request.path_info.startswith(prefix):
+                    name = request.path_info[len(prefix):]
+                    path = self.find(kind, root, name)
+                    if path is not None:
+                        internal_url = f'{self.accel_prefix}{kind}/{quote(name)}'
+                        return serve_file(request, path, self.cache_control(kind, name), internal_url)
+        return self.get_response(request)
+
+    def find(self, kind, root, name):
+        if not name or name.endswith('/'):
+            return None
+        if kind == 'media' and name.split('/', 1)[0] in PRIVATE_MEDIA_DIRS:
+            return None
+        try:
+            path = safe_join(root, name)
+        except SuspiciousFileOperation:
+            return None
+        if os.path.isfile(path):
+            return path
+        # Not collected yet: the development server serves the app directories
+        if kind == 'static' and settings.DEBUG:
+            return finders.find(name)
+        return None
+
+    def cache_control(self, kind, name):
+        if kind == 'static' and HASHED_STATIC_RE.search(name):
+            return IMMUTABLE
+        if kind == 'media' and is_content_hash_name(name):
+            return IMMUTABLE
+        if settings.DEBUG:
+            return 'no-cache'
+        return f'public, max-age={getattr(settings, "FILE_SERVING_MAX_AGE", 3600)}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure every request (see rooms.metrics): the figures are added to the
+    histograms of its view and, for staff users or with DEBUG, sent in a
+    Server-Timing header that browser dev tools display.
+
+    Streaming responses (CSV exports, receipt files) are recorded when the
+    server closes them, once the whole body is sent, and the queries run
+    while producing the body are counted. Their Server-Timing header leaves
+    before the body and only covers the time to the first byte.
+
+    Place it before SessionMiddleware so that loading the session and the
+    user is counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+
+        def record():
+            registry.record(view, request.method, response.status_code, timings)
+
+        if response.streaming:
+            # FileResponse hands its file to wsgi.file_wrapper (sendfile),
+            # which replacing the content would disable; reading a file
+            # runs no query anyway
+            if getattr(response, 'file_to_stream', None) is None and not response.is_async:
+                response.streaming_content = self.count_queries(response.streaming_content, timings)
+            close = response.close
+
+            def close_and_record():
+                try:
+                    close()
+                finally:
+                    record()
+            response.close = close_and_record
+        else:
+            record()
+
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+    def count_queries(self, content, timings):
+        iterator = iter(content)
+        while True:
+            with connection.execute_wrapper(timings):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class QueryDetectorMiddleware:
+    """
+    Watch a sample of requests for repeated query shapes and slow queries
+    (see rooms.query_detector). Off unless QUERY_DETECTOR_SAMPLE_RATE is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'QUERY_DETECTOR_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+
+        detector = QueryDetector()
+        with connection.execute_wrapper(detector):
+            response = self.get_response(request)
+        match = request.resolver_match
+        label = match.view_name if match else request.path
+        detector.report(label, raise_errors=getattr(settings, 'QUERY_DETECTOR_RAISE', False))
+        return response
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # Only PostgreSQL can enforce non-overlap in the schema; other backends
+    # rely on the serialized booking path in rooms.utils.book_room.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'ALTER TABLE rooms_reservation ADD CONSTRAINT rooms_reservation_no_overlap '
+        'EXCLUDE USING gist (room_id WITH =, tstzrange(start_time, end_time) WITH &&) '
+        "WHERE (status <> 'cancelled')"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE rooms_reservation DROP CONSTRAINT IF EXISTS rooms_reservation_no_overlap'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_reservation_is_paid_payment'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 06:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échoué')], default='pending', max_length=20, verbose_name='Statut')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('reservation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='receipt_job', to='rooms.reservation', verbose_name='Réservation')),
+            ],
+            options={
+                'verbose_name': 'Génération de reçu',
+                'verbose_name_plural': 'Générations de reçus',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='receiptjob_status_updated_idx')],
+            },
+        ),
+    ]
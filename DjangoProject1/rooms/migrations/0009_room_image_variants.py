@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0008_receiptjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="Variantes de l'image"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 06:45
+
+import rooms.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0009_room_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=rooms.storage.room_image_storage, upload_to='room_images/', verbose_name='Image'),
+        ),
+    ]
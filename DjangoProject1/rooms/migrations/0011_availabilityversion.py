@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0010_room_image_content_hash_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Version des disponibilités',
+                'verbose_name_plural': 'Versions des disponibilités',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0011_availabilityversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityChange',
+            fields=[
+                ('version', models.PositiveBigIntegerField(primary_key=True, serialize=False, verbose_name='Version')),
+                ('reservation_ids', models.JSONField(null=True, verbose_name='Réservations')),
+            ],
+            options={
+                'verbose_name': 'Changement des disponibilités',
+                'verbose_name_plural': 'Changements des disponibilités',
+            },
+        ),
+    ]
@@ -1,14 +1,18 @@
 from django.db import models
 from django.conf import settings
 
+from .storage import room_image_storage
+
 class Room(models.Model):
     name = models.CharField(max_length=100, verbose_name="Nom")
     capacity = models.IntegerField(verbose_name="Capacité")
     description = models.TextField(verbose_name="Description")
     price_per_hour = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix par heure")
     is_available = models.BooleanField(default=True, verbose_name="Disponible")
-    image = models.ImageField(upload_to='room_images/', null=True, blank=True, verbose_name="Image")
+    image = models.ImageField(upload_to='room_images/', storage=room_image_storage, null=True, blank=True, verbose_name="Image")
     amenities = models.JSONField(default=list, verbose_name="Équipements")
+    # Resized copies of image, see rooms.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes de l'image")
 
     def __str__(self):
         return self.name
@@ -44,6 +48,16 @@ class Reservation(models.Model):
     class Meta:
         verbose_name = "Réservation"
         verbose_name_plural = "Réservations"
+        indexes = [
+            # Overlap checks only ever look at active reservations
+            models.Index(
+                fields=['room', 'start_time', 'end_time'],
+                condition=~models.Q(status='cancelled'),
+                name='reservation_room_overlap_idx',
+            ),
+            models.Index(fields=['user', '-created_at'], name='reservation_user_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='reservation_status_created_idx'),
+        ]
 
 class Payment(models.Model):
     PAYMENT_STATUS = [
@@ -75,4 +89,62 @@ class Payment(models.Model):
 
     class Meta:
         verbose_name = "Paiement"
-        verbose_name_plural = "Paiements"
\ No newline at end of file
+        verbose_name_plural = "Paiements"
+
+class ReceiptJob(models.Model):
+    """Pending receipt rendering, drained by the process_receipt_jobs command."""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+
+    reservation = models.OneToOneField(
+        Reservation,
+        on_delete=models.CASCADE,
+        related_name='receipt_job',
+        verbose_name="Réservation"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Statut")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+
+    def __str__(self):
+        return f"Reçu {self.reservation_id} - {self.status}"
+
+    class Meta:
+        verbose_name = "Génération de reçu"
+        verbose_name_plural = "Générations de reçus"
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='receiptjob_status_updated_idx'),
+        ]
+
+class AvailabilityVersion(models.Model):
+    """
+    Single row counting the changes to reservations, shared by every worker
+    process: see rooms.availability.
+    """
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Version")
+
+    def __str__(self):
+        return f"Disponibilités v{self.version}"
+
+    class Meta:
+        verbose_name = "Version des disponibilités"
+        verbose_name_plural = "Versions des disponibilités"
+
+class AvailabilityChange(models.Model):
+    """Reservations changed by the transaction that took this version, see rooms.availability."""
+    version = models.PositiveBigIntegerField(primary_key=True, verbose_name="Version")
+    # None when too many changed: every process loads them all again
+    reservation_ids = models.JSONField(null=True, verbose_name="Réservations")
+
+    def __str__(self):
+        return f"Disponibilités v{self.version}"
+
+    class Meta:
+        verbose_name = "Changement des disponibilités"
+        verbose_name_plural = "Changements des disponibilités"
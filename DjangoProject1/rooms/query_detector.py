@@ -0,0 +1,163 @@
+"""
+N+1 and slow query detection.
+
+QueryDetector is an execute_wrapper that groups the queries it sees by shape
+(the SQL with its literals, parameters and IN lists replaced) and reports:
+
+- shapes run QUERY_DETECTOR_REPEAT_THRESHOLD times or more, usually a
+  relation loaded row by row in a loop (missing select_related or
+  prefetch_related);
+- queries slower than QUERY_DETECTOR_SLOW_MS milliseconds.
+
+Each finding names where its first query came from: the template line being
+rendered, if any, and the innermost frame of project code.
+
+QueryDetectorMiddleware watches a random sample of requests
+(QUERY_DETECTOR_SAMPLE_RATE, 0 turns it off) and logs findings to the
+rooms.queries logger; with QUERY_DETECTOR_RAISE it raises QueryProblemsError
+instead, which fails the request in tests. detect_queries() does the same
+around any block of code:
+
+    with detect_queries('my_reservations'):
+        client.get(reverse('rooms:my_reservations'))
+"""
+from contextlib import contextmanager
+import logging
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('rooms.queries')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \(\?(?:, ?\?)*\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+# Transaction control repeats by design
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT')
+
+# Modules of the query wrappers themselves, never the origin of a query
+WRAPPER_FILES = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('query_detector.py', 'metrics.py', 'middleware.py')
+}
+
+
+class QueryProblemsError(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """The shape of a query: its SQL with every value replaced by ?."""
+    sql = STRING_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def _project_dir():
+    return os.path.join(os.path.realpath(settings.BASE_DIR), '')
+
+
+def query_origin():
+    """
+    Return (template, code) for the query being run: "name.html:line" of
+    the innermost template node being rendered and "path.py:line in
+    function" of the innermost project frame, each None when there is none.
+    """
+    project = _project_dir()
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and (template is None or code is None):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        elif (
+            code is None
+            and filename.startswith(project)
+            and filename not in WRAPPER_FILES
+            and 'site-packages' not in filename
+        ):
+            code = f'{os.path.relpath(filename, project)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return template, code
+
+
+def _where(template, code):
+    return ', '.join(part for part in (template, code) if part) or 'unknown origin'
+
+
+class QueryShape:
+    def __init__(self, shape, template, code):
+        self.shape = shape
+        self.template = template
+        self.code = code
+        self.count = 0
+        self.time = 0.0
+
+
+class QueryDetector:
+    """execute_wrapper recording the shape, time and origin of every query."""
+
+    def __init__(self, repeat_threshold=None, slow_ms=None):
+        self.repeat_threshold = repeat_threshold or getattr(settings, 'QUERY_DETECTOR_REPEAT_THRESHOLD', 5)
+        slow_ms = slow_ms or getattr(settings, 'QUERY_DETECTOR_SLOW_MS', 100)
+        self.slow = slow_ms / 1000
+        self.shapes = {}
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            shape = normalize_sql(sql)
+            entry = self.shapes.get(shape)
+            if entry is None:
+                entry = self.shapes[shape] = QueryShape(shape, *query_origin())
+            entry.count += 1
+            entry.time += elapsed
+            if elapsed >= self.slow:
+                self.slow_queries.append((sql, elapsed, query_origin()))
+
+    def problems(self, label=''):
+        """One message per repeated shape and per slow query."""
+        prefix = f'{label}: ' if label else ''
+        messages = [
+            f'{prefix}{entry.count} x {entry.shape} ({entry.time * 1000:.1f} ms) '
+            f'from {_where(entry.template, entry.code)}'
+            for entry in self.shapes.values()
+            if entry.count >= self.repeat_threshold and not entry.shape.upper().startswith(IGNORED_PREFIXES)
+        ]
+        messages.extend(
+            f'{prefix}slow query ({elapsed * 1000:.1f} ms) {sql} from {_where(*origin)}'
+            for sql, elapsed, origin in self.slow_queries
+        )
+        return messages
+
+    def report(self, label='', raise_errors=False):
+        problems = self.problems(label)
+        if problems and raise_errors:
+            raise QueryProblemsError('\n'.join(problems))
+        for problem in problems:
+            logger.warning(problem)
+        return problems
+
+
+@contextmanager
+def detect_queries(label='', raise_errors=True, **options):
+    """Run the block under a QueryDetector and report what it found."""
+    detector = QueryDetector(**options)
+    with connection.execute_wrapper(detector):
+        yield detector
+    detector.report(label, raise_errors)
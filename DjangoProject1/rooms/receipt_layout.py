@@ -0,0 +1,327 @@
+"""
+Receipt PDF layout.
+
+Receipts are drawn straight on a ReportLab canvas on a fixed grid instead of
+going through platypus. Everything that does not depend on the reservation
+(titles, labels, table backgrounds and rules, terms, logo) is computed once
+per process by ReceiptLayout as a list of canvas operations, which every
+receipt replays before placing its own fields. The verification QR code is
+drawn as vector shapes from a module matrix memoized per URL.
+"""
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+import os
+
+from django.conf import settings
+from django.urls import reverse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .utils import get_reservation_status, register_receipt_fonts
+
+TITLE_COLOR = colors.HexColor('#2c3e50')
+HEADER_COLOR = colors.HexColor('#2980b9')
+LABEL_COLOR = colors.HexColor('#34495e')
+VALUE_COLOR = colors.HexColor('#2c3e50')
+TABLE_BACKGROUND = colors.HexColor('#f8f9fa')
+TABLE_RULE = colors.HexColor('#e9ecef')
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 0.7 * cm + 6
+LEFT = MARGIN
+TOP = PAGE_HEIGHT - MARGIN
+CENTER = PAGE_WIDTH / 2
+TABLE_WIDTH = 14 * cm
+TABLE_LEFT = (PAGE_WIDTH - TABLE_WIDTH) / 2
+CELL_PADDING = 6
+LOGO_SIZE = 2 * cm
+QR_SIZE = 2 * cm
+QR_BORDER = 4  # quiet zone around the code, in modules
+
+# Vertical grid, in points, from the top margin down
+TITLE_SIZE = 18
+TITLE_LEADING = 26  # title baseline to reservation number baseline
+HEADER_GAP = 11  # section header baseline to its table
+SECTION_GAP = 22  # table to the next section header baseline
+LINE_HEIGHT = 14  # small print: terms and footer
+BASELINE_DROP = 3  # from the middle of a 10pt line to its baseline
+
+DETAIL_ROWS = [
+    ('room', "Salle:"),
+    ('start_date', "Date de début:"),
+    ('start_hour', "Heure de début:"),
+    ('end_date', "Date de fin:"),
+    ('end_hour', "Heure de fin:"),
+    ('total_price', "Prix total:"),
+    ('status', "Statut:"),
+    ('duration', "Durée:"),
+]
+USER_ROWS = [
+    ('name', "Nom:"),
+    ('email', "Email:"),
+    ('created_at', "Réservé le:"),
+]
+TERMS_LABEL = "Conditions:"
+TERMS_TEXT = " Annulations moins de 24h à l'avance: frais applicables. Arrivez 15 min avant. Contact: support@example.com"
+
+
+def fit_text(text, font, size, width, max_lines=2, small_size=8):
+    """
+    Return (font_size, lines) to draw text within width: on one line at
+    size if it fits, otherwise wrapped at small_size on at most max_lines,
+    the last one shortened with an ellipsis.
+    """
+    if stringWidth(text, font, size) <= width:
+        return size, [text]
+
+    lines = []
+    for line in simpleSplit(text, font, small_size, width):
+        # Words wider than the column (e-mail addresses) are cut anywhere
+        while stringWidth(line, font, small_size) > width:
+            end = len(line) - 1
+            while end > 1 and stringWidth(line[:end], font, small_size) > width:
+                end -= 1
+            lines.append(line[:end])
+            line = line[end:]
+        lines.append(line)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        last = lines[-1]
+        while last and stringWidth(last + '…', font, small_size) > width:
+            last = last[:-1]
+        lines[-1] = last + '…'
+    return small_size, lines
+
+
+@lru_cache(maxsize=1024)
+def qr_matrix(url):
+    """
+    Encode url as a QR code and return (size, runs): the side of the code in
+    modules, quiet zone included, and the (row, column, length) of every
+    horizontal run of dark modules.
+    """
+    import qrcode
+
+    # Any mask pattern gives a valid code; scoring all eight to pick the
+    # "best" one is most of the encoding time
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=QR_BORDER,
+        mask_pattern=0,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    runs = []
+    matrix = qr.get_matrix()
+    for row, modules in enumerate(matrix):
+        start = None
+        for column, dark in enumerate(modules + [False]):
+            if dark and start is None:
+                start = column
+            elif not dark and start is not None:
+                runs.append((row, start, column - start))
+                start = None
+    return len(matrix), tuple(runs)
+
+
+def draw_qr(c, url, x, y, size):
+    """Draw the QR code of url as vector shapes in a size x size square."""
+    count, runs = qr_matrix(url)
+    module = size / count
+    top = y + size
+    path = c.beginPath()
+    for row, column, length in runs:
+        path.rect(x + column * module, top - (row + 1) * module, length * module, module)
+    c.drawPath(path, stroke=0, fill=1)
+
+
+class CanvasRecorder:
+    """Stands for a canvas and records the calls made to it."""
+
+    def __init__(self):
+        self.ops = []
+
+    def __getattr__(self, name):
+        def record(*args):
+            self.ops.append((name, args))
+        return record
+
+
+class ReceiptLayout:
+    """
+    The static part of the receipt, computed once: the canvas operations
+    that draw it and the position of every reservation field.
+    """
+
+    def __init__(self, fonts, logo_path=None):
+        self.regular, self.bold, self.light = fonts
+        self.logo = ImageReader(logo_path) if logo_path else None
+        self.fields = {}
+        recorder = CanvasRecorder()
+        self.draw_static(recorder)
+        self.ops = recorder.ops
+
+    def draw_static(self, c):
+        """
+        Draw everything but the reservation fields on c, and note where the
+        fields go. Called once on a CanvasRecorder; replay() then repeats
+        the recorded operations on each receipt.
+        """
+        y = TOP
+        if self.logo:
+            y -= LOGO_SIZE
+            c.drawImage(self.logo, CENTER - LOGO_SIZE / 2, y, LOGO_SIZE, LOGO_SIZE)
+
+        y -= TITLE_SIZE
+        c.setFillColor(TITLE_COLOR)
+        c.setFont(self.bold, TITLE_SIZE)
+        c.drawCentredString(CENTER, y, "Confirmation de Réservation")
+        y -= TITLE_LEADING
+        self.reservation_id_y = y
+
+        y -= SECTION_GAP + HEADER_GAP
+        self.header(c, "Détails de la Réservation", y)
+        y = self.table(c, DETAIL_ROWS, y - HEADER_GAP, row_height=22, label_width=3.5 * cm, rounded=True)
+
+        y -= SECTION_GAP
+        self.header(c, "Informations de l'utilisateur", y)
+        y = self.table(c, USER_ROWS, y - HEADER_GAP, row_height=30, label_width=4 * cm)
+
+        y -= SECTION_GAP
+        self.header(c, "Vérification", y)
+        y -= LINE_HEIGHT + QR_SIZE
+        self.qr_x = TABLE_LEFT + 2 * cm - QR_SIZE / 2
+        self.qr_y = y
+        self.qr_caption = (TABLE_LEFT + 4 * cm + CELL_PADDING, y + QR_SIZE / 2 - BASELINE_DROP)
+
+        y -= LINE_HEIGHT
+        c.setFillColor(colors.gray)
+        c.setFont(self.bold, 7)
+        c.drawString(LEFT, y, TERMS_LABEL)
+        c.setFont(self.regular, 7)
+        c.drawString(LEFT + stringWidth(TERMS_LABEL, self.bold, 7), y, TERMS_TEXT)
+        self.footer_y = y - LINE_HEIGHT
+
+    def header(self, c, text, y):
+        c.setFillColor(HEADER_COLOR)
+        c.setFont(self.bold, 12)
+        c.drawString(LEFT, y, text)
+
+    def table(self, c, rows, top, row_height, label_width, rounded=False):
+        """Draw the label column of a table hanging from top; return its bottom."""
+        height = row_height * len(rows)
+        bottom = top - height
+        c.setFillColor(TABLE_BACKGROUND)
+        if rounded:
+            c.roundRect(TABLE_LEFT, bottom, TABLE_WIDTH, height, 3, 0, 1)
+        else:
+            c.rect(TABLE_LEFT, bottom, TABLE_WIDTH, height, 0, 1)
+
+        c.setStrokeColor(TABLE_RULE)
+        c.setLineWidth(0.5)
+        for i in range(1, len(rows)):
+            y = top - row_height * i
+            c.line(TABLE_LEFT, y, TABLE_LEFT + TABLE_WIDTH, y)
+
+        c.setFillColor(LABEL_COLOR)
+        c.setFont(self.bold, 10)
+        value_x = TABLE_LEFT + label_width + CELL_PADDING
+        value_width = TABLE_WIDTH - label_width - 2 * CELL_PADDING
+        for i, (key, label) in enumerate(rows):
+            middle = top - row_height * i - row_height / 2
+            c.drawString(TABLE_LEFT + CELL_PADDING, middle - BASELINE_DROP, label)
+            self.fields[key] = (value_x, middle, value_width)
+        return bottom
+
+    def replay(self, c):
+        for name, args in self.ops:
+            getattr(c, name)(*args)
+
+    def render(self, reservation):
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        self.replay(c)
+
+        c.setFillColor(HEADER_COLOR)
+        c.setFont(self.bold, 12)
+        c.drawString(LEFT, self.reservation_id_y, f"Réservation #{reservation.id}")
+
+        c.setFillColor(VALUE_COLOR)
+        for key, value in self.values(reservation).items():
+            x, middle, width = self.fields[key]
+            size, lines = fit_text(value, self.regular, 10, width)
+            leading = size + 1
+            y = middle - BASELINE_DROP + (len(lines) - 1) * leading / 2
+            c.setFont(self.regular, size)
+            for line in lines:
+                c.drawString(x, y, line)
+                y -= leading
+
+        self.draw_verification(c, reservation)
+
+        c.setFillColor(colors.gray)
+        c.setFont(self.light, 8)
+        now = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        c.drawCentredString(CENTER, self.footer_y, f'Document généré le {now} | Système de Réservation | Page 1/1')
+
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    def values(self, reservation):
+        user = reservation.user
+        hours = (reservation.end_time - reservation.start_time).total_seconds() / 3600
+        return {
+            'room': reservation.room.name,
+            'start_date': reservation.start_time.strftime('%d/%m/%Y'),
+            'start_hour': reservation.start_time.strftime('%H:%M'),
+            'end_date': reservation.end_time.strftime('%d/%m/%Y'),
+            'end_hour': reservation.end_time.strftime('%H:%M'),
+            'total_price': f"{reservation.total_price:.2f} €",
+            'status': get_reservation_status(reservation),
+            'duration': f"{hours:.1f} heures",
+            'name': f'{user.first_name} {user.last_name}',
+            'email': user.email,
+            'created_at': reservation.created_at.strftime('%d/%m/%Y %H:%M'),
+        }
+
+    def draw_verification(self, c, reservation):
+        x, y = self.qr_caption
+        c.setFillColor(colors.black)
+        try:
+            url = f"{settings.SITE_URL}{reverse('rooms:download_pdf', args=[reservation.id])}"
+            draw_qr(c, url, self.qr_x, self.qr_y, QR_SIZE)
+        except Exception:
+            # Fallback if QR code generation fails
+            c.setFont(self.regular, 10)
+            c.drawString(x, y, f"ID de vérification: {reservation.id}")
+            return
+        caption = "Scannez ce code QR pour vérifier. ID: "
+        c.setFont(self.regular, 10)
+        c.drawString(x, y, caption)
+        c.setFont(self.bold, 10)
+        c.drawString(x + stringWidth(caption, self.regular, 10), y, str(reservation.id))
+
+
+_layout = None
+
+
+def get_layout():
+    """Build the receipt layout on first use in this process."""
+    global _layout
+    if _layout is None:
+        logo_path = os.path.join(settings.STATIC_ROOT or '', 'img/logo.png')
+        _layout = ReceiptLayout(register_receipt_fonts(), logo_path if os.path.exists(logo_path) else None)
+    return _layout
+
+
+def render_receipt(reservation):
+    """Return the receipt PDF of a reservation (room and user loaded) as bytes."""
+    return get_layout().render(reservation)
@@ -0,0 +1,295 @@
+"""
+Rendered receipt cache.
+
+A receipt is rendered once per reservation state and stored under
+RECEIPT_CACHE_ROOT/<reservation id>/<fingerprint>.pdf. The fingerprint is a
+keyed hash of every field printed on the receipt, so any change to the
+reservation, its room or its user yields a new file, and the names cannot be
+guessed from the reservation data alone. Files of a reservation are removed
+when it is saved or deleted (see rooms.signals).
+
+Receipts of many reservations can be rendered in parallel and streamed into
+a ZIP archive with stream_receipts_zip(): by worker processes from the
+command line, by a few threads inside a web request.
+
+Approvals do not render anything: they call enqueue_receipt(), and the
+process_receipt_jobs command renders queued receipts into the cache in the
+background. A receipt requested before its job ran is rendered inline.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+# Bump when the receipt layout changes so that cached files are re-rendered
+RECEIPT_LAYOUT_VERSION = 4
+RECEIPT_JOB_MAX_ATTEMPTS = 3
+# A running job not finished after this long belongs to a dead worker
+RECEIPT_JOB_TIMEOUT = timedelta(minutes=10)
+
+
+def cache_root():
+    return getattr(settings, 'RECEIPT_CACHE_ROOT', os.path.join(settings.BASE_DIR, 'receipts_cache'))
+
+
+def receipt_fingerprint(reservation):
+    """Keyed hash of everything that appears on the receipt."""
+    user = reservation.user
+    parts = [
+        RECEIPT_LAYOUT_VERSION,
+        reservation.pk,
+        reservation.status,
+        reservation.is_paid,
+        reservation.start_time.isoformat(),
+        reservation.end_time.isoformat(),
+        reservation.created_at.isoformat() if reservation.created_at else '',
+        reservation.total_price,
+        reservation.room.name,
+        user.first_name,
+        user.last_name,
+        user.email,
+    ]
+    value = '\x1f'.join(str(part) for part in parts)
+    return salted_hmac('rooms.receipts', value, algorithm='sha256').hexdigest()
+
+
+def receipt_path(reservation):
+    return os.path.join(cache_root(), str(reservation.pk), f'{receipt_fingerprint(reservation)}.pdf')
+
+
+def cached_receipt_path(reservation):
+    """Return the path of the cached receipt, or None if it is not rendered yet."""
+    path = receipt_path(reservation)
+    return path if os.path.exists(path) else None
+
+
+def store_receipt(reservation, pdf):
+    """
+    Write pdf as the receipt of the current reservation state.
+
+    The file is written next to its final name and renamed into place, so
+    readers never see a partial PDF.
+    """
+    path = receipt_path(reservation)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(pdf)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+
+def get_receipt_path(reservation):
+    """Return the path of the receipt, rendering and caching it if needed."""
+    from .utils import generate_reservation_receipt
+
+    path = cached_receipt_path(reservation)
+    if path is None:
+        path = store_receipt(reservation, generate_reservation_receipt(reservation))
+    return path
+
+
+def invalidate_receipts(reservation_id):
+    """Remove every cached receipt of a reservation."""
+    shutil.rmtree(os.path.join(cache_root(), str(reservation_id)), ignore_errors=True)
+
+
+def enqueue_receipt(reservation):
+    """Queue the rendering of a reservation receipt for the background worker."""
+    enqueue_receipts([reservation])
+
+
+def enqueue_receipts(reservations):
+    """
+    Queue the receipts of many reservations in one statement, resetting the
+    jobs they already have.
+    """
+    from .models import ReceiptJob
+
+    ReceiptJob.objects.bulk_create(
+        [ReceiptJob(reservation=reservation) for reservation in reservations],
+        update_conflicts=True,
+        unique_fields=['reservation'],
+        update_fields=['status', 'attempts', 'error', 'updated_at'],
+    )
+
+
+def claim_receipt_jobs(limit):
+    """
+    Mark up to limit queued jobs as running and return them with their
+    reservation, room and user loaded. Jobs left running by a worker that
+    died are claimed again once RECEIPT_JOB_TIMEOUT has passed.
+    """
+    from .models import ReceiptJob
+
+    now = timezone.now()
+    claimable = Q(status='pending') | Q(status='running', updated_at__lt=now - RECEIPT_JOB_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            ReceiptJob.objects.select_for_update(skip_locked=True)
+            .filter(claimable)
+            .order_by('updated_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        ReceiptJob.objects.filter(pk__in=ids).filter(claimable).update(
+            status='running', attempts=F('attempts') + 1, updated_at=now,
+        )
+    return list(
+        ReceiptJob.objects.filter(pk__in=ids, status='running', updated_at=now)
+        .select_related('reservation__room', 'reservation__user')
+    )
+
+
+def run_receipt_job(job):
+    """
+    Render the receipt of a claimed job into the cache. A failed job is
+    queued again until it reaches RECEIPT_JOB_MAX_ATTEMPTS. Returns True on
+    success.
+
+    Only jobs still marked running are updated: a reservation approved
+    again while its receipt was rendering stays queued for the new state.
+    """
+    from .models import ReceiptJob
+
+    running = ReceiptJob.objects.filter(pk=job.pk, status='running')
+    try:
+        get_receipt_path(job.reservation)
+    except Exception as e:
+        status = 'failed' if job.attempts >= RECEIPT_JOB_MAX_ATTEMPTS else 'pending'
+        running.update(status=status, error=str(e), updated_at=timezone.now())
+        return False
+    running.update(status='done', error='', updated_at=timezone.now())
+    return True
+
+
+def _init_render_worker():
+    import django
+
+    # Already done when the pool forks, required when it spawns
+    django.setup()
+
+    # Fonts and the static part of the layout are prepared once per worker
+    from .receipt_layout import get_layout
+    get_layout()
+
+
+def _render_receipt(reservation):
+    from .utils import generate_reservation_receipt
+
+    return generate_reservation_receipt(reservation)
+
+
+def iter_receipts(reservations, workers=None, threads=False):
+    """
+    Yield (reservation, pdf) for every reservation.
+
+    Cached receipts are read from disk; the others are rendered by a pool of
+    worker processes (one per core by default) and added to the cache. At
+    most a few receipts per worker are in flight, so memory use does not
+    depend on the number of reservations. Reservations must come with their
+    room and user loaded (select_related) since workers do not query the
+    database.
+
+    With threads=True the pool is made of threads of the current process
+    instead, for callers such as web requests that must not fork.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            reservation = pending.pop(future)
+            pdf = future.result()
+            store_receipt(reservation, pdf)
+            yield reservation, pdf
+
+    if threads:
+        from .receipt_layout import get_layout
+
+        get_layout()
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker)
+
+    with executor:
+        for reservation in reservations:
+            path = cached_receipt_path(reservation)
+            if path is not None:
+                with open(path, 'rb') as cached:
+                    yield reservation, cached.read()
+                continue
+
+            pending[executor.submit(_render_receipt, reservation)] = reservation
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+
+class ZipStream:
+    """
+    Write-only buffer handed to zipfile: whatever the archive writes is
+    kept until the next drain(), so the ZIP can be streamed as it is built.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_receipts_zip(reservations, workers=None, stats=None, threads=False):
+    """
+    Yield the bytes of a ZIP archive holding one receipt per reservation.
+
+    Receipts come from iter_receipts(). PDFs are already compressed, so
+    entries are stored as is. When a stats dict is given it receives the
+    receipt count, elapsed seconds and receipts per second once the archive
+    is complete.
+    """
+    started = time.perf_counter()
+    count = 0
+    buffer = ZipStream()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for reservation, pdf in iter_receipts(reservations, workers=workers, threads=threads):
+            archive.writestr(f'reservation_{reservation.pk}.pdf', pdf)
+            count += 1
+            yield buffer.drain()
+    yield buffer.drain()
+
+    if stats is not None:
+        elapsed = time.perf_counter() - started
+        stats.update({
+            'count': count,
+            'elapsed': elapsed,
+            'per_second': count / elapsed if elapsed else 0.0,
+        })
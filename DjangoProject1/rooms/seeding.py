@@ -0,0 +1,220 @@
+"""
+Room seeding.
+
+Images are downloaded concurrently by a bounded thread pool. Every thread
+reuses its HTTP connections through its own requests.Session, each distinct
+URL is fetched once, and the content-hash storage of Room.image keeps a
+single file per distinct picture. Rooms are then written with one
+bulk_create.
+
+Seeding again is harmless: rooms whose name already exists are skipped, and
+their images are not downloaded.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import cycle, islice
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .models import Room
+
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 10  # seconds
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+ROOM_FIELDS = ['name', 'description', 'capacity', 'price_per_hour', 'is_available', 'amenities']
+
+SAMPLE_ROOMS = [
+    {
+        'name': 'Salle Atlas',
+        'description': 'Une salle de conférence luxueuse avec une vue imprenable sur la ville. Décoration inspirée de l\'architecture marocaine traditionnelle, idéale pour les réunions d\'affaires importantes. Équipée des dernières technologies et d\'un service de restauration premium.',
+        'capacity': 20,
+        'price_per_hour': 800,
+        'image_url': 'https://images.pexels.com/photos/1181671/pexels-photo-1181671.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi haut débit', 'Écran 75" 4K', 'Système audio premium', 'Table de conférence en bois précieux', 'Service de restauration', 'Climatisation', 'Thé à la menthe', 'Pâtisseries marocaines']
+    },
+    {
+        'name': 'Espace Medina',
+        'description': 'Un espace créatif inspiré des riads marocains, avec une cour intérieure et une décoration traditionnelle. Parfait pour les sessions de brainstorming et les ateliers créatifs. L\'ambiance chaleureuse et l\'architecture authentique créent un cadre idéal pour l\'innovation.',
+        'capacity': 12,
+        'price_per_hour': 600,
+        'image_url': 'https://images.pexels.com/photos/1181677/pexels-photo-1181677.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi', 'Tableaux blancs interactifs', 'Espace de détente', 'Thé à la menthe', 'Pâtisseries marocaines', 'Jardin intérieur', 'Fontaine traditionnelle', 'Climatisation']
+    },
+    {
+        'name': 'Salle Hassan II',
+        'description': 'Une salle de réunion moderne avec des touches de design marocain. Équipée des dernières technologies pour les présentations et les réunions virtuelles. L\'acoustique parfaite et l\'éclairage ajustable en font un espace idéal pour les réunions professionnelles.',
+        'capacity': 16,
+        'price_per_hour': 700,
+        'image_url': 'https://images.pexels.com/photos/1181673/pexels-photo-1181673.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi', 'Écran 65"', 'Système de visioconférence', 'Table de réunion modulaire', 'Climatisation', 'Service de café', 'Éclairage ajustable', 'Insonorisation']
+    },
+    {
+        'name': 'Cabine Marrakech',
+        'description': 'Un espace de réunion intime avec une décoration authentique marocaine. Idéal pour les réunions confidentielles et les entretiens. L\'ambiance chaleureuse et le confort moderne se marient parfaitement.',
+        'capacity': 6,
+        'price_per_hour': 400,
+        'image_url': 'https://images.pexels.com/photos/1181675/pexels-photo-1181675.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi', 'Écran 55"', 'Système audio', 'Table de réunion', 'Climatisation', 'Thé à la menthe', 'Insonorisation', 'Éclairage d\'ambiance']
+    },
+    {
+        'name': 'Espace Casablanca',
+        'description': 'Un centre d\'affaires contemporain avec des influences architecturales marocaines. Espace polyvalent adapté aux réunions d\'équipe et aux événements professionnels. Design moderne et fonctionnel avec une touche marocaine distinctive.',
+        'capacity': 24,
+        'price_per_hour': 900,
+        'image_url': 'https://images.pexels.com/photos/1181679/pexels-photo-1181679.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi haut débit', 'Écran géant 85"', 'Système audio surround', 'Tables modulaires', 'Climatisation', 'Service de restauration', 'Espace de networking', 'Parking privé']
+    },
+    {
+        'name': 'Salle Rabat',
+        'description': 'Une salle de réunion moderne avec un design épuré et des éléments décoratifs marocains. Parfaite pour les réunions d\'équipe et les présentations. L\'espace est conçu pour favoriser la productivité tout en offrant un cadre agréable.',
+        'capacity': 10,
+        'price_per_hour': 500,
+        'image_url': 'https://images.pexels.com/photos/1181681/pexels-photo-1181681.jpeg',
+        'is_available': True,
+        'amenities': ['Wi-Fi', 'Écran 60"', 'Système audio', 'Table de réunion', 'Climatisation', 'Service de café', 'Éclairage naturel', 'Vue sur la ville']
+    }
+]
+
+
+_local = threading.local()
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def check_image(content):
+    """Return an error message unless content is a complete image Pillow can read."""
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(content)) as image:
+            image.verify()
+    except Exception as e:
+        return f'not an image: {e}'
+    return ''
+
+
+def fetch(url, timeout=FETCH_TIMEOUT):
+    """Download url and return (content, error_message)."""
+    try:
+        response = _session().get(url, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        return None, str(e)
+    # An error page served with 200, a truncated transfer...
+    error = check_image(response.content)
+    if error:
+        return None, error
+    return response.content, ''
+
+
+def fetch_all(urls, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT):
+    """Download every distinct URL, at most workers at a time. Returns {url: (content, error_message)}."""
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as executor:
+        return dict(zip(urls, executor.map(lambda url: fetch(url, timeout), urls)))
+
+
+def expand(rooms_data, count):
+    """Repeat the catalogue up to count rooms, numbering the names of the copies."""
+    if not count or count == len(rooms_data):
+        return list(rooms_data)
+    rooms = []
+    for i, data in enumerate(islice(cycle(rooms_data), count)):
+        copy = i // len(rooms_data)
+        if copy and isinstance(data, dict):
+            # Invalid entries are left for build_rooms to report
+            data = {**data, 'name': f"{data.get('name', '')} {copy + 1}"}
+        rooms.append(data)
+    return rooms
+
+
+def build_rooms(rooms_data):
+    """
+    Return an unsaved, validated Room per entry of rooms_data. Raises
+    ValidationError naming the first invalid entry.
+    """
+    rooms = []
+    for number, data in enumerate(rooms_data, 1):
+        if not isinstance(data, dict):
+            raise ValidationError(f'Salle {number} : un objet JSON est attendu.')
+        room = Room(**{name: data[name] for name in ROOM_FIELDS if name in data})
+        try:
+            room.full_clean(exclude=['image'], validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            raise ValidationError(f'Salle {number} ({data.get("name", "?")}) : {"; ".join(e.messages)}')
+        rooms.append(room)
+    return rooms
+
+
+def seed_rooms(rooms_data, replace=False, workers=FETCH_WORKERS, timeout=FETCH_TIMEOUT):
+    """
+    Create rooms from a list of dicts with the ROOM_FIELDS keys and an
+    optional image_url. Rooms whose image cannot be downloaded are created
+    without one. Without replace, rooms named like an existing one are
+    skipped; with it, existing rooms are deleted first, in the same
+    transaction. Raises ValidationError, before any download, if an entry
+    is not a valid room.
+
+    Returns a dict with the created and skipped counts, the stored image
+    count and the list of (url, error_message) of failed downloads.
+    """
+    from . import availability
+    from .utils import invalidate_dashboard_stats
+
+    rooms = build_rooms(rooms_data)
+    skipped = 0
+    if not replace:
+        existing = set(Room.objects.values_list('name', flat=True))
+        pairs = [(room, data) for room, data in zip(rooms, rooms_data) if room.name not in existing]
+        skipped = len(rooms) - len(pairs)
+        rooms_data = [data for _, data in pairs]
+        rooms = [room for room, _ in pairs]
+
+    field = Room._meta.get_field('image')
+    downloads = fetch_all((data.get('image_url') for data in rooms_data), workers, timeout)
+
+    images = {}
+    errors = []
+    for url, (content, error) in downloads.items():
+        if content is None:
+            errors.append((url, error))
+            continue
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            extension = '.jpg'
+        images[url] = field.storage.save(f'{field.upload_to.rstrip("/")}/room{extension}', ContentFile(content))
+
+    for room, data in zip(rooms, rooms_data):
+        room.image = images.get(data.get('image_url'), '')
+    with transaction.atomic():
+        if replace:
+            Room.objects.all().delete()
+        Room.objects.bulk_create(rooms, batch_size=500)
+
+    # bulk_create sends no signals
+    availability.invalidate()
+    invalidate_dashboard_stats()
+    return {
+        'created': len(rooms),
+        'skipped': skipped,
+        'images': len(set(images.values())),
+        'errors': errors,
+    }
@@ -0,0 +1,36 @@
+"""
+Session engine with few database writes.
+
+Sessions are read from the cache named by SESSION_CACHE_ALIAS and only fall
+back to django_session on a miss (cached_db engine). SESSION_SAVE_EVERY_REQUEST
+keeps the expiry sliding, but an unchanged session is written back at most
+once every SESSION_REFRESH_INTERVAL seconds instead of on every request: the
+server-side expiry may lag the cookie by that much, nothing else changes.
+
+Use a cache shared by every worker process (the file-based "sessions" cache
+in settings): with a per-process cache, a worker could keep serving a session
+another worker has since logged out.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from .sqlite import serialized_write
+
+# Session key holding the time of the last write, in seconds since the epoch
+REFRESHED_KEY = '_session_refreshed'
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'rooms.sessions'
+
+    @serialized_write
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self.modified or self.refresh_due():
+            self[REFRESHED_KEY] = int(time.time())
+            super().save(must_create=must_create)
+
+    def refresh_due(self):
+        refreshed = self._get_session().get(REFRESHED_KEY, 0)
+        return time.time() - refreshed >= getattr(settings, 'SESSION_REFRESH_INTERVAL', 300)
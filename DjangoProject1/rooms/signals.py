@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import availability
+from .images import refresh_room_variants, release_variants
+from .models import Room, Reservation, Payment
+from .receipts import invalidate_receipts
+from .utils import invalidate_dashboard_stats
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    """Keep the availability index in sync once the transaction is committed."""
+    availability.changed(instance.pk)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def dashboard_data_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_receipt_stale(sender, instance, **kwargs):
+    reservation_id = instance.pk
+    transaction.on_commit(lambda: invalidate_receipts(reservation_id))
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, **kwargs):
+    """Generate the responsive variants of a new or replaced room image."""
+    transaction.on_commit(lambda: refresh_room_variants(instance))
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    variants, room_pk = instance.image_variants, instance.pk
+    transaction.on_commit(lambda: release_variants(variants, room_pk))
@@ -0,0 +1,96 @@
+"""
+SQLite under concurrent writers.
+
+apply_pragmas() runs on every new SQLite connection (connected to
+connection_created in RoomsConfig.ready) and applies the SQLITE_PRAGMAS
+profile, by default:
+
+- journal_mode=WAL: readers no longer block the writer, nor the writer the
+  readers. There is still one writer at a time.
+- busy_timeout: how long a writer waits for the lock before "database is
+  locked".
+- synchronous=NORMAL: with WAL, commits are no longer synced to disk one by
+  one; a power cut may lose the last commits but cannot corrupt the file.
+- mmap_size, cache_size, temp_store: fewer reads and page cache misses.
+
+write_queue lines up the write transactions of the threads of a process
+when SQLITE_WRITE_QUEUE is on. Only one thread per process then competes
+for the database lock, the others wait on a lock of the process instead of
+polling in SQLite's busy handler, and a transaction still turned away with
+"database is locked" is run again after a pause, up to SQLITE_WRITE_RETRIES
+times. Decorate with @serialized_write functions that write in a
+transaction of their own (book_room, session saves). Inside an enclosing
+transaction they run as is: that transaction already holds the lock, and
+only the outermost one could be retried. So does a serialized write called
+from another one in the same thread (SessionStore.save calls create(), which
+calls save() again): the outer call already holds the queue.
+"""
+import functools
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+
+PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if not PRAGMA_NAME_RE.match(name) or not PRAGMA_VALUE_RE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLITE_PRAGMAS entry: {name} = {value!r}')
+        # On the raw connection: not logged nor counted as a query of the request
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(error):
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+class WriteQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def run(self, func, *args, **kwargs):
+        """Call func(*args, **kwargs) in turn with the other writers of this process."""
+        if (
+            not getattr(settings, 'SQLITE_WRITE_QUEUE', False)
+            or connection.vendor != 'sqlite'
+            or connection.in_atomic_block
+            or getattr(self.local, 'running', False)
+        ):
+            return func(*args, **kwargs)
+
+        retries = getattr(settings, 'SQLITE_WRITE_RETRIES', 5)
+        delay = getattr(settings, 'SQLITE_WRITE_RETRY_DELAY', 0.05)
+        with self.lock:
+            self.local.running = True
+            try:
+                for attempt in range(retries + 1):
+                    try:
+                        return func(*args, **kwargs)
+                    except OperationalError as e:
+                        if attempt == retries or not is_locked_error(e):
+                            raise
+                    # Holding the lock: the writers behind wait too, as they would have to
+                    time.sleep(delay * 2 ** attempt * random.uniform(0.5, 1.5))
+            finally:
+                self.local.running = False
+
+
+write_queue = WriteQueue()
+
+
+def serialized_write(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return write_queue.run(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,97 @@
+"""
+Storage backends.
+
+ContentHashStorage is the content-addressed storage of uploaded room images.
+Files are named after the SHA-256 of their content, so uploading the same
+picture again (admin re-upload, seeding scripts) reuses the existing file
+instead of adding a copy. Files nobody references any more are removed by
+the gc_media command.
+
+CompressedManifestStaticFilesStorage is the STATICFILES storage: collectstatic
+writes fingerprinted copies of the static files and gzip/brotli versions of
+them next to each, ready to be served as is with far-future cache headers.
+"""
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+HASH_LENGTH = 32  # hex digits kept in file names
+
+
+class ContentHashStorage(FileSystemStorage):
+    """FileSystemStorage that names every saved file after its content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest.hexdigest()[:HASH_LENGTH] + extension).replace('\\', '/')
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def is_content_hash_name(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return len(stem) == HASH_LENGTH and all(c in '0123456789abcdef' for c in stem)
+
+
+def room_image_storage():
+    return ContentHashStorage()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes name.gz and, when the brotli
+    package is installed, name.br for every fingerprinted text file. A
+    compressed copy is only kept when it saves at least 5% of the size.
+    """
+
+    compress_extensions = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.ttf', '.eot', '.otf')
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(self.compress_extensions):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write the compressed copies of name that do not exist yet."""
+        encoders = {suffix: encode for suffix, encode in self.encoders().items() if not self.exists(name + suffix)}
+        if not encoders:
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < self.compress_min_size:
+            return
+        for suffix, encode in encoders.items():
+            compressed = encode(data)
+            if len(compressed) < len(data) * 0.95:
+                self._save(name + suffix, ContentFile(compressed))
+
+    def encoders(self):
+        # mtime=0 so that the .gz of an unchanged file is byte-identical
+        encoders = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+        try:
+            import brotli
+        except ImportError:
+            return encoders
+        encoders['.br'] = lambda data: brotli.compress(data, quality=11)
+        return encoders
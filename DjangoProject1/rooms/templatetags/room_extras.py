@@ -11,4 +11,51 @@ def parse_json(value):
             return json.loads(value)
         except json.JSONDecodeError:
             return []
-    return value 
\ No newline at end of file
+    return value 
+
+@register.simple_tag
+def room_picture(room, sizes='100vw', css_class='', style='', lazy=True):
+    """
+    Render a <picture> for a room image with one srcset per format of its
+    variants (see rooms.images). Falls back to the original file while the
+    variants are not generated.
+    """
+    from django.core.files.storage import default_storage
+    from django.utils.html import format_html, format_html_join
+    from rooms.images import VARIANT_FORMATS, variant_name
+
+    variants = room.image_variants or {}
+    source = room.image.name
+    if variants.get('source') != source:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}"{}>',
+            room.image.url, css_class, room.name, style,
+            format_html(' loading="lazy" decoding="async"') if lazy else '',
+        )
+
+    def srcset(extension):
+        return ', '.join(
+            f'{default_storage.url(variant_name(source, width, extension))} {width}w'
+            for width in variants['formats'][extension]
+        )
+
+    fallback = 'jpeg'
+    widths = variants['formats'][fallback]
+    src_width = min((width for width in widths if width >= 800), default=widths[-1])
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (VARIANT_FORMATS[extension]['mime'], srcset(extension), sizes)
+            for extension in VARIANT_FORMATS
+            if extension != fallback and extension in variants['formats']
+        ),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'class="{}" alt="{}" style="{}"{}></picture>',
+        sources,
+        default_storage.url(variant_name(source, src_width, fallback)),
+        srcset(fallback), sizes, variants['width'], variants['height'],
+        css_class, room.name, style,
+        format_html(' loading="lazy" decoding="async"') if lazy else '',
+    )
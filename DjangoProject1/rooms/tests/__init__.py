@@ -0,0 +1,8 @@
+from django.conf import settings
+
+# Views render {% static %}: tests run without collectstatic, so without the
+# manifest of the fingerprinted files
+STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
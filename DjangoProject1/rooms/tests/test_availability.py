@@ -0,0 +1,127 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from rooms import availability
+from rooms.availability import AvailabilityIndex
+from rooms.models import AvailabilityChange, Reservation, Room
+
+
+class AvailabilityVersionTests(TestCase):
+    """Each AvailabilityIndex stands for the index of another worker process."""
+
+    def setUp(self):
+        self.room = Room.objects.create(name='Salle A', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        self.user = User.objects.create_user(username='alice')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.end = self.start + timedelta(hours=1)
+
+    def reserve(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                room=self.room, user=self.user, start_time=self.start, end_time=self.end,
+                total_price=Decimal('10.00'),
+            )
+
+    def test_other_process_sees_new_reservation(self):
+        other = AvailabilityIndex()
+        self.assertTrue(other.is_free(self.room.pk, self.start, self.end))
+
+        reservation = self.reserve()
+
+        self.assertEqual(other.conflicts(self.room.pk, self.start, self.end), [reservation.pk])
+        self.assertIn(self.room.pk, other.busy_room_ids(self.start, self.end))
+
+    def test_other_process_sees_cancellation(self):
+        reservation = self.reserve()
+        other = AvailabilityIndex()
+        self.assertFalse(other.is_free(self.room.pk, self.start, self.end))
+
+        reservation.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.save()
+
+        self.assertTrue(other.is_free(self.room.pk, self.start, self.end))
+
+    def test_publishing_process_keeps_its_index(self):
+        self.assertTrue(availability.index.is_free(self.room.pk, self.start, self.end))
+        version = availability._current_version()
+
+        self.reserve()
+
+        self.assertEqual(availability._current_version(), version + 1)
+        self.assertTrue(availability.index._loaded)
+        self.assertFalse(availability.index.is_free(self.room.pk, self.start, self.end))
+
+    def test_invalidate_reaches_other_processes(self):
+        other = AvailabilityIndex()
+        self.assertTrue(other.is_free(self.room.pk, self.start, self.end))
+
+        # bulk_create sends no signals
+        Reservation.objects.bulk_create([Reservation(
+            room=self.room, user=self.user, start_time=self.start, end_time=self.end,
+            total_price=Decimal('10.00'),
+        )])
+        availability.invalidate()
+
+        self.assertFalse(other.is_free(self.room.pk, self.start, self.end))
+
+    def test_other_process_replays_changes_without_reloading(self):
+        other = AvailabilityIndex()
+        self.assertTrue(other.is_free(self.room.pk, self.start, self.end))
+        first = self.reserve()
+        self.start, self.end = self.end, self.end + timedelta(hours=1)
+        second = self.reserve()
+
+        with mock.patch.object(other, '_load', wraps=other._load) as load:
+            self.assertEqual(other.conflicts(self.room.pk, first.start_time, second.end_time), [first.pk, second.pk])
+        load.assert_not_called()
+
+    def test_gap_in_change_log_reloads(self):
+        other = AvailabilityIndex()
+        self.assertTrue(other.is_free(self.room.pk, self.start, self.end))
+        self.reserve()
+        AvailabilityChange.objects.all().delete()
+
+        with mock.patch.object(other, '_load', wraps=other._load) as load:
+            self.assertFalse(other.is_free(self.room.pk, self.start, self.end))
+        load.assert_called_once()
+
+    def test_one_version_per_transaction(self):
+        self.reserve()
+        self.start, self.end = self.end, self.end + timedelta(hours=1)
+        self.reserve()
+        version = availability._current_version()
+
+        # Deleting the room deletes its reservations, one post_delete each
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.room.delete()
+
+        self.assertEqual(availability._current_version(), version + 1)
+
+    def test_busy_room_ids(self):
+        rooms = [self.room] + [
+            Room.objects.create(name=f'Salle {i}', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, room in enumerate(rooms):
+                # Each room busy one hour later than the previous one
+                start = self.start + timedelta(hours=i)
+                Reservation.objects.create(
+                    room=room, user=self.user, start_time=start, end_time=start + timedelta(hours=1),
+                    total_price=Decimal('10.00'),
+                )
+        window = (self.start + timedelta(minutes=90), self.start + timedelta(minutes=150))
+        self.assertEqual(availability.index.busy_room_ids(*window), {rooms[1].pk, rooms[2].pk})
+        # Touching the end of a reservation is not overlapping it
+        self.assertEqual(
+            availability.index.busy_room_ids(self.start + timedelta(hours=4), self.start + timedelta(hours=5)), set(),
+        )
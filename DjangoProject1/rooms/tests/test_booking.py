@@ -0,0 +1,80 @@
+from datetime import timedelta
+from decimal import Decimal
+import threading
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from rooms.models import Reservation, Room
+from rooms.utils import book_room
+
+THREADS = 8
+
+
+# Outside a test transaction, so that each thread commits on its own
+# connection and the write queue is in use
+@override_settings(SQLITE_WRITE_QUEUE=True)
+class ConcurrentBookingTests(TransactionTestCase):
+    def setUp(self):
+        self.room = Room.objects.create(name='Salle A', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        self.user = User.objects.create_user(username='alice')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def book_concurrently(self, slots):
+        """Book every (start, end) slot from its own thread, all at once."""
+        barrier = threading.Barrier(len(slots))
+        outcomes = [None] * len(slots)
+
+        def book(i, start, end):
+            try:
+                barrier.wait()
+                book_room(Reservation(
+                    room=self.room, user=self.user, start_time=start, end_time=end, total_price=Decimal('10.00'),
+                ))
+                outcomes[i] = 'booked'
+            except ValidationError:
+                outcomes[i] = 'conflict'
+            except Exception as e:
+                outcomes[i] = e
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(i, *slot)) for i, slot in enumerate(slots)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertFalse(any(thread.is_alive() for thread in threads), 'book_room() did not return')
+        self.assertTrue(all(outcome in ('booked', 'conflict') for outcome in outcomes), outcomes)
+        return outcomes
+
+    def assertNoOverlap(self):
+        reservations = list(Reservation.objects.filter(room=self.room).order_by('start_time'))
+        for previous, current in zip(reservations, reservations[1:]):
+            self.assertLessEqual(previous.end_time, current.start_time)
+        return reservations
+
+    def test_same_slot_is_booked_once(self):
+        end = self.start + timedelta(hours=1)
+        outcomes = self.book_concurrently([(self.start, end)] * THREADS)
+
+        self.assertEqual(outcomes.count('booked'), 1)
+        self.assertEqual(len(self.assertNoOverlap()), 1)
+
+    def test_overlapping_slots(self):
+        # Two-hour slots starting every hour: each overlaps its neighbours
+        slots = [
+            (self.start + timedelta(hours=i), self.start + timedelta(hours=i + 2))
+            for i in range(THREADS)
+        ]
+        outcomes = self.book_concurrently(slots)
+
+        reservations = self.assertNoOverlap()
+        self.assertEqual(len(reservations), outcomes.count('booked'))
+        # Every refused slot was refused because of a booking that won
+        for (start, end), outcome in zip(slots, outcomes):
+            if outcome == 'conflict':
+                self.assertTrue(any(r.start_time < end and start < r.end_time for r in reservations))
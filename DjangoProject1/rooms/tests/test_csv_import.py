@@ -0,0 +1,163 @@
+import csv
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rooms.csv_import import CSVFormatError, apply_rows, import_rooms, open_csv, parse_row, parse_rows, read_header
+from rooms.models import Room
+
+HEADER = ['Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible', 'Équipements']
+
+
+def csv_file(rows, delimiter=',', bom=False):
+    text = StringIO()
+    writer = csv.writer(text, delimiter=delimiter)
+    writer.writerow(HEADER)
+    writer.writerows(rows)
+    return BytesIO(('\ufeff' if bom else '').encode('utf-8') + text.getvalue().encode('utf-8'))
+
+
+def rows(*names, capacity='10'):
+    return [[name, capacity, f'Description de {name}', '12,50', 'oui', 'Wi-Fi, Projecteur'] for name in names]
+
+
+def parse(file):
+    reader = open_csv(file)
+    _, columns = read_header(reader)
+    return list(parse_rows(reader, columns))
+
+
+class OpenCsvTests(TestCase):
+    def test_delimiters(self):
+        for delimiter in (',', ';'):
+            with self.subTest(delimiter=delimiter):
+                (line_number, values, error), = parse(csv_file(rows('Salle A'), delimiter))
+                self.assertEqual((line_number, error), (2, ''))
+                self.assertEqual(values, {
+                    'name': 'Salle A', 'capacity': 10, 'description': 'Description de Salle A',
+                    'price_per_hour': Decimal('12.50'), 'is_available': True,
+                    'amenities': ['Wi-Fi', 'Projecteur'],
+                })
+
+    def test_semicolons_with_decimal_commas(self):
+        # Commas in every data row and a short row: enough to fool csv.Sniffer
+        parsed = parse(csv_file(rows('Salle A', 'Salle B') + [['', '10', 'Salle', '10', 'oui']], ';'))
+        self.assertEqual([error for _, _, error in parsed], ['', '', 'Le nom est obligatoire'])
+
+    def test_byte_order_mark(self):
+        reader = open_csv(csv_file(rows('Salle A'), ';', bom=True))
+        header, columns = read_header(reader)
+        self.assertEqual(header[0], 'Nom')
+        self.assertEqual(columns['Nom'], 0)
+
+    def test_missing_header(self):
+        file = BytesIO('Nom,Capacité,Description\r\nSalle A,10,Salle\r\n'.encode('utf-8'))
+        with self.assertRaisesMessage(CSVFormatError, 'Colonnes manquantes : Prix par heure, Disponible'):
+            read_header(open_csv(file))
+
+    def test_empty_file(self):
+        with self.assertRaisesMessage(CSVFormatError, 'Le fichier CSV est vide.'):
+            read_header(open_csv(BytesIO(b'')))
+
+    def test_not_utf8(self):
+        with self.assertRaisesMessage(CSVFormatError, 'UTF-8'):
+            read_header(open_csv(BytesIO(';'.join(HEADER).encode('latin-1'))))
+
+
+class ParseRowTests(TestCase):
+    columns = {name: index for index, name in enumerate(HEADER)}
+
+    def test_too_few_columns(self):
+        self.assertEqual(parse_row(['Salle A', '10', 'Salle'], self.columns), (None, 'Nombre de colonnes insuffisant'))
+
+    def test_optional_column_may_be_missing(self):
+        values, error = parse_row(['Salle A', '10', 'Salle', '10', 'non'], self.columns)
+        self.assertEqual(error, '')
+        self.assertEqual((values['amenities'], values['is_available']), ([], False))
+
+    def test_invalid_values(self):
+        cases = [
+            (['', '10', 'Salle', '10', 'oui'], 'Le nom est obligatoire'),
+            (['Salle A', 'dix', 'Salle', '10', 'oui'], 'La capacité doit être un nombre entier'),
+            (['Salle A', '0', 'Salle', '10', 'oui'], 'La capacité doit être un nombre positif'),
+            (['Salle A', '10', 'Salle', 'gratuit', 'oui'], 'Le prix doit être un nombre'),
+            (['Salle A', '10', 'Salle', 'NaN', 'oui'], 'Le prix doit être un nombre positif'),
+            (['Salle A', '10', 'Salle', '1e9', 'oui'], 'Le prix est trop élevé'),
+        ]
+        for row, error in cases:
+            with self.subTest(row=row):
+                self.assertEqual(parse_row(row, self.columns), (None, error))
+
+
+class ApplyRowsTests(TestCase):
+    def room(self, name, **fields):
+        values = {
+            'capacity': 10, 'description': f'Description de {name}', 'price_per_hour': Decimal('12.50'),
+            'is_available': True, 'amenities': ['Wi-Fi', 'Projecteur'], **fields,
+        }
+        return Room.objects.create(name=name, **values)
+
+    def apply(self, file_rows, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return apply_rows(parse(csv_file(file_rows)), **kwargs)
+
+    def test_create_update_and_errors(self):
+        self.room('Salle A', capacity=5)
+        result = self.apply(rows('Salle A', 'Salle B') + [['Salle C', 'dix', 'Salle', '10', 'oui']])
+
+        self.assertEqual(result, {'created': 1, 'updated': 1, 'unchanged': 0, 'errors': [(4, 'La capacité doit être un nombre entier')]})
+        self.assertEqual(dict(Room.objects.values_list('name', 'capacity')), {'Salle A': 10, 'Salle B': 10})
+
+    def test_name_repeated_in_file_keeps_last_values(self):
+        result = self.apply(rows('Salle A') + rows('Salle A', capacity='30'))
+
+        self.assertEqual((result['created'], result['updated']), (1, 0))
+        self.assertEqual(Room.objects.get(name='Salle A').capacity, 30)
+
+    def test_oldest_of_rooms_sharing_a_name_is_updated(self):
+        oldest = self.room('Salle A', capacity=5)
+        newest = self.room('Salle A', capacity=5)
+
+        result = self.apply(rows('Salle A', capacity='20'))
+
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        oldest.refresh_from_db()
+        newest.refresh_from_db()
+        self.assertEqual((oldest.capacity, newest.capacity), (20, 5))
+
+    def test_unchanged_rows_are_not_written(self):
+        self.room('Salle A')
+        self.room('Salle B')
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.apply(rows('Salle A', 'Salle B'))
+
+        self.assertEqual(result, {'created': 0, 'updated': 0, 'unchanged': 2, 'errors': []})
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+
+    def test_row_changed_back_after_a_change_is_unchanged(self):
+        self.room('Salle A')
+        result = self.apply(rows('Salle A', capacity='30') + rows('Salle A'))
+        self.assertEqual((result['updated'], result['unchanged']), (0, 1))
+
+    def test_batches(self):
+        for i in range(3):
+            self.room(f'Salle {i}', capacity=5)
+        names = [f'Salle {i}' for i in range(8)]
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.apply(rows(*names), batch_size=2)
+
+        self.assertEqual((result['created'], result['updated']), (5, 3))
+        statements = [q['sql'].split(' ', 1)[0] for q in queries]
+        # 5 new rooms in batches of 2, 3 updated ones in batches of 2
+        self.assertEqual(statements.count('INSERT'), 3)
+        self.assertEqual(statements.count('UPDATE'), 2)
+        self.assertEqual(Room.objects.filter(capacity=10).count(), 8)
+
+    def test_import_rooms(self):
+        result = import_rooms(csv_file(rows('Salle A', 'Salle B'), ';', bom=True))
+        self.assertEqual(result['created'], 2)
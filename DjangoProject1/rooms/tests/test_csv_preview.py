@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rooms.csv_import import PREVIEW_DIR, CSVFormatError, cleanup_previews, load_preview, preview_path, store_preview
+from rooms.models import Room
+
+from . import STORAGES
+from .test_csv_import import csv_file, rows
+from .test_sqlite import LOCMEM_SESSIONS
+
+
+class PreviewStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_round_trip(self):
+        preview = store_preview(csv_file(rows('Salle A', 'Salle B') + [['Salle C', 'dix', 'Salle', '10', 'oui']]))
+
+        self.assertEqual((preview['valid'], preview['invalid']), (2, 1))
+        self.assertEqual(preview['errors'], [(4, 'La capacité doit être un nombre entier')])
+        self.assertEqual([row['name'] for row in preview['rows']], ['Salle A', 'Salle B'])
+        stored = list(load_preview(preview['token']))
+        self.assertEqual([(line_number, values['name']) for line_number, values, _ in stored], [(2, 'Salle A'), (3, 'Salle B')])
+        # Same values as parsing the file again, Decimal included
+        self.assertEqual(stored[0][1], preview['rows'][0])
+
+    def test_invalid_token(self):
+        for token in ('', '../../settings', 'A' * 32, 'abc'):
+            with self.subTest(token=token), self.assertRaisesMessage(CSVFormatError, "Aperçu d'importation invalide."):
+                list(load_preview(token))
+
+    def test_expired_preview(self):
+        token = store_preview(csv_file(rows('Salle A')))['token']
+        os.remove(preview_path(token))
+        with self.assertRaisesMessage(CSVFormatError, "L'aperçu a expiré"):
+            list(load_preview(token))
+
+    def test_cleanup_respects_max_age(self):
+        old = store_preview(csv_file(rows('Salle A')))['token']
+        recent = store_preview(csv_file(rows('Salle B')))['token']
+        two_hours_ago = time.time() - 7200
+        os.utime(preview_path(old), (two_hours_ago, two_hours_ago))
+
+        self.assertEqual(cleanup_previews(max_age=3600), 1)
+
+        self.assertFalse(os.path.exists(preview_path(old)))
+        self.assertTrue(os.path.exists(preview_path(recent)))
+        self.assertEqual(cleanup_previews(max_age=3600), 0)
+
+    def test_cleanup_without_directory(self):
+        self.assertEqual(cleanup_previews(), 0)
+
+
+@override_settings(STORAGES=STORAGES, CACHES=LOCMEM_SESSIONS)
+class PreviewViewsTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(User.objects.create_user(username='staff', is_staff=True))
+
+    def preview(self, file_rows, name='salles.csv'):
+        upload = SimpleUploadedFile(name, csv_file(file_rows, ';').getvalue(), content_type='text/csv')
+        return self.client.post(reverse('rooms:preview_csv_import'), {'csv_file': upload})
+
+    def commit(self, token):
+        # Only the messages of this request
+        self.client.cookies.pop('messages', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('rooms:commit_csv_import'), {'token': token})
+        self.assertRedirects(response, reverse('rooms:admin_dashboard'), fetch_redirect_response=False)
+        return [str(message) for message in get_messages(response.wsgi_request)]
+
+    def preview_files(self):
+        return os.listdir(os.path.join(self.media_root, PREVIEW_DIR))
+
+    def test_preview_response(self):
+        response = self.preview(rows('Salle A') + [['', '10', 'Salle', '10', 'oui']])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertRegex(data.pop('token'), r'^[0-9a-f]{32}$')
+        self.assertEqual(data, {
+            'file_name': 'salles.csv',
+            'rows': [{
+                'Nom': 'Salle A', 'Capacité': 10, 'Prix par heure': '12.50', 'Disponible': 'Oui',
+                'Équipements': 'Wi-Fi, Projecteur',
+            }],
+            'errors': ['Ligne 3: Le nom est obligatoire'],
+            'valid': 1,
+            'invalid': 1,
+        })
+        self.assertFalse(Room.objects.exists())
+
+    def test_preview_errors(self):
+        self.assertEqual(self.preview(rows('Salle A'), name='salles.txt').status_code, 400)
+        response = self.client.post(reverse('rooms:preview_csv_import'), {
+            'csv_file': SimpleUploadedFile('salles.csv', b'Nom;Capacit\xc3\xa9\r\n'),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Colonnes manquantes', response.json()['error'])
+
+    def test_commit_imports_and_deletes_preview(self):
+        token = self.preview(rows('Salle A', 'Salle B') + [['', '10', 'Salle', '10', 'oui']]).json()['token']
+        self.assertEqual(self.preview_files(), [f'{token}.jsonl.gz'])
+
+        messages = self.commit(token)
+
+        self.assertEqual(sorted(Room.objects.values_list('name', flat=True)), ['Salle A', 'Salle B'])
+        self.assertEqual(self.preview_files(), [])
+        self.assertIn('1 lignes invalides ont été ignorées.', messages)
+        self.assertNotIn('csv_import', self.client.session)
+
+    def test_new_preview_replaces_previous_one(self):
+        first = self.preview(rows('Salle A')).json()['token']
+        second = self.preview(rows('Salle B')).json()['token']
+
+        self.assertEqual(self.preview_files(), [f'{second}.jsonl.gz'])
+        self.assertEqual(self.commit(first), ["Aucun aperçu d'importation en cours."])
+        self.assertFalse(Room.objects.exists())
+
+    def test_commit_rejects_invalid_token(self):
+        token = self.preview(rows('Salle A')).json()['token']
+
+        for wrong in ('', '0' * 32, '../' + token):
+            with self.subTest(token=wrong):
+                self.assertEqual(self.commit(wrong), ["Aucun aperçu d'importation en cours."])
+        self.assertFalse(Room.objects.exists())
+        # The real preview is still there to commit
+        self.commit(token)
+        self.assertTrue(Room.objects.filter(name='Salle A').exists())
+
+    def test_commit_expired_preview(self):
+        token = self.preview(rows('Salle A')).json()['token']
+        two_hours_ago = time.time() - 7200
+        os.utime(preview_path(token), (two_hours_ago, two_hours_ago))
+        cleanup_previews()
+
+        messages = self.commit(token)
+
+        self.assertEqual(messages, ["L'aperçu a expiré, veuillez importer le fichier à nouveau."])
+        self.assertFalse(Room.objects.exists())
+        self.assertNotIn('csv_import', self.client.session)
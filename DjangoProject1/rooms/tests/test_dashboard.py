@@ -0,0 +1,74 @@
+from datetime import timedelta
+from decimal import Decimal
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group, User
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rooms.models import Payment, Reservation, Room
+from rooms.utils import DASHBOARD_STATS_CACHE_KEY, book_room, get_dashboard_stats
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.cache_dir},
+            },
+            DASHBOARD_STATS_CACHE_ALIAS='shared',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.room = Room.objects.create(name='Salle A', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        Room.objects.create(name='Salle B', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        self.user = User.objects.create_user(username='alice')
+        Group.objects.create(name='Clients')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def book(self, hours=0):
+        start = self.start + timedelta(hours=hours)
+        reservation = Reservation(
+            room=self.room, user=self.user, start_time=start, end_time=start + timedelta(hours=1),
+            total_price=Decimal('10.00'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            book_room(reservation)
+        return reservation
+
+    def test_single_query(self):
+        reservation = self.book()
+        Payment.objects.create(reservation=reservation, amount=Decimal('10.00'), payment_method='cash', transaction_id='TX-1')
+        self.book(hours=2)
+
+        with self.assertNumQueries(1):
+            stats = get_dashboard_stats()
+        self.assertEqual(stats, {
+            'reservations': 2, 'pending_reservations': 2, 'confirmed_reservations': 0, 'cancelled_reservations': 0,
+            'pending_payments': 1, 'rooms': 2, 'users': 1, 'groups': 1,
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_stats(), stats)
+
+    def test_counts_without_reservations(self):
+        self.assertEqual(
+            {key: get_dashboard_stats()[key] for key in ('reservations', 'rooms', 'users', 'groups')},
+            {'reservations': 0, 'rooms': 2, 'users': 1, 'groups': 1},
+        )
+
+    def test_booking_invalidates_every_worker(self):
+        self.assertEqual(get_dashboard_stats()['reservations'], 0)
+        # What another worker process sees: its own handle on the shared cache
+        other = FileBasedCache(self.cache_dir, {})
+        self.assertEqual(other.get(DASHBOARD_STATS_CACHE_KEY)['reservations'], 0)
+
+        self.book()
+
+        self.assertIsNone(other.get(DASHBOARD_STATS_CACHE_KEY))
+        self.assertEqual(get_dashboard_stats()['reservations'], 1)
@@ -0,0 +1,109 @@
+import csv
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+import shutil
+import tempfile
+from unittest import mock
+import zipfile
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.models import ReceiptJob, Reservation, Room
+
+from . import STORAGES
+
+
+@override_settings(STORAGES=STORAGES)
+class ExportReservationsCsvTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        start = timezone.now() + timedelta(days=1)
+        cls.rooms = [
+            Room.objects.create(name=f'Salle {i}', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+            for i in range(2)
+        ]
+        for room in cls.rooms:
+            Reservation.objects.create(
+                room=room, user=cls.staff, start_time=start, end_time=start + timedelta(hours=1),
+                total_price=Decimal('10.00'),
+            )
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('rooms:export_reservations_csv'), params)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        return [row[1] for row in rows[1:]]
+
+    def test_room_filter(self):
+        self.assertEqual(self.export(room=self.rooms[1].pk), ['Salle 1'])
+
+    def test_invalid_room_filter_is_ignored(self):
+        for room in ('abc', '1.5', '', '-1', '99999999999999999999999'):
+            with self.subTest(room=room):
+                self.assertEqual(sorted(self.export(room=room)), ['Salle 0', 'Salle 1'])
+
+    def test_unknown_room(self):
+        self.assertEqual(self.export(room=max(room.pk for room in self.rooms) + 1), [])
+
+
+@override_settings(STORAGES=STORAGES, RECEIPT_EXPORT_THREADS=2)
+class ExportReceiptsZipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser(username='staff', email='staff@example.com', password='secret')
+        room = Room.objects.create(name='Salle A', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        start = timezone.now() + timedelta(days=1)
+        cls.reservations = [
+            Reservation.objects.create(
+                room=room, user=cls.staff, start_time=start + timedelta(hours=2 * i),
+                end_time=start + timedelta(hours=2 * i + 1), total_price=Decimal('10.00'),
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root, ignore_errors=True)
+        override = override_settings(RECEIPT_CACHE_ROOT=self.cache_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.staff)
+
+    def export(self):
+        return self.client.post(reverse('admin:rooms_reservation_changelist'), {
+            'action': 'export_receipts_zip',
+            '_selected_action': [reservation.pk for reservation in self.reservations],
+        })
+
+    @override_settings(RECEIPT_EXPORT_INLINE_LIMIT=10)
+    def test_small_export_is_rendered_by_threads(self):
+        with mock.patch('rooms.receipts.ProcessPoolExecutor') as processes, self.assertLogs('rooms.admin') as logs:
+            response = self.export()
+            archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        processes.assert_not_called()
+        self.assertIn('Exported 3 receipts', logs.output[0])
+        self.assertEqual(
+            sorted(archive.namelist()),
+            [f'reservation_{reservation.pk}.pdf' for reservation in self.reservations],
+        )
+        self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+        self.assertFalse(ReceiptJob.objects.exists())
+
+    @override_settings(RECEIPT_EXPORT_INLINE_LIMIT=2)
+    def test_large_export_is_queued(self):
+        response = self.export()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(ReceiptJob.objects.filter(status='pending').values_list('reservation', flat=True)),
+            [reservation.pk for reservation in self.reservations],
+        )
+        message, = get_messages(response.wsgi_request)
+        self.assertIn("3 reçus ne sont pas encore générés", message.message)
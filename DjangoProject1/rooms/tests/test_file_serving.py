@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+
+from django.http import HttpResponseNotFound
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from rooms.file_serving import RangeNotSatisfiable, accepts_encoding, parse_range
+from rooms.middleware import FileServingMiddleware
+
+CONTENT = bytes(range(256)) * 4
+
+
+class FileServingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.media_root = os.path.join(self.root, 'media')
+        for name in ('room_images/plan.txt', 'temp_csv/preview.jsonl.gz'):
+            path = os.path.join(self.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+        # Outside MEDIA_ROOT
+        with open(os.path.join(self.root, 'secret.txt'), 'wb') as file:
+            file.write(b'secret')
+
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get(self, path, method='get', **headers):
+        request = getattr(RequestFactory(), method)(path, headers=headers)
+        return FileServingMiddleware(lambda request: HttpResponseNotFound())(request)
+
+    def body(self, response):
+        content = b''.join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_whole_file(self):
+        response = self.get('/media/room_images/plan.txt')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_if_none_match(self):
+        etag = self.get('/media/room_images/plan.txt')['ETag']
+
+        response = self.get('/media/room_images/plan.txt', If_None_Match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get('/media/room_images/plan.txt', If_None_Match='"autre"').status_code, 200)
+
+    def test_single_range(self):
+        cases = [
+            ('bytes=0-9', 0, 9),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-24', 1000, 1023),
+            ('bytes=1000-5000', 1000, 1023),
+        ]
+        for header, start, end in cases:
+            with self.subTest(range=header):
+                response = self.get('/media/room_images/plan.txt', Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(CONTENT)}')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+                self.assertEqual(self.body(response), CONTENT[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=1024-', 'bytes=5000-6000', 'bytes=-0'):
+            with self.subTest(range=header):
+                response = self.get('/media/room_images/plan.txt', Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_ignored_ranges_send_the_whole_file(self):
+        for header in ('bytes=0-1,5-6', 'bytes=9-1', 'lines=1-2'):
+            with self.subTest(range=header):
+                response = self.get('/media/room_images/plan.txt', Range=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body(response), CONTENT)
+
+    def test_stale_if_range_sends_the_whole_file(self):
+        response = self.get('/media/room_images/plan.txt', Range='bytes=0-9', If_Range='"ancienne"')
+        self.assertEqual(response.status_code, 200)
+        self.body(response)
+
+    def test_head(self):
+        response = self.get('/media/room_images/plan.txt', method='head')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal(self):
+        for path in (
+            '/media/../secret.txt',
+            '/media/room_images/../../secret.txt',
+            '/media//' + os.path.join(self.root, 'secret.txt').lstrip('/'),
+            '/media/' + os.path.join(self.root, 'secret.txt'),
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).status_code, 404)
+
+    def test_private_media(self):
+        self.assertEqual(self.get('/media/temp_csv/preview.jsonl.gz').status_code, 404)
+
+    def test_precompressed_copy(self):
+        with open(os.path.join(self.media_root, 'room_images/plan.txt.gz'), 'wb') as file:
+            file.write(b'gzip')
+
+        response = self.get('/media/room_images/plan.txt', Accept_Encoding='gzip, deflate')
+        self.assertEqual((response['Content-Encoding'], response['Vary']), ('gzip', 'Accept-Encoding'))
+        self.assertEqual(self.body(response), b'gzip')
+
+        response = self.get('/media/room_images/plan.txt', Accept_Encoding='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response), CONTENT)
+
+    @override_settings(FILE_SERVING_OFFLOAD='x-accel-redirect', FILE_SERVING_ACCEL_PREFIX='/internal/')
+    def test_x_accel_redirect(self):
+        response = self.get('/media/room_images/plan.txt', Range='bytes=0-9')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/internal/media/room_images/plan.txt')
+        self.assertEqual(response.content, b'')
+        self.assertFalse(response.has_header('Content-Range'))
+        self.assertTrue(response.has_header('ETag'))
+
+    @override_settings(FILE_SERVING_OFFLOAD='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.get('/media/room_images/plan.txt')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'room_images', 'plan.txt'))
+        self.assertEqual(response.content, b'')
+
+
+class ParsingTests(SimpleTestCase):
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=10-19', 100), (10, 19))
+        self.assertEqual(parse_range('bytes = 90 -', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 99))
+        self.assertIsNone(parse_range('bytes=-', 100))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-', 100)
+
+    def test_accepts_encoding(self):
+        self.assertTrue(accepts_encoding('br, gzip', 'br'))
+        self.assertTrue(accepts_encoding('*', 'gzip'))
+        self.assertFalse(accepts_encoding('br;q=0, *', 'br'))
+        self.assertFalse(accepts_encoding('gzip;q=abc', 'gzip'))
+        self.assertFalse(accepts_encoding('', 'gzip'))
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from io import BytesIO, StringIO
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from rooms import images
+from rooms.models import Room
+
+
+def jpeg(width=1000, height=600):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='salle.jpg')
+
+
+class SupportedFormatsTests(TestCase):
+    def tearDown(self):
+        images.supported_formats.cache_clear()
+
+    def test_avif_skipped_without_encoder(self):
+        images.supported_formats.cache_clear()
+        with mock.patch('PIL.features.get_supported', return_value=['webp', 'jpg']):
+            self.assertEqual(list(images.supported_formats()), ['webp', 'jpeg'])
+
+
+class RoomVariantsTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def create_room(self, name='Salle A'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Room.objects.create(
+                name=name, capacity=10, description='Salle', price_per_hour=Decimal('10.00'), image=jpeg(),
+            )
+
+    def test_saving_room_does_not_encode(self):
+        with mock.patch('rooms.images.generate_variants') as generate:
+            room = self.create_room()
+        generate.assert_not_called()
+        room.refresh_from_db()
+        self.assertEqual(room.image_variants, {})
+        self.assertTrue(images.needs_variants(room.image.name, room.image_variants))
+
+    def test_command_generates_missing_variants(self):
+        room = self.create_room()
+        # In a process pool of one: the test database is only visible here
+        with mock.patch('rooms.management.commands.generate_image_variants.ProcessPoolExecutor',
+                        new=_InlineExecutor):
+            call_command('generate_image_variants', stdout=StringIO(), stderr=StringIO())
+
+        room.refresh_from_db()
+        variants = room.image_variants
+        self.assertEqual(variants['source'], room.image.name)
+        self.assertEqual(set(variants['formats']), set(images.supported_formats()))
+        self.assertEqual(variants['formats']['jpeg'], [400, 800])
+        for name in images.variant_names(variants):
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_room_sharing_an_image_reuses_its_variants(self):
+        first = self.create_room()
+        variants = images.generate_variants(first.image.name)
+        Room.objects.filter(pk=first.pk).update(image_variants=variants)
+
+        with mock.patch('rooms.images.generate_variants') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                second = Room.objects.create(
+                    name='Salle B', capacity=10, description='Salle', price_per_hour=Decimal('10.00'),
+                    image=first.image.name,
+                )
+        generate.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants, variants)
+
+
+class _InlineExecutor:
+    """A ProcessPoolExecutor running every task in the calling thread."""
+
+    def __init__(self, max_workers=None, initializer=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, func, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import ResolverMatch
+
+from rooms.metrics import DURATION_BUCKETS, Registry
+from rooms.middleware import RequestMetricsMiddleware
+
+BODY_TIME = 0.3
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        patcher = mock.patch('rooms.middleware.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, response):
+        request = RequestFactory().get('/export/')
+        request.resolver_match = ResolverMatch(lambda request: None, (), {}, url_name='export')
+        return RequestMetricsMiddleware(lambda request: response)(request)
+
+    def series(self, name):
+        labels = {'view': 'export'}
+        if name == 'rooms_request_duration_seconds':
+            labels.update(method='GET', status='200')
+        return self.registry.series.get(json.dumps([name, labels], sort_keys=True))
+
+    def test_plain_response_recorded_at_once(self):
+        self.get(HttpResponse('ok'))
+        self.assertEqual(sum(self.series('rooms_request_duration_seconds')[:-1]), 1)
+
+    def test_streaming_response_recorded_when_body_is_sent(self):
+        def rows():
+            yield b'id\n'
+            # The slow part of an export: reading and writing the rows
+            time.sleep(BODY_TIME)
+            yield f'{User.objects.count()}\n'.encode()
+
+        response = self.get(StreamingHttpResponse(rows()))
+        self.assertIsNone(self.series('rooms_request_duration_seconds'))
+
+        self.assertEqual(b''.join(response.streaming_content), b'id\n0\n')
+        response.close()
+
+        duration = self.series('rooms_request_duration_seconds')
+        self.assertEqual(sum(duration[:-1]), 1)
+        self.assertGreaterEqual(duration[-1], BODY_TIME)
+        # The bucket holding BODY_TIME, not the first one
+        self.assertEqual(duration[DURATION_BUCKETS.index(0.5)], 1)
+        self.assertEqual(self.series('rooms_request_db_queries')[-1], 1)
+
+    def test_file_response_keeps_its_file(self):
+        with tempfile.NamedTemporaryFile(delete=False) as source:
+            source.write(b'%PDF-1.4')
+        self.addCleanup(os.remove, source.name)
+
+        response = self.get(FileResponse(open(source.name, 'rb')))
+        # Still eligible for wsgi.file_wrapper
+        self.assertIsNotNone(response.file_to_stream)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+        response.close()
+        self.assertEqual(sum(self.series('rooms_request_duration_seconds')[:-1]), 1)
@@ -0,0 +1,16 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from . import STORAGES
+
+
+@override_settings(STORAGES=STORAGES)
+class CheckQueryBudgetTests(TestCase):
+    # The project settings as shipped: no host allowed besides DEBUG's localhost
+    @override_settings(ALLOWED_HOSTS=[])
+    def test_real_views_stay_within_budget(self):
+        stdout = StringIO()
+        call_command('check_query_budget', small=1, large=5, stdout=stdout)
+        self.assertIn('All list views run a constant number of queries.', stdout.getvalue())
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from rooms.middleware import QueryDetectorMiddleware
+from rooms.models import Reservation, Room
+from rooms.query_detector import QueryProblemsError, detect_queries, normalize_sql
+
+
+class NormalizeSqlTests(TestCase):
+    def test_values_are_replaced(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM rooms_room WHERE name = 'L''Atlas' AND capacity > 10 AND price < 12.5"),
+            'SELECT * FROM rooms_room WHERE name = ? AND capacity > ? AND price < ?',
+        )
+        self.assertEqual(
+            normalize_sql('SELECT *\n  FROM rooms_room WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM rooms_room WHERE id IN (...)',
+        )
+        self.assertEqual(normalize_sql('SELECT * FROM t WHERE id IN (1,2)'), normalize_sql('SELECT * FROM t WHERE id IN (3)'))
+
+
+class QueryDetectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='alice')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(6):
+            room = Room.objects.create(name=f'Salle {i}', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+            Reservation.objects.create(
+                room=room, user=user, start_time=start, end_time=start + timedelta(hours=1), total_price=Decimal('10.00'),
+            )
+
+    def room_names(self, count):
+        names = []
+        for reservation in Reservation.objects.all()[:count]:
+            # One query per reservation for its room: an N+1
+            names.append(reservation.room.name)
+        return names
+
+    def test_repeated_shape_raises(self):
+        with self.assertRaises(QueryProblemsError) as raised:
+            with detect_queries('liste', repeat_threshold=5):
+                self.room_names(5)
+        message = str(raised.exception)
+        self.assertIn('liste: 5 x SELECT', message)
+        self.assertIn('FROM "rooms_room" WHERE "rooms_room"."id" = ?', message)
+        self.assertIn('rooms/tests/test_query_detector.py:', message)
+        self.assertIn('in room_names', message)
+
+    def test_below_threshold(self):
+        with detect_queries('liste', repeat_threshold=5) as detector:
+            self.room_names(4)
+        self.assertEqual(detector.problems(), [])
+
+    def test_select_related_is_not_reported(self):
+        with detect_queries('liste', repeat_threshold=2):
+            [reservation.room.name for reservation in Reservation.objects.select_related('room')]
+
+    def test_logs_instead_of_raising(self):
+        with self.assertLogs('rooms.queries', 'WARNING') as logs:
+            with detect_queries('liste', raise_errors=False, repeat_threshold=5):
+                self.room_names(6)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('liste: 6 x SELECT', logs.output[0])
+
+    def test_transaction_control_is_ignored(self):
+        with detect_queries(repeat_threshold=2) as detector:
+            for _ in range(3):
+                with transaction.atomic():
+                    pass
+        self.assertEqual(detector.problems(), [])
+
+    def test_slow_query(self):
+        with self.assertRaisesMessage(QueryProblemsError, 'slow query'):
+            with detect_queries(slow_ms=1e-6):
+                Room.objects.count()
+
+    def test_template_origin(self):
+        template = Template('{% for reservation in reservations %}\n{{ reservation.room.name }}{% endfor %}')
+        with self.assertRaisesMessage(QueryProblemsError, '<unknown source>:2'):
+            with detect_queries(repeat_threshold=5):
+                template.render(Context({'reservations': Reservation.objects.all()}))
+
+
+class QueryDetectorMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Room.objects.create(name=f'Salle {i}', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+
+    def view(self, request):
+        for room in Room.objects.all():
+            Room.objects.filter(pk=room.pk).exists()
+        return self.response
+
+    def call(self):
+        self.response = HttpResponse('ok', headers={'X-Test': '1'})
+        return QueryDetectorMiddleware(self.view)(RequestFactory().get('/salles/'))
+
+    @override_settings(QUERY_DETECTOR_SAMPLE_RATE=0)
+    def test_sample_rate_zero_does_nothing(self):
+        with mock.patch('rooms.middleware.QueryDetector') as detector, \
+                mock.patch('rooms.middleware.random.random') as random:
+            response = self.call()
+        detector.assert_not_called()
+        random.assert_not_called()
+        self.assertIs(response, self.response)
+
+    @override_settings(QUERY_DETECTOR_SAMPLE_RATE=0.5)
+    def test_unsampled_request_is_not_watched(self):
+        with mock.patch('rooms.middleware.QueryDetector') as detector, \
+                mock.patch('rooms.middleware.random.random', return_value=0.5):
+            self.call()
+        detector.assert_not_called()
+
+    @override_settings(QUERY_DETECTOR_SAMPLE_RATE=1, QUERY_DETECTOR_RAISE=False)
+    def test_logs_and_leaves_response_unchanged(self):
+        with self.assertLogs('rooms.queries', 'WARNING') as logs:
+            response = self.call()
+        self.assertIs(response, self.response)
+        self.assertEqual((response.status_code, response.content, response['X-Test']), (200, b'ok', '1'))
+        self.assertIn('/salles/: 5 x SELECT', logs.output[0])
+
+    @override_settings(QUERY_DETECTOR_SAMPLE_RATE=1, QUERY_DETECTOR_RAISE=True)
+    def test_raises(self):
+        with self.assertRaises(QueryProblemsError):
+            self.call()
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from rooms.models import Reservation, Room
+from rooms.receipt_layout import PAGE_HEIGHT, ReceiptLayout
+from rooms.utils import register_receipt_fonts
+
+
+class ReceiptLayoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='alice', first_name='Alice', last_name='Martin', email='alice@example.com')
+        room = Room.objects.create(name='Salle Atlas', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.reservation = Reservation.objects.create(
+            room=room, user=user, start_time=start, end_time=start + timedelta(hours=2), total_price=Decimal('20.00'),
+        )
+
+    def render(self, layout, reference=False):
+        """The receipt PDF, deterministic: fixed footer date, no random document id."""
+        with mock.patch('reportlab.rl_config.invariant', 1), mock.patch('rooms.receipt_layout.datetime') as now:
+            now.now.return_value = datetime(2030, 1, 1, 12, 0)
+            if reference:
+                # Draw the static part directly instead of replaying it
+                with mock.patch.object(layout, 'replay', layout.draw_static):
+                    return layout.render(self.reservation)
+            return layout.render(self.reservation)
+
+    def logo(self):
+        from PIL import Image
+
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as file:
+            Image.new('RGB', (32, 32), (41, 128, 185)).save(file, 'PNG')
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_replay_matches_reference_drawing(self):
+        for logo_path in (None, self.logo()):
+            with self.subTest(logo=bool(logo_path)):
+                layout = ReceiptLayout(register_receipt_fonts(), logo_path)
+                replayed = self.render(layout)
+                self.assertTrue(replayed.startswith(b'%PDF'))
+                self.assertEqual(replayed, self.render(layout, reference=True))
+
+    def test_comparison_sees_a_missing_operation(self):
+        layout = ReceiptLayout(register_receipt_fonts())
+        reference = self.render(layout, reference=True)
+        layout.ops = [op for op in layout.ops if op[0] != 'roundRect']
+        self.assertNotEqual(self.render(layout), reference)
+
+    def test_grid_fits_the_page(self):
+        layout = ReceiptLayout(register_receipt_fonts(), self.logo())
+        positions = [layout.reservation_id_y, layout.qr_y, layout.footer_y]
+        positions += [middle for _, middle, _ in layout.fields.values()]
+        self.assertTrue(all(0 < y < PAGE_HEIGHT for y in positions))
+        # From top to bottom: number, tables, QR code, footer
+        self.assertGreater(layout.reservation_id_y, layout.fields['room'][1])
+        self.assertGreater(layout.fields['created_at'][1], layout.qr_y)
+        self.assertGreater(layout.qr_y, layout.footer_y)
@@ -0,0 +1,181 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms import utils
+from rooms.models import Payment, ReceiptJob, Reservation, Room
+from rooms.receipts import (
+    RECEIPT_JOB_MAX_ATTEMPTS, RECEIPT_JOB_TIMEOUT, cached_receipt_path, claim_receipt_jobs, enqueue_receipt,
+    get_receipt_path, receipt_fingerprint, run_receipt_job,
+)
+
+from . import STORAGES
+
+
+class ReceiptTestCase(TestCase):
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root, ignore_errors=True)
+        override = override_settings(RECEIPT_CACHE_ROOT=self.cache_root, STORAGES=STORAGES)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='alice', first_name='Alice', email='alice@example.com')
+        self.room = Room.objects.create(name='Salle A', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.reservation = Reservation.objects.create(
+            room=self.room, user=self.user, start_time=start, end_time=start + timedelta(hours=1),
+            total_price=Decimal('10.00'),
+        )
+
+        patcher = mock.patch('rooms.utils.generate_reservation_receipt', wraps=utils.generate_reservation_receipt)
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reload(self):
+        return Reservation.objects.select_related('room', 'user').get(pk=self.reservation.pk)
+
+
+class ReceiptCacheTests(ReceiptTestCase):
+    def test_second_request_reads_the_cache(self):
+        self.client.force_login(self.user)
+        url = reverse('rooms:download_pdf', args=[self.reservation.pk])
+
+        first = b''.join(self.client.get(url).streaming_content)
+        second = b''.join(self.client.get(url).streaming_content)
+
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertEqual(second, first)
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_changed_field_renders_again(self):
+        path = get_receipt_path(self.reload())
+        changes = [
+            lambda: Room.objects.filter(pk=self.room.pk).update(name='Salle B'),
+            lambda: User.objects.filter(pk=self.user.pk).update(email='alice@example.org'),
+            lambda: Reservation.objects.filter(pk=self.reservation.pk).update(total_price=Decimal('12.00')),
+        ]
+        for change in changes:
+            before = receipt_fingerprint(self.reload())
+            change()
+            reservation = self.reload()
+            with self.subTest(fingerprint=before):
+                self.assertNotEqual(receipt_fingerprint(reservation), before)
+                self.assertIsNone(cached_receipt_path(reservation))
+                new_path = get_receipt_path(reservation)
+                self.assertNotEqual(new_path, path)
+                self.assertTrue(os.path.exists(new_path))
+                path = new_path
+        self.assertEqual(self.render.call_count, 1 + len(changes))
+
+    def test_unchanged_reservation_keeps_its_fingerprint(self):
+        self.assertEqual(receipt_fingerprint(self.reload()), receipt_fingerprint(self.reload()))
+        get_receipt_path(self.reload())
+        get_receipt_path(self.reload())
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_saving_the_reservation_drops_its_receipts(self):
+        path = get_receipt_path(self.reload())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservation.save()
+        self.assertFalse(os.path.exists(path))
+
+
+class ReceiptJobTests(ReceiptTestCase):
+    def test_job_is_claimed_once(self):
+        enqueue_receipt(self.reservation)
+
+        job, = claim_receipt_jobs(10)
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+        self.assertEqual(job.reservation.room.name, 'Salle A')
+        self.assertEqual(claim_receipt_jobs(10), [])
+
+    def test_job_of_a_dead_worker_is_claimed_again(self):
+        enqueue_receipt(self.reservation)
+        claim_receipt_jobs(10)
+        ReceiptJob.objects.update(updated_at=timezone.now() - RECEIPT_JOB_TIMEOUT - timedelta(seconds=1))
+
+        job, = claim_receipt_jobs(10)
+        self.assertEqual(job.attempts, 2)
+
+    def test_done(self):
+        enqueue_receipt(self.reservation)
+        job, = claim_receipt_jobs(10)
+
+        self.assertTrue(run_receipt_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('done', ''))
+        self.assertIsNotNone(cached_receipt_path(self.reload()))
+        self.assertEqual(claim_receipt_jobs(10), [])
+
+    def test_failed_after_max_attempts(self):
+        enqueue_receipt(self.reservation)
+        self.render.side_effect = RuntimeError('police introuvable')
+
+        for attempt in range(1, RECEIPT_JOB_MAX_ATTEMPTS + 1):
+            job, = claim_receipt_jobs(10)
+            self.assertEqual(job.attempts, attempt)
+            self.assertFalse(run_receipt_job(job))
+            job.refresh_from_db()
+            expected = 'failed' if attempt == RECEIPT_JOB_MAX_ATTEMPTS else 'pending'
+            self.assertEqual((job.status, job.error), (expected, 'police introuvable'))
+
+        self.assertEqual(claim_receipt_jobs(10), [])
+
+    def test_enqueue_again_resets_the_job(self):
+        enqueue_receipt(self.reservation)
+        self.render.side_effect = RuntimeError('police introuvable')
+        for _ in range(RECEIPT_JOB_MAX_ATTEMPTS):
+            run_receipt_job(claim_receipt_jobs(10)[0])
+
+        enqueue_receipt(self.reservation)
+
+        job = ReceiptJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), ('pending', 0, ''))
+
+    def test_approved_while_rendering_stays_queued(self):
+        enqueue_receipt(self.reservation)
+        job, = claim_receipt_jobs(10)
+        enqueue_receipt(self.reservation)
+
+        self.assertTrue(run_receipt_job(job))
+
+        self.assertEqual(ReceiptJob.objects.get().status, 'pending')
+
+    def test_approvals_enqueue_instead_of_rendering(self):
+        self.client.force_login(User.objects.create_user(username='staff', is_staff=True))
+        payment = Payment.objects.create(
+            reservation=self.reservation, amount=Decimal('10.00'), payment_method='card', transaction_id='TX-1',
+        )
+        other = Reservation.objects.create(
+            room=self.room, user=self.user, start_time=self.reservation.end_time,
+            end_time=self.reservation.end_time + timedelta(hours=1), total_price=Decimal('10.00'),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('rooms:approve_payment', args=[payment.pk]))
+            self.client.get(reverse('rooms:approve_reservation', args=[other.pk]))
+
+        self.render.assert_not_called()
+        self.assertEqual(
+            sorted(ReceiptJob.objects.filter(status='pending').values_list('reservation', flat=True)),
+            [self.reservation.pk, other.pk],
+        )
+
+        stdout = StringIO()
+        call_command('process_receipt_jobs', once=True, stdout=stdout)
+
+        self.assertIn('2 receipts rendered, 0 failures', stdout.getvalue())
+        self.assertEqual(self.render.call_count, 2)
+        self.assertEqual(set(ReceiptJob.objects.values_list('status', flat=True)), {'done'})
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.models import Reservation, Room
+from rooms.utils import build_search_windows, filter_free_rooms
+from rooms.views import parse_search_windows
+
+from . import STORAGES
+
+
+def at(day, hour):
+    return timezone.make_aware(datetime(2030, 1, day, hour))
+
+
+class SearchWindowsTests(TestCase):
+    def test_single_window(self):
+        self.assertEqual(build_search_windows(at(7, 10), end_time=at(7, 12)), [(at(7, 10), at(7, 12))])
+        self.assertEqual(build_search_windows(at(7, 10), duration=timedelta(hours=2)), [(at(7, 10), at(7, 12))])
+
+    def test_recurrence(self):
+        self.assertEqual(
+            build_search_windows(at(7, 10), end_time=at(7, 12), recurrence='weekly', occurrences=3),
+            [(at(7, 10), at(7, 12)), (at(14, 10), at(14, 12)), (at(21, 10), at(21, 12))],
+        )
+        self.assertEqual(len(build_search_windows(at(7, 10), end_time=at(7, 12), recurrence='daily', occurrences=5)), 5)
+
+    def test_invalid_windows(self):
+        for kwargs in (
+            {},
+            {'end_time': at(7, 10)},
+            {'end_time': at(7, 9)},
+            {'duration': timedelta(minutes=-30)},
+            {'end_time': at(7, 12), 'recurrence': 'monthly'},
+        ):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                build_search_windows(at(7, 10), **kwargs)
+
+    def test_parse_search_windows(self):
+        windows = parse_search_windows({
+            'start_time': '2030-01-07T10:00', 'duration': '90', 'recurrence': 'daily', 'occurrences': '2',
+        })
+        self.assertEqual(windows, [(at(7, 10), at(7, 11) + timedelta(minutes=30)), (at(8, 10), at(8, 11) + timedelta(minutes=30))])
+
+
+class FilterFreeRoomsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='alice')
+        cls.busy, cls.free = [
+            Room.objects.create(name=name, capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+            for name in ('Salle occupée', 'Salle libre')
+        ]
+        # Busy on the 14th from 10:00 to 12:00, and a cancelled booking on the 21st
+        Reservation.objects.create(room=cls.busy, user=user, start_time=at(14, 10), end_time=at(14, 12), total_price=Decimal('20.00'))
+        Reservation.objects.create(
+            room=cls.busy, user=user, start_time=at(21, 10), end_time=at(21, 12), total_price=Decimal('20.00'),
+            status='cancelled',
+        )
+
+    def free_rooms(self, windows):
+        return set(filter_free_rooms(Room.objects.all(), windows).values_list('name', flat=True))
+
+    def test_overlapping_window_excludes_the_room(self):
+        for window in ((at(14, 11), at(14, 13)), (at(14, 9), at(14, 11)), (at(14, 10), at(14, 12)), (at(14, 8), at(14, 14))):
+            with self.subTest(window=window):
+                self.assertEqual(self.free_rooms([window]), {'Salle libre'})
+
+    def test_touching_window_keeps_the_room(self):
+        for window in ((at(14, 12), at(14, 13)), (at(14, 8), at(14, 10))):
+            with self.subTest(window=window):
+                self.assertEqual(self.free_rooms([window]), {'Salle occupée', 'Salle libre'})
+
+    def test_any_window_of_a_recurrence_excludes_the_room(self):
+        windows = build_search_windows(at(7, 11), end_time=at(7, 13), recurrence='weekly', occurrences=3)
+        self.assertEqual(self.free_rooms(windows), {'Salle libre'})
+        # Only the 7th: the room is free that day
+        self.assertEqual(self.free_rooms(windows[:1]), {'Salle occupée', 'Salle libre'})
+
+    def test_cancelled_reservation_does_not_block(self):
+        self.assertEqual(self.free_rooms([(at(21, 10), at(21, 12))]), {'Salle occupée', 'Salle libre'})
+
+
+@override_settings(STORAGES=STORAGES)
+class RoomListSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = user = User.objects.create_user(username='alice')
+        cls.busy = Room.objects.create(name='Salle occupée', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        Room.objects.create(name='Salle libre', capacity=10, description='Salle', price_per_hour=Decimal('10.00'))
+        Reservation.objects.create(room=cls.busy, user=user, start_time=at(14, 10), end_time=at(14, 12), total_price=Decimal('20.00'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def search(self, **params):
+        response = self.client.get(reverse('rooms:room_list'), params)
+        self.assertEqual(response.status_code, 200)
+        names = [room.name for room in response.context['rooms']]
+        return names, [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_search(self):
+        self.assertEqual(self.search(start_time='2030-01-14T11:00', duration='60'), (['Salle libre'], []))
+        self.assertEqual(
+            self.search(start_time='2030-01-07T11:00', duration='60', recurrence='weekly', occurrences='2'),
+            (['Salle libre'], []),
+        )
+        self.assertEqual(
+            self.search(start_time='2030-01-14T12:00', end_time='2030-01-14T13:00'),
+            (['Salle libre', 'Salle occupée'], []),
+        )
+
+    def test_malformed_params_are_form_errors(self):
+        cases = [
+            ({'start_time': 'demain', 'duration': '60'}, "Format de date invalide."),
+            ({'start_time': '2030-13-45T10:00', 'duration': '60'}, "Format de date invalide."),
+            ({'start_time': '2030-01-14T10:00', 'end_time': 'midi'}, "Format de date invalide."),
+            ({'start_time': '2030-01-14T10:00'}, "Une heure de fin ou une durée est requise."),
+            ({'start_time': '2030-01-14T10:00', 'duration': 'une heure'}, "La durée doit être un nombre entier de minutes."),
+            ({'start_time': '2030-01-14T10:00', 'duration': '-60'}, "L'heure de fin doit être après l'heure de début."),
+            ({'start_time': '2030-01-14T10:00', 'end_time': '2030-01-14T09:00'}, "L'heure de fin doit être après l'heure de début."),
+            ({'start_time': '2030-01-14T10:00', 'duration': '60', 'occurrences': 'deux'}, "Le nombre d'occurrences doit être un nombre entier."),
+            ({'start_time': '2030-01-14T10:00', 'duration': '60', 'recurrence': 'weekly', 'occurrences': '0'}, "Le nombre d'occurrences doit être compris entre 1 et 52."),
+            ({'start_time': '2030-01-14T10:00', 'duration': '60', 'recurrence': 'monthly', 'occurrences': '2'}, "Récurrence invalide."),
+            ({'start_time': '2030-01-14T10:00', 'duration': '9' * 20}, "La durée est trop longue."),
+            ({'start_time': '9999-12-31T23:00', 'duration': '120'}, "Les dates recherchées sont hors limites."),
+            ({'start_time': '9999-12-01T10:00', 'duration': '60', 'recurrence': 'weekly', 'occurrences': '52'}, "Les dates recherchées sont hors limites."),
+        ]
+        for params, error in cases:
+            with self.subTest(**params):
+                # The search is ignored, every room is listed
+                self.assertEqual(self.search(**params), (['Salle libre', 'Salle occupée'], [error]))
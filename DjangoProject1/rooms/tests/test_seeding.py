@@ -0,0 +1,200 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from rooms.models import Room
+from rooms.seeding import seed_rooms
+
+
+def jpeg(color):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ImageServer:
+    """
+    Local stand-in for the image host, in a thread. routes maps a path to
+    (status, content type, body); other paths answer 404. Counts requests.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                status, content_type, body = server.routes.get(self.path, (404, 'text/plain', b'Not found'))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def room(name, image_url=None, **fields):
+    data = {
+        'name': name,
+        'description': f'Description de {name}',
+        'capacity': 10,
+        'price_per_hour': 500,
+        'is_available': True,
+        'amenities': ['Wi-Fi'],
+        **fields,
+    }
+    if image_url:
+        data['image_url'] = image_url
+    return data
+
+
+class SeedRoomsTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.server = ImageServer({
+            '/atlas.jpg': (200, 'image/jpeg', jpeg((200, 120, 40))),
+            '/medina.jpg': (200, 'image/jpeg', jpeg((40, 120, 200))),
+            '/error.jpg': (500, 'text/plain', b'Internal error'),
+            '/page.jpg': (200, 'text/html', b'<html><body>Maintenance</body></html>'),
+            '/truncated.jpg': (200, 'image/jpeg', jpeg((0, 0, 0))[:100]),
+        })
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_successful_fetch(self):
+        result = seed_rooms([
+            room('Salle Atlas', self.server.url('/atlas.jpg')),
+            room('Espace Medina', self.server.url('/medina.jpg')),
+            # Same URL: fetched once, stored once
+            room('Salle Atlas bis', self.server.url('/atlas.jpg')),
+        ])
+
+        self.assertEqual(result, {'created': 3, 'skipped': 0, 'images': 2, 'errors': []})
+        self.assertEqual(sorted(self.server.requests), ['/atlas.jpg', '/medina.jpg'])
+        atlas = Room.objects.get(name='Salle Atlas')
+        self.assertEqual(atlas.image.name, Room.objects.get(name='Salle Atlas bis').image.name)
+        self.assertTrue(os.path.exists(atlas.image.path))
+        with atlas.image.open('rb') as image:
+            self.assertEqual(image.read(), jpeg((200, 120, 40)))
+        self.assertEqual(atlas.amenities, ['Wi-Fi'])
+
+    def test_http_error(self):
+        result = seed_rooms([
+            room('Salle Atlas', self.server.url('/atlas.jpg')),
+            room('Salle Rabat', self.server.url('/error.jpg')),
+            room('Salle Fès', self.server.url('/missing.jpg')),
+        ])
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['images'], 1)
+        failed = dict(result['errors'])
+        self.assertEqual(set(failed), {self.server.url('/error.jpg'), self.server.url('/missing.jpg')})
+        self.assertIn('500', failed[self.server.url('/error.jpg')])
+        self.assertIn('404', failed[self.server.url('/missing.jpg')])
+        # Rooms are created without the image that failed
+        self.assertFalse(Room.objects.get(name='Salle Rabat').image)
+        self.assertTrue(Room.objects.get(name='Salle Atlas').image)
+
+    def test_payload_that_is_not_an_image(self):
+        result = seed_rooms([
+            room('Salle Rabat', self.server.url('/page.jpg')),
+            room('Salle Fès', self.server.url('/truncated.jpg')),
+        ])
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['images'], 0)
+        self.assertEqual(len(result['errors']), 2)
+        for url, error in result['errors']:
+            self.assertIn('not an image', error)
+        self.assertFalse(Room.objects.exclude(image='').exists())
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_malformed_catalogue_entries(self):
+        invalid = [
+            ['pas un objet'],
+            [room('Salle Rabat', capacity='beaucoup')],
+            [{'name': 'Salle sans description', 'capacity': 10, 'price_per_hour': 500}],
+        ]
+        for rooms_data in invalid:
+            with self.subTest(rooms_data=rooms_data), self.assertRaises(CommandError):
+                self.seed_from_file([room('Salle Atlas', self.server.url('/atlas.jpg'))] + rooms_data)
+        # Nothing downloaded nor written
+        self.assertEqual(self.server.requests, [])
+        self.assertFalse(Room.objects.exists())
+
+    def test_malformed_catalogue_file(self):
+        for content in ('{"name": "Salle Atlas"}', '[{"name": '):
+            with self.subTest(content=content), self.assertRaises(CommandError):
+                self.seed_from_file(content)
+        self.assertFalse(Room.objects.exists())
+
+    def test_reseeding_is_idempotent(self):
+        rooms_data = [
+            room('Salle Atlas', self.server.url('/atlas.jpg')),
+            room('Espace Medina', self.server.url('/medina.jpg')),
+        ]
+        self.assertEqual(seed_rooms(rooms_data)['created'], 2)
+        images = dict(Room.objects.values_list('name', 'image'))
+        files = sorted(os.listdir(os.path.join(self.media_root, 'room_images')))
+
+        result = seed_rooms(rooms_data)
+
+        self.assertEqual(result, {'created': 0, 'skipped': 2, 'images': 0, 'errors': []})
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(dict(Room.objects.values_list('name', 'image')), images)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'room_images'))), files)
+
+        # A new entry in the catalogue is the only one added
+        result = seed_rooms(rooms_data + [room('Salle Rabat', self.server.url('/atlas.jpg'))])
+        self.assertEqual((result['created'], result['skipped'], result['images']), (1, 2, 1))
+        self.assertEqual(Room.objects.count(), 3)
+        self.assertEqual(Room.objects.get(name='Salle Rabat').image.name, images['Salle Atlas'])
+
+    def test_replace(self):
+        rooms_data = [room('Salle Atlas', self.server.url('/atlas.jpg'))]
+        seed_rooms(rooms_data)
+        first_pk = Room.objects.get().pk
+
+        result = seed_rooms(rooms_data, replace=True)
+
+        self.assertEqual((result['created'], result['skipped']), (1, 0))
+        self.assertNotEqual(Room.objects.get().pk, first_pk)
+
+    def seed_from_file(self, rooms_data):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as catalogue:
+            catalogue.write(rooms_data if isinstance(rooms_data, str) else json.dumps(rooms_data))
+        self.addCleanup(os.remove, catalogue.name)
+        call_command('seed_rooms', file=catalogue.name, skip_variants=True, stdout=StringIO())
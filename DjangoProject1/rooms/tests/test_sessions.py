@@ -0,0 +1,108 @@
+import secrets
+import time
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rooms.sessions import REFRESHED_KEY, SessionStore
+
+from . import STORAGES
+from .test_sqlite import LOCMEM_SESSIONS
+
+
+def session_writes(queries):
+    return [q['sql'] for q in queries if 'django_session' in q['sql'] and q['sql'].startswith(('INSERT', 'UPDATE'))]
+
+
+@override_settings(CACHES=LOCMEM_SESSIONS, SESSION_REFRESH_INTERVAL=300)
+class SessionRefreshTests(TestCase):
+    def setUp(self):
+        session = SessionStore()
+        session['panier'] = [1]
+        session.save()
+        self.key = session.session_key
+        self.saved_at = session[REFRESHED_KEY]
+
+    def save_at(self, now):
+        session = SessionStore(self.key)
+        session.load()
+        with mock.patch('rooms.sessions.time.time', return_value=now), CaptureQueriesContext(connection) as queries:
+            session.save()
+        return session_writes(queries)
+
+    def test_unchanged_session_within_interval_is_not_written(self):
+        self.assertEqual(self.save_at(self.saved_at + 299), [])
+        self.assertEqual(SessionStore(self.key)[REFRESHED_KEY], self.saved_at)
+
+    def test_unchanged_session_after_interval_is_written(self):
+        self.assertEqual(len(self.save_at(self.saved_at + 300)), 1)
+        self.assertEqual(SessionStore(self.key)[REFRESHED_KEY], self.saved_at + 300)
+
+    def test_modified_session_is_written(self):
+        session = SessionStore(self.key)
+        session['panier'] = [1, 2]
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(len(session_writes(queries)), 1)
+        self.assertEqual(SessionStore(self.key)['panier'], [1, 2])
+
+    @override_settings(STORAGES=STORAGES)
+    def test_requests(self):
+        self.client.force_login(User.objects.create_user(username='alice'))
+        url = reverse('rooms:my_reservations')
+        now = time.time()
+
+        with mock.patch('rooms.sessions.time.time', return_value=now):
+            self.client.get(url)
+        with mock.patch('rooms.sessions.time.time', return_value=now + 60), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(session_writes(queries), [])
+
+        with mock.patch('rooms.sessions.time.time', return_value=now + 301), \
+                CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(session_writes(queries)), 1)
+
+
+@override_settings(CACHES=LOCMEM_SESSIONS)
+class FallbackMessagesTests(TestCase):
+    # Random text: the message cookie is compressed
+    texts = [f'Message {i} : {secrets.token_hex(100)}' for i in range(30)]
+
+    def request(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return SessionMiddleware(MessageMiddleware(view))(request)
+
+    def test_messages_overflowing_the_cookie_are_kept_in_the_session(self):
+        def add(request):
+            for text in self.texts:
+                messages.info(request, text)
+            return HttpResponse()
+
+        received = []
+
+        def read(request):
+            received.extend(str(message) for message in messages.get_messages(request))
+            return HttpResponse()
+
+        response = self.request(add)
+        cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+        # Some in the cookie, the rest in the session
+        self.assertLess(len(cookies['messages']), 4096)
+        session = SessionStore(cookies['sessionid'])
+        self.assertTrue(session.get('_messages'))
+
+        response = self.request(read, cookies)
+
+        self.assertEqual(received, self.texts)
+        self.assertNotIn('_messages', SessionStore(cookies['sessionid']))
@@ -0,0 +1,58 @@
+import threading
+
+from django.test import TransactionTestCase, override_settings
+
+from rooms.sessions import SessionStore
+from rooms.sqlite import write_queue
+
+LOCMEM_SESSIONS = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-shared'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-sessions'},
+}
+
+
+def run_with_timeout(func, timeout=10):
+    """Run func in a thread; return True if it finished within timeout seconds."""
+    errors = []
+
+    def target():
+        try:
+            func()
+        except Exception as e:  # re-raised in the test thread
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if errors:
+        raise errors[0]
+    return not thread.is_alive()
+
+
+# Outside a test transaction: inside one, the queue steps aside
+@override_settings(SQLITE_WRITE_QUEUE=True, CACHES=LOCMEM_SESSIONS)
+class WriteQueueTests(TransactionTestCase):
+    def test_new_session_save_does_not_deadlock(self):
+        # save() without a key calls create(), which calls save() again
+        session = SessionStore()
+        session['x'] = 1
+        self.assertTrue(run_with_timeout(session.save), 'SessionStore.save() deadlocked')
+        self.assertIsNotNone(session.session_key)
+        self.assertEqual(SessionStore(session.session_key)['x'], 1)
+
+    def test_nested_serialized_writes_run_once_queued(self):
+        calls = []
+
+        def inner():
+            calls.append('inner')
+
+        def outer():
+            calls.append('outer')
+            write_queue.run(inner)
+
+        self.assertTrue(run_with_timeout(lambda: write_queue.run(outer)), 'nested write_queue.run() deadlocked')
+        self.assertEqual(calls, ['outer', 'inner'])
+        # The queue is free again for the next writer
+        self.assertTrue(write_queue.lock.acquire(timeout=1))
+        write_queue.lock.release()
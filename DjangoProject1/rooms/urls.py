@@ -12,10 +12,12 @@ urlpatterns = [
     path('reservation/<int:pk>/cancel/', views.cancel_reservation, name='cancel_reservation'),
     path('reservation/<int:reservation_id>/pdf/', views.download_pdf, name='download_pdf'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('metrics/', views.metrics, name='metrics'),
     path('export-rooms-csv/', views.export_rooms_csv, name='export_rooms_csv'),
     path('export-reservations-csv/', views.export_reservations_csv, name='export_reservations_csv'),
     path('import-rooms-csv/', views.import_rooms_csv, name='import_rooms_csv'),
     path('preview-csv-import/', views.preview_csv_import, name='preview_csv_import'),
+    path('commit-csv-import/', views.commit_csv_import, name='commit_csv_import'),
     path('reservation/<int:reservation_id>/payment/', views.process_payment, name='process_payment'),
     path('payment/<int:payment_id>/approve/', views.approve_payment, name='approve_payment'),
     path('payment/<int:payment_id>/reject/', views.reject_payment, name='reject_payment'),
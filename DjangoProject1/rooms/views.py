@@ -1,19 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate
-from django.http import JsonResponse, HttpResponseServerError, HttpResponse, HttpResponseNotFound
+from django.http import JsonResponse, HttpResponseServerError, HttpResponse, HttpResponseNotFound, HttpResponseForbidden, StreamingHttpResponse, FileResponse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
 from .models import Room, Reservation, Payment
 from .forms import ReservationForm, UserRegistrationForm, PaymentForm
-from .utils import generate_reservation_receipt
-from django.contrib.auth.models import User, Group
+from .csv_import import import_rooms, apply_rows, store_preview, load_preview, discard_preview, CSVFormatError
+from .receipts import get_receipt_path, enqueue_receipt
+from .metrics import collect as collect_metrics, render_prometheus
+from .utils import build_search_windows, filter_free_rooms, book_room, get_dashboard_stats
+from django.contrib.auth.models import Group
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 import csv
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
 import json
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 import logging
@@ -23,7 +28,6 @@ import uuid
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 from django.conf import settings
-import os
 
 # Calculate total price for a reservation
 def calculate_total_price(price_per_hour, start_time, end_time):
@@ -36,6 +40,67 @@ def calculate_total_price(price_per_hour, start_time, end_time):
 # Configure logging
 logger = logging.getLogger(__name__)
 
+MAX_SEARCH_OCCURRENCES = 52
+
+def paginate(request, queryset, per_page, page_param='page'):
+    """
+    Return the requested page of queryset, falling back to the first or
+    last page when the page number is invalid
+    """
+    paginator = Paginator(queryset, per_page)
+    page = request.GET.get(page_param)
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+def parse_search_windows(params):
+    """
+    Read the time-window search parameters of room_list and return the
+    (start, end) windows a room must be free in
+    """
+    def parse(value):
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError("Format de date invalide.")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    start_time = parse(params['start_time'])
+    end_time = parse(params['end_time']) if params.get('end_time') else None
+
+    duration = None
+    if params.get('duration'):
+        try:
+            duration = timedelta(minutes=int(params['duration']))
+        except (ValueError, TypeError):
+            raise ValueError("La durée doit être un nombre entier de minutes.")
+        except OverflowError:
+            raise ValueError("La durée est trop longue.")
+
+    occurrences = 1
+    if params.get('occurrences'):
+        try:
+            occurrences = int(params['occurrences'])
+        except (ValueError, TypeError):
+            raise ValueError("Le nombre d'occurrences doit être un nombre entier.")
+        if not 1 <= occurrences <= MAX_SEARCH_OCCURRENCES:
+            raise ValueError(f"Le nombre d'occurrences doit être compris entre 1 et {MAX_SEARCH_OCCURRENCES}.")
+
+    return build_search_windows(
+        start_time,
+        end_time=end_time,
+        duration=duration,
+        recurrence=params.get('recurrence'),
+        occurrences=occurrences,
+    )
+
 def home(request):
     # Redirect to room_list view
     return redirect('rooms:room_list')
@@ -90,22 +155,28 @@ def room_list(request):
         elif availability == 'occupied':
             rooms = rooms.filter(is_available=False)
         
+        # Time-window search: keep only rooms without an overlapping reservation
+        search_windows = []
+        if request.GET.get('start_time'):
+            try:
+                search_windows = parse_search_windows(request.GET)
+                rooms = filter_free_rooms(rooms, search_windows)
+            except ValueError as e:
+                messages.error(request, str(e))
+        
         # Pagination
-        paginator = Paginator(rooms, 6)  # Show 6 rooms per page
-        page = request.GET.get('page')
-        try:
-            rooms = paginator.page(page)
-        except PageNotAnInteger:
-            # If page is not an integer, deliver first page
-            rooms = paginator.page(1)
-        except EmptyPage:
-            # If page is out of range, deliver last page of results
-            rooms = paginator.page(paginator.num_pages)
+        rooms = paginate(request, rooms, 6)  # Show 6 rooms per page
+        
+        # Keep the current filters in the pagination links
+        query_params = request.GET.copy()
+        query_params.pop('page', None)
         
         context = {
             'rooms': rooms,
             'is_paginated': True,
             'page_obj': rooms,
+            'search_windows': search_windows,
+            'query_string': query_params.urlencode(),
             'title': 'Liste des Salles'
         }
         
@@ -126,13 +197,17 @@ def room_detail(request, pk):
                 reservation = form.save(commit=False)
                 reservation.room = room
                 reservation.user = request.user
-                reservation.total_price = form.cleaned_data['total_price']
+                reservation.total_price = room.price_per_hour * Decimal(
+                    str((reservation.end_time - reservation.start_time).total_seconds() / 3600)
+                )
                 reservation.status = 'pending'
                 
                 try:
-                    reservation.save()
+                    book_room(reservation)
                     messages.success(request, 'Réservation effectuée avec succès!')
                     return redirect('rooms:process_payment', reservation_id=reservation.id)
+                except ValidationError as e:
+                    form.add_error('room', e)
                 except Exception as e:
                     logger.error(f"Error saving reservation: {str(e)}")
                     messages.error(request, 'Une erreur est survenue lors de la réservation.')
@@ -162,13 +237,15 @@ def create_reservation(request):
             reservation.status = 'pending'
             
             # Calculate total price
-            from decimal import Decimal
             duration = (reservation.end_time - reservation.start_time).total_seconds() / 3600
             reservation.total_price = reservation.room.price_per_hour * Decimal(str(duration))
             
-            reservation.save()
-            messages.success(request, 'Réservation effectuée avec succès!')
-            return redirect('rooms:process_payment', reservation_id=reservation.id)
+            try:
+                book_room(reservation)
+                messages.success(request, 'Réservation effectuée avec succès!')
+                return redirect('rooms:process_payment', reservation_id=reservation.id)
+            except ValidationError as e:
+                form.add_error('room', e)
     else:
         form = ReservationForm()
     
@@ -181,9 +258,21 @@ def create_reservation(request):
 
 @login_required
 def my_reservations(request):
-    reservations = Reservation.objects.filter(user=request.user).order_by('-created_at')
+    reservations = (
+        Reservation.objects.filter(user=request.user)
+        .select_related('room', 'payment_info')
+        .order_by('-created_at')
+    )
+    
+    status = request.GET.get('status')
+    if status:
+        reservations = reservations.filter(status=status)
+    
+    reservations = paginate(request, reservations, 10)
     context = {
         'reservations': reservations,
+        'page_obj': reservations,
+        'is_paginated': reservations.has_other_pages(),
         'title': 'Mes Réservations'
     }
     return render(request, 'rooms/my_reservations.html', context)
@@ -202,22 +291,22 @@ def cancel_reservation(request, pk):
 @login_required
 def download_pdf(request, reservation_id):
     try:
-        reservation = get_object_or_404(Reservation, pk=reservation_id)
+        reservation = get_object_or_404(Reservation.objects.select_related('room', 'user'), pk=reservation_id)
         
         # Check if user is authorized (either the reservation owner or staff)
-        if reservation.user != request.user and not request.user.is_staff:
+        if reservation.user_id != request.user.id and not request.user.is_staff:
             messages.error(request, "Vous n'êtes pas autorisé à accéder à ce document.")
             return redirect('rooms:room_list')
         
-        # Generate PDF
-        pdf_file = generate_reservation_receipt(reservation)
+        # Usually pre-rendered by the receipt worker; rendered inline otherwise
+        pdf_path = get_receipt_path(reservation)
         
-        # Create response with PDF
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        filename = f"reservation_{reservation.id}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return FileResponse(
+            open(pdf_path, 'rb'),
+            as_attachment=True,
+            filename=f"reservation_{reservation.id}.pdf",
+            content_type='application/pdf'
+        )
     except Exception as e:
         logger.error(f"Error generating PDF: {str(e)}")
         messages.error(request, "Une erreur est survenue lors de la génération du PDF.")
@@ -229,73 +318,117 @@ def admin_dashboard(request):
         messages.error(request, "Accès non autorisé.")
         return redirect('rooms:room_list')
     
-    # Get statistics for dashboard
-    total_rooms = Room.objects.count()
-    total_reservations = Reservation.objects.count()
-    total_users = User.objects.count()
-    
-    # Get queryset of pending reservations (not just count)
-    pending_reservations_queryset = Reservation.objects.filter(status='pending').order_by('-created_at')
-    pending_reservations_count = pending_reservations_queryset.count()
-    
-    confirmed_reservations = Reservation.objects.filter(status='confirmed').count()
-    cancelled_reservations = Reservation.objects.filter(status='cancelled').count()
-    
-    # Stats dictionary for display in cards
-    stats = {
-        'rooms': total_rooms,
-        'reservations': total_reservations,
-        'users': total_users,
-        'pending_reservations': pending_reservations_count
-    }
+    stats = get_dashboard_stats()
+    
+    pending_reservations = paginate(
+        request,
+        Reservation.objects.filter(status='pending').select_related('user', 'room').order_by('-created_at'),
+        10,
+        'reservations_page'
+    )
+    pending_payments = paginate(
+        request,
+        Payment.objects.filter(status='pending')
+        .select_related('reservation__user', 'reservation__room')
+        .order_by('-payment_date'),
+        10,
+        'payments_page'
+    )
     
     context = {
         'stats': stats,
-        'total_rooms': total_rooms,
-        'total_reservations': total_reservations,
-        'total_users': total_users,
-        'pending_reservations': pending_reservations_queryset,  # Pass the queryset, not the count
-        'pending_reservations_count': pending_reservations_count,
-        'confirmed_reservations': confirmed_reservations,
-        'cancelled_reservations': cancelled_reservations,
+        'total_rooms': stats['rooms'],
+        'total_reservations': stats['reservations'],
+        'total_users': stats['users'],
+        'pending_reservations': pending_reservations,
+        'pending_reservations_count': stats['pending_reservations'],
+        'confirmed_reservations': stats['confirmed_reservations'],
+        'cancelled_reservations': stats['cancelled_reservations'],
+        'pending_payments': pending_payments,
+        'rooms': Room.objects.only('id', 'name').order_by('name'),
         'title': 'Tableau de Bord Admin'
     }
     
     return render(request, 'rooms/admin_dashboard.html', context)
 
+def metrics(request):
+    """
+    Request histograms of every worker process in Prometheus text format,
+    for staff users or a scraper sending METRICS_TOKEN as a bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not authorized:
+        return HttpResponseForbidden("Accès non autorisé.")
+    return HttpResponse(render_prometheus(collect_metrics()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() hands back the formatted line so
+    rows can be streamed instead of accumulated in the response
+    """
+    def write(self, value):
+        return value
+
+EXPORT_CHUNK_SIZE = 2000
+
+def stream_csv(filename, header, rows):
+    """
+    Build a StreamingHttpResponse that writes header and rows as CSV
+    """
+    writer = csv.writer(Echo())
+    
+    def content():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    
+    response = StreamingHttpResponse(content(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 def export_rooms_csv(request):
     if not request.user.is_staff:
         messages.error(request, "Accès non autorisé.")
         return redirect('rooms:room_list')
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="rooms.csv"'
-    
-    # Create CSV writer
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible', 'Équipements'])
-    
-    # Get all rooms
     rooms = Room.objects.all().order_by('id')
     
-    # Add room data to CSV
-    for room in rooms:
-        # Convert amenities from JSON to string
-        amenities_str = ', '.join(room.amenities) if room.amenities else ''
-        
-        writer.writerow([
-            room.id,
-            room.name,
-            room.capacity,
-            room.description,
-            room.price_per_hour,
-            'Oui' if room.is_available else 'Non',
-            amenities_str
-        ])
-    
-    return response
+    if request.GET.get('available'):
+        rooms = rooms.filter(is_available=True)
+    try:
+        if request.GET.get('min_capacity'):
+            rooms = rooms.filter(capacity__gte=int(request.GET['min_capacity']))
+        if request.GET.get('max_price'):
+            rooms = rooms.filter(price_per_hour__lte=Decimal(request.GET['max_price'].replace(',', '.')))
+    except (ValueError, ArithmeticError):
+        messages.error(request, "Filtres d'export invalides.")
+        return redirect('rooms:admin_dashboard')
+    
+    rows = (
+        [
+            room_id,
+            name,
+            capacity,
+            description,
+            price_per_hour,
+            'Oui' if is_available else 'Non',
+            # Convert amenities from JSON to string
+            ', '.join(amenities) if amenities else ''
+        ]
+        for room_id, name, capacity, description, price_per_hour, is_available, amenities in rooms.values_list(
+            'id', 'name', 'capacity', 'description', 'price_per_hour', 'is_available', 'amenities'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    
+    return stream_csv(
+        'rooms.csv',
+        ['ID', 'Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible', 'Équipements'],
+        rows
+    )
 
 @login_required
 def export_reservations_csv(request):
@@ -303,35 +436,66 @@ def export_reservations_csv(request):
         messages.error(request, "Accès non autorisé.")
         return redirect('rooms:room_list')
     
-    # Create the HttpResponse object with CSV header
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="reservations.csv"'
-    
-    # Create CSV writer
-    writer = csv.writer(response)
-    writer.writerow([
-        'ID', 'Salle', 'Utilisateur', 'Date de début', 'Date de fin', 
-        'Date de création', 'Statut', 'Prix total', 'Payé'
-    ])
-    
-    # Get all reservations
     reservations = Reservation.objects.all().order_by('-created_at')
     
-    # Add reservation data to CSV
-    for reservation in reservations:
-        writer.writerow([
-            reservation.id,
-            reservation.room.name,
-            reservation.user.username,
-            reservation.start_time.strftime('%Y-%m-%d %H:%M'),
-            reservation.end_time.strftime('%Y-%m-%d %H:%M'),
-            reservation.created_at.strftime('%Y-%m-%d %H:%M'),
-            reservation.get_status_display(),
-            reservation.total_price,
-            'Oui' if reservation.is_paid else 'Non'
-        ])
+    status = request.GET.get('status')
+    if status:
+        reservations = reservations.filter(status=status)
     
-    return response
+    # Room id, ignored like the dates unless it can be a primary key (SQLite
+    # refuses integers beyond 64 bits)
+    try:
+        room_id = int(request.GET.get('room') or 0)
+    except ValueError:
+        room_id = 0
+    if 0 < room_id < 2 ** 63:
+        reservations = reservations.filter(room_id=room_id)
+    
+    # Date range on the start of the reservation, both bounds inclusive
+    try:
+        start_date = parse_date(request.GET.get('start_date') or '')
+        end_date = parse_date(request.GET.get('end_date') or '')
+    except ValueError:
+        start_date = end_date = None
+    if start_date:
+        reservations = reservations.filter(
+            start_time__gte=timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        )
+    if end_date:
+        reservations = reservations.filter(
+            start_time__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        )
+    
+    status_labels = dict(Reservation.STATUS_CHOICES)
+    rows = (
+        [
+            reservation_id,
+            room_name,
+            username,
+            start_time.strftime('%Y-%m-%d %H:%M'),
+            end_time.strftime('%Y-%m-%d %H:%M'),
+            created_at.strftime('%Y-%m-%d %H:%M'),
+            status_labels.get(reservation_status, reservation_status),
+            total_price,
+            'Oui' if is_paid else 'Non'
+        ]
+        for (
+            reservation_id, room_name, username, start_time, end_time,
+            created_at, reservation_status, total_price, is_paid
+        ) in reservations.values_list(
+            'id', 'room__name', 'user__username', 'start_time', 'end_time',
+            'created_at', 'status', 'total_price', 'is_paid'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    
+    return stream_csv(
+        'reservations.csv',
+        [
+            'ID', 'Salle', 'Utilisateur', 'Date de début', 'Date de fin',
+            'Date de création', 'Statut', 'Prix total', 'Payé'
+        ],
+        rows
+    )
 
 @login_required
 def import_rooms_csv(request):
@@ -347,204 +511,120 @@ def import_rooms_csv(request):
             messages.error(request, 'Le fichier doit être au format CSV.')
             return redirect('rooms:admin_dashboard')
         
-        # Save the uploaded file temporarily
-        file_path = default_storage.save(f'temp_csv/{csv_file.name}', ContentFile(csv_file.read()))
-        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-        
         try:
-            # Process the CSV file
-            with open(full_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                header = next(reader)  # Skip header row
-                
-                # Check header format
-                required_headers = ['Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible', 'Équipements']
-                if not all(h in header for h in required_headers):
-                    messages.error(request, 'Format de fichier CSV invalide. Veuillez vérifier les en-têtes.')
-                    return redirect('rooms:admin_dashboard')
-                
-                # Get column indices
-                name_idx = header.index('Nom')
-                capacity_idx = header.index('Capacité')
-                description_idx = header.index('Description')
-                price_idx = header.index('Prix par heure')
-                available_idx = header.index('Disponible')
-                amenities_idx = header.index('Équipements') if 'Équipements' in header else None
-                
-                # Process rows
-                rooms_created = 0
-                rooms_updated = 0
-                errors = 0
-                
-                for row in reader:
-                    try:
-                        # Validate data
-                        if len(row) < 5:  # At least 5 columns required
-                            continue
-                        
-                        name = row[name_idx].strip()
-                        if not name:
-                            continue
-                        
-                        # Parse capacity
-                        try:
-                            capacity = int(row[capacity_idx])
-                        except ValueError:
-                            capacity = 0
-                        
-                        # Parse price
-                        try:
-                            price = float(row[price_idx].replace(',', '.'))
-                        except ValueError:
-                            price = 0
-                        
-                        # Parse availability
-                        available_str = row[available_idx].lower()
-                        is_available = available_str in ['oui', 'yes', 'true', '1']
-                        
-                        # Parse amenities
-                        amenities = []
-                        if amenities_idx is not None and amenities_idx < len(row):
-                            amenities_str = row[amenities_idx]
-                            if amenities_str:
-                                amenities = [item.strip() for item in amenities_str.split(',')]
-                        
-                        # Create or update room
-                        room, created = Room.objects.update_or_create(
-                            name=name,
-                            defaults={
-                                'capacity': capacity,
-                                'description': row[description_idx],
-                                'price_per_hour': price,
-                                'is_available': is_available,
-                                'amenities': amenities
-                            }
-                        )
-                        
-                        if created:
-                            rooms_created += 1
-                        else:
-                            rooms_updated += 1
-                    
-                    except Exception as e:
-                        logger.error(f"Error importing room: {str(e)}")
-                        errors += 1
-                
-                # Show results
-                if rooms_created > 0 or rooms_updated > 0:
-                    messages.success(
-                        request, 
-                        f'{rooms_created} salles créées, {rooms_updated} salles mises à jour, {errors} erreurs.'
-                    )
-                else:
-                    messages.warning(request, 'Aucune salle n\'a été importée.')
-        
+            result = import_rooms(csv_file)
+        except CSVFormatError as e:
+            messages.error(request, str(e))
+            return redirect('rooms:admin_dashboard')
         except Exception as e:
             logger.error(f"Error processing CSV file: {str(e)}")
             messages.error(request, f'Erreur lors du traitement du fichier: {str(e)}')
+            return redirect('rooms:admin_dashboard')
         
-        finally:
-            # Clean up the temporary file
-            default_storage.delete(file_path)
+        report_import_result(request, result)
     
     return redirect('rooms:admin_dashboard')
 
-# Validate CSV row data
-def validate_csv_content(row):
+MAX_REPORTED_IMPORT_ERRORS = 10
+
+def report_import_result(request, result):
     """
-    Validate the content of a CSV row for room import
-    Returns a tuple (is_valid, error_message)
+    Turn the result of a room import into flash messages
     """
-    if len(row) < 5:
-        return False, "Nombre de colonnes insuffisant"
+    errors = result['errors']
+    if result['created'] or result['updated']:
+        messages.success(
+            request,
+            f"{result['created']} salles créées, {result['updated']} salles mises à jour, {len(errors)} erreurs."
+        )
+    elif result['unchanged']:
+        messages.info(request, f"{result['unchanged']} salles déjà à jour, aucune modification.")
+    else:
+        messages.warning(request, 'Aucune salle n\'a été importée.')
     
-    name = row[0].strip()
-    if not name:
-        return False, "Le nom est obligatoire"
+    for line_number, error in errors[:MAX_REPORTED_IMPORT_ERRORS]:
+        messages.error(request, f"Ligne {line_number}: {error}")
+    if len(errors) > MAX_REPORTED_IMPORT_ERRORS:
+        messages.error(request, f"... et {len(errors) - MAX_REPORTED_IMPORT_ERRORS} autres erreurs.")
+
+@login_required
+def preview_csv_import(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': "Accès non autorisé."}, status=403)
     
-    try:
-        capacity = int(row[1])
-        if capacity <= 0:
-            return False, "La capacité doit être un nombre positif"
-    except ValueError:
-        return False, "La capacité doit être un nombre entier"
+    if request.method != 'POST' or not request.FILES.get('csv_file'):
+        return JsonResponse({'error': "Aucun fichier fourni."}, status=400)
+    
+    csv_file = request.FILES['csv_file']
+    
+    # Check if it's a CSV file
+    if not csv_file.name.endswith('.csv'):
+        return JsonResponse({'error': 'Le fichier doit être au format CSV.'}, status=400)
     
     try:
-        price = float(row[3].replace(',', '.'))
-        if price <= 0:
-            return False, "Le prix doit être un nombre positif"
-    except ValueError:
-        return False, "Le prix doit être un nombre"
+        preview = store_preview(csv_file)
+    except CSVFormatError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error previewing CSV file: {str(e)}")
+        return JsonResponse({'error': "Erreur lors de l'aperçu du fichier."}, status=500)
+    
+    # Forget any earlier preview of this session
+    previous = request.session.get('csv_import')
+    if previous:
+        discard_preview(previous['token'])
+    request.session['csv_import'] = {
+        'token': preview['token'],
+        'file_name': csv_file.name,
+        'invalid': preview['invalid'],
+    }
     
-    return True, ""
+    return JsonResponse({
+        'token': preview['token'],
+        'file_name': csv_file.name,
+        'rows': [
+            {
+                'Nom': row['name'],
+                'Capacité': row['capacity'],
+                'Prix par heure': str(row['price_per_hour']),
+                'Disponible': 'Oui' if row['is_available'] else 'Non',
+                'Équipements': ', '.join(row['amenities']),
+            }
+            for row in preview['rows']
+        ],
+        'errors': [f"Ligne {line_number}: {error}" for line_number, error in preview['errors']],
+        'valid': preview['valid'],
+        'invalid': preview['invalid'],
+    })
 
 @login_required
-def preview_csv_import(request):
+@require_POST
+def commit_csv_import(request):
     if not request.user.is_staff:
         messages.error(request, "Accès non autorisé.")
         return redirect('rooms:room_list')
     
-    if request.method == 'POST' and request.FILES.get('csv_file'):
-        csv_file = request.FILES['csv_file']
-        
-        # Check if it's a CSV file
-        if not csv_file.name.endswith('.csv'):
-            messages.error(request, 'Le fichier doit être au format CSV.')
-            return redirect('rooms:admin_dashboard')
-        
-        # Save the uploaded file temporarily
-        file_path = default_storage.save(f'temp_csv/{csv_file.name}', ContentFile(csv_file.read()))
-        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-        
-        try:
-            # Process the CSV file for preview
-            preview_data = []
-            validation_errors = []
-            
-            with open(full_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                header = next(reader)  # Skip header row
-                
-                # Check header format
-                required_headers = ['Nom', 'Capacité', 'Description', 'Prix par heure', 'Disponible']
-                if not all(h in header for h in required_headers):
-                    messages.error(request, 'Format de fichier CSV invalide. Veuillez vérifier les en-têtes.')
-                    return redirect('rooms:admin_dashboard')
-                
-                # Preview first 10 rows
-                for i, row in enumerate(reader):
-                    if i >= 10:  # Limit preview to 10 rows
-                        break
-                    
-                    # Validate row
-                    is_valid, error_message = validate_csv_content(row)
-                    
-                    preview_data.append({
-                        'row': row,
-                        'is_valid': is_valid
-                    })
-                    
-                    if not is_valid:
-                        validation_errors.append(f"Ligne {i+2}: {error_message}")
-            
-            # Store the file path in session for later import
-            request.session['csv_import_path'] = file_path
-            
-            context = {
-                'preview_data': preview_data,
-                'headers': header,
-                'validation_errors': validation_errors,
-                'file_name': csv_file.name,
-                'title': 'Aperçu de l\'importation'
-            }
-            
-            return render(request, 'rooms/preview_import.html', context)
-        
-        except Exception as e:
-            logger.error(f"Error previewing CSV file: {str(e)}")
-            messages.error(request, f'Erreur lors de l\'aperçu du fichier: {str(e)}')
-            default_storage.delete(file_path)
+    pending = request.session.get('csv_import')
+    if not pending or pending['token'] != request.POST.get('token'):
+        messages.error(request, "Aucun aperçu d'importation en cours.")
+        return redirect('rooms:admin_dashboard')
     
+    try:
+        result = apply_rows(load_preview(pending['token']))
+    except CSVFormatError as e:
+        messages.error(request, str(e))
+        return redirect('rooms:admin_dashboard')
+    except Exception as e:
+        logger.error(f"Error committing CSV import: {str(e)}")
+        messages.error(request, f"Erreur lors de l'importation: {str(e)}")
+        return redirect('rooms:admin_dashboard')
+    finally:
+        discard_preview(pending['token'])
+        del request.session['csv_import']
+    
+    if pending['invalid']:
+        messages.warning(request, f"{pending['invalid']} lignes invalides ont été ignorées.")
+    report_import_result(request, result)
     return redirect('rooms:admin_dashboard')
 
 @login_required
@@ -611,11 +691,11 @@ def approve_payment(request, payment_id):
     reservation.status = 'confirmed'  # Keep the traditional 'confirmed' status
     reservation.save()
     
-    # Generate receipt PDF and redirect to display/download
-    messages.success(request, "Paiement approuvé avec succès. Génération du reçu en cours...")
+    # The receipt is rendered by the process_receipt_jobs worker
+    enqueue_receipt(reservation)
+    messages.success(request, "Paiement approuvé avec succès. Le reçu sera généré en arrière-plan.")
     
-    # Redirect to the download PDF view with the reservation ID
-    return redirect('rooms:download_pdf', reservation_id=reservation.id)
+    return redirect('rooms:admin_dashboard')
 
 @login_required
 def reject_payment(request, payment_id):
@@ -641,11 +721,11 @@ def approve_reservation(request, reservation_id):
     reservation.is_paid = True  # Also mark as paid when admin approves
     reservation.save()
     
-    # Generate receipt PDF and redirect to display/download
-    messages.success(request, "Réservation approuvée avec succès. Génération du reçu en cours...")
+    # The receipt is rendered by the process_receipt_jobs worker
+    enqueue_receipt(reservation)
+    messages.success(request, "Réservation approuvée avec succès. Le reçu sera généré en arrière-plan.")
     
-    # Redirect to the download PDF view with the reservation ID
-    return redirect('rooms:download_pdf', reservation_id=reservation.id)
+    return redirect('rooms:admin_dashboard')
 
 @login_required
 def reject_reservation(request, reservation_id):